@@ -10,11 +10,17 @@
 :License: MIT
 """
 
-from scipy.integrate import odeint
+from intro_to_wc_modeling.cell_modeling.simulation import codegen
+from intro_to_wc_modeling.cell_modeling.simulation import ode
+from concurrent import futures
 from matplotlib import pyplot
+from scipy import integrate
+from scipy import sparse
+import collections
 import matplotlib
 import numpy
 import os
+import time
 
 
 class GlycolysisModel(object):
@@ -134,6 +140,11 @@ class GlycolysisModel(object):
         TRIO_0 (:obj:`float`): initial triose-phosphate (DHAP + GAP) concentration (mM)
 
         x_0 (:obj:`numpy.array`): initial species concentrations (mM)
+
+        species_ids (:obj:`tuple` of :obj:`str`): ids of the species, in the order of the state vector
+        reaction_ids (:obj:`tuple` of :obj:`str`): ids of the rate laws of the reactions
+        stoichiometry (:obj:`numpy.ndarray`): stoichiometry of each species (rows) in each reaction (columns)
+        observable_ids (:obj:`tuple` of :obj:`str`): ids of the concentrations returned by :obj:`simulate`
     """
 
     CPFKAMP = 0.0845
@@ -246,6 +257,30 @@ class GlycolysisModel(object):
     Prb_0 = 5.0
     TRIO_0 = 5.17
 
+    observable_ids = ('DHAP', )
+    species_ids = ('ACE', 'BPG', 'F16BP', 'F6P', 'G6P', 'GLCi', 'NAD', 'NADH', 'P2G', 'P3G', 'PEP', 'PYR', 'Prb',
+                   'TRIO')
+    reaction_ids = ('v_1', 'v_2', 'v_3', 'v_4', 'v_5', 'v_6', 'v_7', 'v_8', 'v_9', 'v_10', 'v_11', 'v_12', 'v_13', 'v_14',
+                    'v_15', 'v_16', 'v_17')
+    _jacobian_sparsity = None
+    stoichiometry = numpy.array([
+        # 1   2   3   4   5   6   7   8   9  10  11  12  13  14  15  16  17
+        [0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 1, -2, 0, -1, 0, 0],  # ACE
+        [0, 0, 0, 0, 0, 0, 1, -1, 0, 0, 0, 0, 0, 0, 0, 0, 0],  # BPG
+        [0, 0, 0, 0, 1, -1, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0],  # F16BP
+        [0, 1, 0, 0, -1, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0],  # F6P
+        [1, -1, -1, -2, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0],  # G6P
+        [-1, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 1, 0, 0, 0],  # GLCi
+        [0, 0, 0, 0, 0, 0, -1, 0, 0, 0, 0, 0, -3, 0, 1, 1, 0],  # NAD
+        [0, 0, 0, 0, 0, 0, 1, 0, 0, 0, 0, 0, 3, 0, -1, -1, 0],  # NADH
+        [0, 0, 0, 0, 0, 0, 0, 0, 1, -1, 0, 0, 0, 0, 0, 0, 0],  # P2G
+        [0, 0, 0, 0, 0, 0, 0, 1, -1, 0, 0, 0, 0, 0, 0, 0, 0],  # P3G
+        [0, 0, 0, 0, 0, 0, 0, 0, 0, 1, -1, 0, 0, 0, 0, 0, 0],  # PEP
+        [0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 1, -1, 0, 0, 0, 0, 0],  # PYR
+        [-1, 0, -1, -1, -1, 0, 0, 1, 0, 0, 1, 0, -4, 0, 0, 0, -1],  # Prb
+        [0, 0, 0, 0, 0, 2, -1, 0, 0, 0, 0, 0, 0, 0, 0, -1, 0],  # TRIO
+    ], dtype=float)
+
     @property
     def x_0(self):
         return numpy.array([
@@ -265,11 +300,32 @@ class GlycolysisModel(object):
             self.TRIO_0,
         ])
 
-    def v_1(self, x):
+    def get_adenylates(self, x):
+        """ Calculate the concentrations of the adenine nucleotides from the concentration of the high energy
+        phosphates (Prb), assuming that adenylate kinase (2 ADP <=> ATP + AMP) is at equilibrium
+
+        Args:
+            x (:obj:`numpy.array`): species concentrations (mM)
+
+        Returns:
+            :obj:`tuple`:
+
+                * :obj:`float`: concentration of ATP (mM)
+                * :obj:`float`: concentration of ADP (mM)
+                * :obj:`float`: concentration of AMP (mM)
+        """
+        Prb = x[12]
+        root = (self.SUMAXP**2 - 2*self.SUMAXP*Prb + 8*self.KeqAK*self.SUMAXP*Prb + Prb**2 - 4*self.KeqAK*Prb**2)**0.5
+        ATP = (-self.SUMAXP + Prb - 4*self.KeqAK*Prb + root)/(2 - 8*self.KeqAK)
+        ADP = (self.SUMAXP - root)/(1 - 4*self.KeqAK)
+        AMP = self.KeqAK*ADP**2/ATP
+        return (ATP, ADP, AMP)
+
+    def v_1(self, x, adenylates=None):
         # Hexokinase
         # GLCi + Prb <=> G6P
-        return (self.VmGLK*(-((x[4]*(self.SUMAXP - (self.SUMAXP**2 - 2*self.SUMAXP*x[12] + 8*self.KeqAK*self.SUMAXP*x[12] + x[12]**2 - 4*self.KeqAK*x[12]**2)**0.5)) /
-                              ((1 - 4*self.KeqAK)*self.KeqGLK)) + (x[5]*(-self.SUMAXP + x[12] - 4*self.KeqAK*x[12] + (self.SUMAXP**2 - 2*self.SUMAXP*x[12] + 8*self.KeqAK*self.SUMAXP*x[12] + x[12]**2 - 4*self.KeqAK*x[12]**2)**0.5))/(2 - 8*self.KeqAK)))/(self.KmGLKATP*self.KmGLKGLCi*(1 + x[4]/self.KmGLKG6P + x[5]/self.KmGLKGLCi)*(1 + (self.SUMAXP - (self.SUMAXP**2 - 2*self.SUMAXP*x[12] + 8*self.KeqAK*self.SUMAXP*x[12] + x[12]**2 - 4*self.KeqAK*x[12]**2)**0.5)/((1 - 4*self.KeqAK)*self.KmGLKADP) + (-self.SUMAXP + x[12] - 4*self.KeqAK*x[12] + (self.SUMAXP**2 - 2*self.SUMAXP*x[12] + 8*self.KeqAK*self.SUMAXP*x[12] + x[12]**2 - 4*self.KeqAK*x[12]**2)**0.5)/((2 - 8*self.KeqAK)*self.KmGLKATP)))
+        ATP, ADP, _ = adenylates or self.get_adenylates(x)
+        return (self.VmGLK*(-((x[4]*ADP)/self.KeqGLK) + x[5]*ATP))/(self.KmGLKATP*self.KmGLKGLCi*(1 + x[4]/self.KmGLKG6P + x[5]/self.KmGLKGLCi)*(1 + ADP/self.KmGLKADP + ATP/self.KmGLKATP))
 
     def v_2(self, x):
         # Glucose-6-phosphate isomerase
@@ -286,10 +342,12 @@ class GlycolysisModel(object):
         # {2.0}G6P + Prb => Trh
         return self.KTREHALOSE
 
-    def v_5(self, x):
+    def v_5(self, x, adenylates=None):
         # Phosphofructokinase
         # F6P + Prb => F16P
-        return (self.gR*self.VmPFK*x[3]*(-self.SUMAXP + x[12] - 4*self.KeqAK*x[12] + (self.SUMAXP**2 - 2*self.SUMAXP*x[12] + 8*self.KeqAK*self.SUMAXP*x[12] + x[12]**2 - 4*self.KeqAK*x[12]**2)**0.5)*(1 + x[3]/self.KmPFKF6P + (-self.SUMAXP + x[12] - 4*self.KeqAK*x[12] + (self.SUMAXP**2 - 2*self.SUMAXP*x[12] + 8*self.KeqAK*self.SUMAXP*x[12] + x[12]**2 - 4*self.KeqAK*x[12]**2)**0.5)/((2 - 8*self.KeqAK)*self.KmPFKATP) + (self.gR*x[3]*(-self.SUMAXP + x[12] - 4*self.KeqAK*x[12] + (self.SUMAXP**2 - 2*self.SUMAXP*x[12] + 8*self.KeqAK*self.SUMAXP*x[12] + x[12]**2 - 4*self.KeqAK*x[12]**2)**0.5))/((2 - 8*self.KeqAK)*self.KmPFKATP*self.KmPFKF6P)))/((2 - 8*self.KeqAK)*self.KmPFKATP*self.KmPFKF6P*((self.L0*(1 + (self.CPFKF26BP*self.F26BP)/self.KPFKF26BP + (self.CPFKF16BP*x[2])/self.KPFKF16BP)**2*(1 + (2*self.CPFKAMP*self.KeqAK*(self.SUMAXP - (self.SUMAXP**2 - 2*self.SUMAXP*x[12] + 8*self.KeqAK*self.SUMAXP*x[12] + x[12]**2 - 4*self.KeqAK*x[12]**2)**0.5)**2)/((-1 + 4*self.KeqAK)*self.KPFKAMP*(self.SUMAXP - x[12] + 4*self.KeqAK*x[12] - (self.SUMAXP**2 - 2*self.SUMAXP*x[12] + 8*self.KeqAK*self.SUMAXP*x[12] + x[12]**2 - 4*self.KeqAK*x[12]**2)**0.5)))**2*(1 + (self.CiPFKATP*(-self.SUMAXP + x[12] - 4*self.KeqAK*x[12] + (self.SUMAXP**2 - 2*self.SUMAXP*x[12] + 8*self.KeqAK*self.SUMAXP*x[12] + x[12]**2 - 4*self.KeqAK*x[12]**2)**0.5))/((2 - 8*self.KeqAK)*self.KiPFKATP))**2*(1 + (self.CPFKATP*(-self.SUMAXP + x[12] - 4*self.KeqAK*x[12] + (self.SUMAXP**2 - 2*self.SUMAXP*x[12] + 8*self.KeqAK*self.SUMAXP*x[12] + x[12]**2 - 4*self.KeqAK*x[12]**2)**0.5))/((2 - 8*self.KeqAK)*self.KmPFKATP))**2)/((1 + self.F26BP/self.KPFKF26BP + x[2]/self.KPFKF16BP)**2*(1 + (2*self.KeqAK*(self.SUMAXP - (self.SUMAXP**2 - 2*self.SUMAXP*x[12] + 8*self.KeqAK*self.SUMAXP*x[12] + x[12]**2 - 4*self.KeqAK*x[12]**2)**0.5)**2)/((-1 + 4*self.KeqAK)*self.KPFKAMP*(self.SUMAXP - x[12] + 4*self.KeqAK*x[12] - (self.SUMAXP**2 - 2*self.SUMAXP*x[12] + 8*self.KeqAK*self.SUMAXP*x[12] + x[12]**2 - 4*self.KeqAK*x[12]**2)**0.5)))**2*(1 + (-self.SUMAXP + x[12] - 4*self.KeqAK*x[12] + (self.SUMAXP**2 - 2*self.SUMAXP*x[12] + 8*self.KeqAK*self.SUMAXP*x[12] + x[12]**2 - 4*self.KeqAK*x[12]**2)**0.5)/((2 - 8*self.KeqAK)*self.KiPFKATP))**2) + (1 + x[3]/self.KmPFKF6P + (-self.SUMAXP + x[12] - 4*self.KeqAK*x[12] + (self.SUMAXP**2 - 2*self.SUMAXP*x[12] + 8*self.KeqAK*self.SUMAXP*x[12] + x[12]**2 - 4*self.KeqAK*x[12]**2)**0.5)/((2 - 8*self.KeqAK)*self.KmPFKATP) + (self.gR*x[3]*(-self.SUMAXP + x[12] - 4*self.KeqAK*x[12] + (self.SUMAXP**2 - 2*self.SUMAXP*x[12] + 8*self.KeqAK*self.SUMAXP*x[12] + x[12]**2 - 4*self.KeqAK*x[12]**2)**0.5))/((2 - 8*self.KeqAK)*self.KmPFKATP*self.KmPFKF6P))**2))
+        ATP, _, AMP = adenylates or self.get_adenylates(x)
+        saturation = 1 + x[3]/self.KmPFKF6P + ATP/self.KmPFKATP + (self.gR*x[3]*ATP)/(self.KmPFKATP*self.KmPFKF6P)
+        return (self.gR*self.VmPFK*x[3]*ATP*saturation)/(self.KmPFKATP*self.KmPFKF6P*((self.L0*(1 + (self.CPFKF26BP*self.F26BP)/self.KPFKF26BP + (self.CPFKF16BP*x[2])/self.KPFKF16BP)**2*(1 + (self.CPFKAMP*AMP)/self.KPFKAMP)**2*(1 + (self.CiPFKATP*ATP)/self.KiPFKATP)**2*(1 + (self.CPFKATP*ATP)/self.KmPFKATP)**2)/((1 + self.F26BP/self.KPFKF26BP + x[2]/self.KPFKF16BP)**2*(1 + AMP/self.KPFKAMP)**2*(1 + ATP/self.KiPFKATP)**2) + saturation**2))
 
     def v_6(self, x):
         # Aldolase
@@ -301,10 +359,11 @@ class GlycolysisModel(object):
         # TRIO + NAD <=> BPG + NADH
         return (-((self.VmGAPDHr*x[1]*x[7])/(self.KmGAPDHBPG*self.KmGAPDHNADH)) + (self.KeqTPI*self.VmGAPDHf*x[6]*x[13])/((1 + self.KeqTPI)*self.KmGAPDHGAP*self.KmGAPDHNAD))/((1 + x[6]/self.KmGAPDHNAD + x[7]/self.KmGAPDHNADH)*(1 + x[1]/self.KmGAPDHBPG + (self.KeqTPI*x[13])/((1 + self.KeqTPI)*self.KmGAPDHGAP)))
 
-    def v_8(self, x):
+    def v_8(self, x, adenylates=None):
         # Phosphoglycerate kinase
         # BPG <=> P3G + Prb
-        return (self.VmPGK*((self.KeqPGK*x[1]*(self.SUMAXP - (self.SUMAXP**2 - 2*self.SUMAXP*x[12] + 8*self.KeqAK*self.SUMAXP*x[12] + x[12]**2 - 4*self.KeqAK*x[12]**2)**0.5))/(1 - 4*self.KeqAK) - (x[9]*(-self.SUMAXP + x[12] - 4*self.KeqAK*x[12] + (self.SUMAXP**2 - 2*self.SUMAXP*x[12] + 8*self.KeqAK*self.SUMAXP*x[12] + x[12]**2 - 4*self.KeqAK*x[12]**2)**0.5))/(2 - 8*self.KeqAK)))/(self.KmPGKATP*self.KmPGKP3G*(1 + x[1]/self.KmPGKBPG + x[9]/self.KmPGKP3G)*(1 + (self.SUMAXP - (self.SUMAXP**2 - 2*self.SUMAXP*x[12] + 8*self.KeqAK*self.SUMAXP*x[12] + x[12]**2 - 4*self.KeqAK*x[12]**2)**0.5)/((1 - 4*self.KeqAK)*self.KmPGKADP) + (-self.SUMAXP + x[12] - 4*self.KeqAK*x[12] + (self.SUMAXP**2 - 2*self.SUMAXP*x[12] + 8*self.KeqAK*self.SUMAXP*x[12] + x[12]**2 - 4*self.KeqAK*x[12]**2)**0.5)/((2 - 8*self.KeqAK)*self.KmPGKATP)))
+        ATP, ADP, _ = adenylates or self.get_adenylates(x)
+        return (self.VmPGK*(self.KeqPGK*x[1]*ADP - x[9]*ATP))/(self.KmPGKATP*self.KmPGKP3G*(1 + x[1]/self.KmPGKBPG + x[9]/self.KmPGKP3G)*(1 + ADP/self.KmPGKADP + ATP/self.KmPGKATP))
 
     def v_9(self, x):
         # Phosphoglycerate mutase
@@ -316,10 +375,11 @@ class GlycolysisModel(object):
         # P2G <=> PEP
         return (self.VmENO*(x[8] - x[10]/self.KeqENO))/(self.KmENOP2G*(1 + x[8]/self.KmENOP2G + x[10]/self.KmENOPEP))
 
-    def v_11(self, x):
+    def v_11(self, x, adenylates=None):
         # Pyruvate kinase
         # PEP <=> PYR + Prb
-        return (self.VmPYK*((x[10]*(self.SUMAXP - (self.SUMAXP**2 - 2*self.SUMAXP*x[12] + 8*self.KeqAK*self.SUMAXP*x[12] + x[12]**2 - 4*self.KeqAK*x[12]**2)**0.5))/(1 - 4*self.KeqAK) - ((-self.SUMAXP + x[12] - 4*self.KeqAK*x[12] + (self.SUMAXP**2 - 2*self.SUMAXP*x[12] + 8*self.KeqAK*self.SUMAXP*x[12] + x[12]**2 - 4*self.KeqAK*x[12]**2)**0.5)*x[11])/((2 - 8*self.KeqAK)*self.KeqPYK)))/(self.KmPYKADP*self.KmPYKPEP*(1 + (self.SUMAXP - (self.SUMAXP**2 - 2*self.SUMAXP*x[12] + 8*self.KeqAK*self.SUMAXP*x[12] + x[12]**2 - 4*self.KeqAK*x[12]**2)**0.5)/((1 - 4*self.KeqAK)*self.KmPYKADP) + (-self.SUMAXP + x[12] - 4*self.KeqAK*x[12] + (self.SUMAXP**2 - 2*self.SUMAXP*x[12] + 8*self.KeqAK*self.SUMAXP*x[12] + x[12]**2 - 4*self.KeqAK*x[12]**2)**0.5)/((2 - 8*self.KeqAK)*self.KmPYKATP))*(1 + x[10]/self.KmPYKPEP + x[11]/self.KmPYKPYR))
+        ATP, ADP, _ = adenylates or self.get_adenylates(x)
+        return (self.VmPYK*(x[10]*ADP - (ATP*x[11])/self.KeqPYK))/(self.KmPYKADP*self.KmPYKPEP*(1 + ADP/self.KmPYKADP + ATP/self.KmPYKATP)*(1 + x[10]/self.KmPYKPEP + x[11]/self.KmPYKPYR))
 
     def v_12(self, x):
         # Pyruvate decarboxylase
@@ -346,10 +406,38 @@ class GlycolysisModel(object):
         # TRIO + NADH => NAD + GLY
         return (self.VmG3PDH*(-((self.GLY*x[6])/self.KeqG3PDH) + (x[7]*x[13])/(1 + self.KeqTPI)))/(self.KmG3PDHDHAP*self.KmG3PDHNADH*(1 + x[6]/self.KmG3PDHNAD + x[7]/self.KmG3PDHNADH)*(1 + self.GLY/self.KmG3PDHGLY + x[13]/((1 + self.KeqTPI)*self.KmG3PDHDHAP)))
 
-    def v_17(self, x):
+    def v_17(self, x, adenylates=None):
         # ATPase activity
         # Prb <=> X
-        return (self.KATPASE*(-self.SUMAXP + x[12] - 4*self.KeqAK*x[12] + (self.SUMAXP**2 - 2*self.SUMAXP*x[12] + 8*self.KeqAK*self.SUMAXP*x[12] + x[12]**2 - 4*self.KeqAK*x[12]**2)**0.5))/(2 - 8*self.KeqAK)
+        ATP, _, _ = adenylates or self.get_adenylates(x)
+        return self.KATPASE*ATP
+
+    def get_rate_laws(self):
+        """ Get the rate law of each reaction
+
+        Returns:
+            :obj:`list` of :obj:`function`: rate law of each reaction, in the order of :obj:`reaction_ids`
+        """
+        return [getattr(self, reaction_id) for reaction_id in self.reaction_ids]
+
+    def get_jacobian_sparsity(self):
+        """ Get the sparsity pattern of the Jacobian. The pattern is derived once and reused by subsequent calls.
+
+        Returns:
+            :obj:`scipy.sparse.csc_matrix`: sparsity pattern of the Jacobian
+        """
+        if self._jacobian_sparsity is None:
+            self._jacobian_sparsity = get_jacobian_sparsity(self.stoichiometry,
+                                                            get_rate_dependencies(self.get_rate_laws(), self.x_0))
+        return self._jacobian_sparsity
+
+    def get_submodel(self):
+        """ Get a declarative description of the model which can be composed with other submodels
+
+        Returns:
+            :obj:`Submodel`: submodel
+        """
+        return Submodel('glycolysis', self.species_ids, self.reaction_ids, self.stoichiometry, self.fluxes, self.x_0)
 
     def dACE_dt(self, x):
         return 1.0 * self.v_12(x) - 1.0 * self.v_15(x) - 2.0 * self.v_13(x)
@@ -396,6 +484,37 @@ class GlycolysisModel(object):
     def dTRIO_dt(self, x):
         return 2.0 * self.v_6(x) - 1.0 * self.v_16(x) - 1.0 * self.v_7(x)
 
+    def fluxes(self, x):
+        """ Calculate the flux of each reaction, evaluating each rate law once
+
+        Args:
+            x (:obj:`numpy.array`): species concentrations (mM)
+
+        Returns:
+            :obj:`numpy.array`: flux of each reaction, in the order of :obj:`reaction_ids` (mM min\ :sup:`-1`)
+        """
+        # the adenine nucleotides are shared by several rate laws; calculate them once
+        adenylates = self.get_adenylates(x)
+        return numpy.array([
+            self.v_1(x, adenylates),
+            self.v_2(x),
+            self.v_3(x),
+            self.v_4(x),
+            self.v_5(x, adenylates),
+            self.v_6(x),
+            self.v_7(x),
+            self.v_8(x, adenylates),
+            self.v_9(x),
+            self.v_10(x),
+            self.v_11(x, adenylates),
+            self.v_12(x),
+            self.v_13(x),
+            self.v_14(x),
+            self.v_15(x),
+            self.v_16(x),
+            self.v_17(x, adenylates),
+        ])
+
     def dx_dt(self, x):
         """ Calculate the time derivative of the species concentrations
 
@@ -405,30 +524,22 @@ class GlycolysisModel(object):
         Returns:
             :obj:`numpy.array`: time derivative of the species concentrations (mM min\ :sup:`-1`)
         """
-        return numpy.array([
-            self.dACE_dt(x),
-            self.dBPG_dt(x),
-            self.dF16BP_dt(x),
-            self.dF6P_dt(x),
-            self.dG6P_dt(x),
-            self.dGLCi_dt(x),
-            self.dNAD_dt(x),
-            self.dNADH_dt(x),
-            self.dP2G_dt(x),
-            self.dP3G_dt(x),
-            self.dPEP_dt(x),
-            self.dPYR_dt(x),
-            self.dPrb_dt(x),
-            self.dTRIO_dt(x),
-        ])
+        return self.stoichiometry.dot(self.fluxes(x))
 
-    def simulate(self, t_0=0, t_end=20.0, t_step=0.2):
+    def simulate(self, t_0=0, t_end=20.0, t_step=0.2, steady_state_tol=None, method='BDF', compiled=False):
         """ Simulate the model
 
         Args:
             t_0 (:obj:`float`, optional): start time (min)
             t_end (:obj:`float`, optional): end time (min)
             t_step (:obj:`float`, optional): time step to record predicted concentrations (min)
+            steady_state_tol (:obj:`float`, optional): if set, stop the integration once the norm of the time
+                derivatives falls below this tolerance (mM min\ :sup:`-1`), and report the steady state for the
+                subsequent time points
+            method (:obj:`str`, optional): integration method; the implicit methods (:obj:`BDF` and :obj:`Radau`)
+                estimate the Jacobian using its sparsity pattern
+            compiled (:obj:`bool`, optional): if :obj:`True`, integrate a right-hand side generated by
+                :obj:`codegen.compile_model`, compiled with numba if it is installed
 
         Returns:
             :obj:`tuple`:
@@ -437,7 +548,10 @@ class GlycolysisModel(object):
         """
         assert ((t_end - t_0) / t_step % 1 == 0)
         t = numpy.linspace(t_0, t_end, int((t_end - t_0) / t_step) + 1)
-        x = odeint(lambda x, t: self.dx_dt(x), self.x_0, t)
+        dx_dt = codegen.compile_model(self, jit=True).dx_dt if compiled else self.dx_dt
+        x = ode.integrate(lambda t, x: dx_dt(x), self.x_0, t_0, t_end, t_eval=t, method=method,
+                          jac_sparsity=self.get_jacobian_sparsity() if method in ['BDF', 'Radau'] else None,
+                          steady_state_tol=steady_state_tol).x
         trio = x[:, -1]
 
         dhap = trio / (self.KeqTPI + 1)
@@ -497,6 +611,8 @@ class GlycerolModel(object):
 
         g3p_0 (:obj:`numpy.array`): initial G3P concentration (mM)
         x_0 (:obj:`numpy.array`): initial species concentrations (mM)
+
+        observable_ids (:obj:`tuple` of :obj:`str`): ids of the concentrations returned by :obj:`simulate`
     """
     ADP = 2.17
     ATP = 2.37
@@ -524,6 +640,8 @@ class GlycerolModel(object):
 
     g3p_0 = 0
 
+    observable_ids = ('DHAP', 'G3P')
+
     @property
     def x_0(self):
         return numpy.array([self.g3p_0])
@@ -576,13 +694,70 @@ class GlycerolModel(object):
 
         return numpy.array([self.dg3p_dt(x)])
 
-    def simulate(self, t_0=0, t_end=20.0, t_step=0.2):
+    def get_submodel(self, glycolysis_model):
+        """ Get a declarative description of the model which can be composed with the glycolysis model. Rather than
+        holding the concentrations of the other metabolites constant, the submodel shares F16BP, NAD, NADH, the high
+        energy phosphates (Prb), and the triose phosphates (TRIO) with the glycolysis model. DHAP is calculated from
+        TRIO using the equilibrium constant of triose phosphate isomerase, and ATP and ADP are calculated from Prb.
+        The reactions are numbered after those of the glycolysis model.
+
+        Args:
+            glycolysis_model (:obj:`GlycolysisModel`): glycolysis model which defines the equilibrium constant of
+                triose phosphate isomerase and the initial concentrations of the shared species
+
+        Returns:
+            :obj:`Submodel`: submodel
+        """
+        species_ids = ('F16BP', 'NAD', 'NADH', 'Prb', 'TRIO', 'G3P')
+        reaction_ids = ('v_18', 'v_19')
+        stoichiometry = numpy.array([
+            # 18  19
+            [0, 0],  # F16BP
+            [1, 0],  # NAD
+            [-1, 0],  # NADH
+            [0, 0],  # Prb
+            [-1, 0],  # TRIO
+            [1, -1],  # G3P
+        ], dtype=float)
+
+        def fluxes(x):
+            F16BP, NAD, NADH, Prb, TRIO, G3P = x
+            ATP = Prb * 2 / 3
+            ADP = Prb / 3
+            DHAP = TRIO / (glycolysis_model.KeqTPI + 1)
+
+            # Glycerol 3-phosphate dehydrogenase (DHAP <=> G3P)
+            v_18 = (self.Vf1 * (DHAP * NADH - (NAD * G3P) / self.Keq1)) / \
+                (self.K1dhap * (1 + ADP / self.K1adp + ATP / self.K1atp + F16BP / self.K1f16bp)
+                 * self.K1nadh * (1 + NAD / self.K1nad + NADH / self.K1nadh) *
+                 (1 + DHAP / self.K1dhap + G3P / self.K1g3p))
+
+            # Glycerol 3-phosphatase (G3P <=> Gly)
+            v_19 = self.V2 * G3P / (self.K2g3p * (1 + self.Phi / self.K2phi) * (1 + G3P / self.K2g3p))
+
+            return numpy.array([v_18, v_19])
+
+        x_0 = [
+            glycolysis_model.F16BP_0,
+            glycolysis_model.NAD_0,
+            glycolysis_model.NADH_0,
+            glycolysis_model.Prb_0,
+            glycolysis_model.TRIO_0,
+            self.g3p_0,
+        ]
+
+        return Submodel('glycerol_synthesis', species_ids, reaction_ids, stoichiometry, fluxes, x_0)
+
+    def simulate(self, t_0=0, t_end=20.0, t_step=0.2, steady_state_tol=None):
         """ Simulate the model
 
         Args:
             t_0 (:obj:`float`, optional): start time (min)
             t_end (:obj:`float`, optional): end time (min)
             t_step (:obj:`float`, optional): time step to record predicted concentrations (min)
+            steady_state_tol (:obj:`float`, optional): if set, stop the integration once the norm of the time
+                derivatives falls below this tolerance (mM min\ :sup:`-1`), and report the steady state for the
+                subsequent time points
 
         Returns:
             :obj:`tuple`:
@@ -593,7 +768,8 @@ class GlycerolModel(object):
         assert ((t_end - t_0) / t_step % 1 == 0)
         t = numpy.linspace(t_0, t_end, int((t_end - t_0) / t_step) + 1)
         dhap = self.DHAP * numpy.ones(t.shape)
-        g3p = odeint(lambda x, t: self.dx_dt(x), self.x_0, t)
+        g3p = ode.integrate(lambda t, x: self.dx_dt(x), self.x_0, t_0, t_end, t_eval=t,
+                            steady_state_tol=steady_state_tol).x
 
         return (t, dhap, g3p)
 
@@ -629,12 +805,31 @@ class MergedModel(object):
         glycerol_model (:obj:`GlycerolModel`): glycerol model
 
         x_0 (:obj:`numpy.array`): initial species concentrations (mM)
+
+        species_ids (:obj:`tuple` of :obj:`str`): ids of the species, in the order of the state vector
+        reaction_ids (:obj:`tuple` of :obj:`str`): ids of the rate laws of the reactions
+        stoichiometry (:obj:`numpy.ndarray`): stoichiometry of each species (rows) in each reaction (columns)
+        observable_ids (:obj:`tuple` of :obj:`str`): ids of the concentrations returned by :obj:`simulate`
     """
 
+    observable_ids = ('DHAP', 'G3P')
+    species_ids = GlycolysisModel.species_ids + ('G3P',)
+    reaction_ids = GlycolysisModel.reaction_ids + ('v_18', 'v_19')
+    _jacobian_sparsity = None
+
     def __init__(self):
         self.glycolysis_model = GlycolysisModel()
         self.glycerol_model = GlycerolModel()
 
+        # Glycerol 3-phosphate dehydrogenase of the glycolysis model (v_16) is replaced by that of the glycerol model
+        # (v_18), which also produces G3P, and G3P is consumed by glycerol 3-phosphatase (v_19)
+        self.stoichiometry = numpy.zeros((len(self.species_ids), len(self.reaction_ids)))
+        self.stoichiometry[0:-1, 0:-2] = self.glycolysis_model.stoichiometry
+        self.stoichiometry[0:-1, 17] = self.glycolysis_model.stoichiometry[:, 15]
+        self.stoichiometry[0:-1, 15] = 0
+        self.stoichiometry[-1, 17] = 1
+        self.stoichiometry[-1, 18] = -1
+
     @property
     def x_0(self):
         return numpy.array([
@@ -674,6 +869,54 @@ class MergedModel(object):
         # Glycerol 3-phosphatase (G3P <=> Gly)
         return self.glycerol_model.v_2(x[14:15])
 
+    def fluxes(self, x):
+        """ Calculate the flux of each reaction, evaluating each rate law once
+
+        Args:
+            x (:obj:`numpy.array`): species concentrations (mM)
+
+        Returns:
+            :obj:`numpy.array`: flux of each reaction, in the order of :obj:`reaction_ids` (mM min\ :sup:`-1`)
+        """
+        return numpy.concatenate((
+            self.glycolysis_model.fluxes(x[0:-1]),
+            numpy.array([self.v_18(x), self.v_19(x)]),
+        ))
+
+    def get_rate_laws(self):
+        """ Get the rate law of each reaction
+
+        Returns:
+            :obj:`list` of :obj:`function`: rate law of each reaction, in the order of :obj:`reaction_ids`
+        """
+        glycolysis_rate_laws = [lambda x, rate_law=rate_law: rate_law(x[0:-1])
+                                for rate_law in self.glycolysis_model.get_rate_laws()]
+        return glycolysis_rate_laws + [self.v_18, self.v_19]
+
+    def get_jacobian_sparsity(self):
+        """ Get the sparsity pattern of the Jacobian. The pattern is derived once and reused by subsequent calls.
+
+        Returns:
+            :obj:`scipy.sparse.csc_matrix`: sparsity pattern of the Jacobian
+        """
+        if self._jacobian_sparsity is None:
+            self._jacobian_sparsity = get_jacobian_sparsity(self.stoichiometry,
+                                                            get_rate_dependencies(self.get_rate_laws(), self.x_0))
+        return self._jacobian_sparsity
+
+    def get_submodels(self):
+        """ Get declarative descriptions of the glycolysis and glycerol synthesis submodels, which can be merged by
+        :obj:`ComposedModel` by replacing glycerol 3-phosphate dehydrogenase of the glycolysis model (v_16) with that
+        of the glycerol synthesis model (v_18)
+
+        Returns:
+            :obj:`list` of :obj:`Submodel`: submodels
+        """
+        return [
+            self.glycolysis_model.get_submodel(),
+            self.glycerol_model.get_submodel(self.glycolysis_model),
+        ]
+
     def dx_dt(self, x):
         """ Calculate the time derivative of the species concentrations
 
@@ -683,22 +926,22 @@ class MergedModel(object):
         Returns:
             :obj:`numpy.array`: time derivative of the species concentrations (mM min\ :sup:`-1`)
         """
-        dx_dt = numpy.concatenate((
-            self.glycolysis_model.dx_dt(x[0:-1]),
-            numpy.array([1.0 * self.v_18(x) - 1.0 * self.v_19(x)]),
-        ))
-        dx_dt[6] += -1.0 * self.glycolysis_model.v_16(x[0:-1]) + 1.0 * self.v_18(x)
-        dx_dt[7] += 1.0 * self.glycolysis_model.v_16(x[0:-1]) - 1.0 * self.v_18(x)
-        dx_dt[13] += 1.0 * self.glycolysis_model.v_16(x[0:-1]) - 1.0 * self.v_18(x)
-        return dx_dt
+        return self.stoichiometry.dot(self.fluxes(x))
 
-    def simulate(self, t_0=0, t_end=20.0, t_step=0.2):
+    def simulate(self, t_0=0, t_end=20.0, t_step=0.2, steady_state_tol=None, method='BDF', compiled=False):
         """ Simulate the model
 
         Args:
             t_0 (:obj:`float`, optional): start time (min)
             t_end (:obj:`float`, optional): end time (min)
             t_step (:obj:`float`, optional): time step to record predicted concentrations (min)
+            steady_state_tol (:obj:`float`, optional): if set, stop the integration once the norm of the time
+                derivatives falls below this tolerance (mM min\ :sup:`-1`), and report the steady state for the
+                subsequent time points
+            method (:obj:`str`, optional): integration method; the implicit methods (:obj:`BDF` and :obj:`Radau`)
+                estimate the Jacobian using its sparsity pattern
+            compiled (:obj:`bool`, optional): if :obj:`True`, integrate a right-hand side generated by
+                :obj:`codegen.compile_model`, compiled with numba if it is installed
 
         Returns:
             :obj:`tuple`:
@@ -708,7 +951,10 @@ class MergedModel(object):
         """
         assert ((t_end - t_0) / t_step % 1 == 0)
         t = numpy.linspace(t_0, t_end, int((t_end - t_0) / t_step) + 1)
-        x = odeint(lambda x, t: self.dx_dt(x), self.x_0, t)
+        dx_dt = codegen.compile_model(self, jit=True).dx_dt if compiled else self.dx_dt
+        x = ode.integrate(lambda t, x: dx_dt(x), self.x_0, t_0, t_end, t_eval=t, method=method,
+                          jac_sparsity=self.get_jacobian_sparsity() if method in ['BDF', 'Radau'] else None,
+                          steady_state_tol=steady_state_tol).x
 
         trio = x[:, -2]
         dhap = trio / (self.glycolysis_model.KeqTPI + 1)
@@ -717,11 +963,505 @@ class MergedModel(object):
         return (t, dhap, g3p)
 
 
+class Submodel(object):
+    """ Declarative description of a submodel which can be merged with other submodels by :obj:`ComposedModel`
+
+    Attributes:
+        id (:obj:`str`): id
+        species_ids (:obj:`tuple` of :obj:`str`): ids of the species which the submodel reads or updates, in the order
+            of its local state vector
+        reaction_ids (:obj:`tuple` of :obj:`str`): ids of the reactions
+        stoichiometry (:obj:`numpy.ndarray`): stoichiometry of each species (rows) in each reaction (columns)
+        fluxes (:obj:`function`): function which calculates the flux of each reaction (mM min\ :sup:`-1`) from the
+            local species concentrations (mM)
+        x_0 (:obj:`numpy.array`): initial concentrations of the species (mM)
+        flux_jacobian (:obj:`function`): function which calculates the partial derivatives of the fluxes (rows)
+            with respect to the local species concentrations (columns); if :obj:`None`, the derivatives are
+            estimated by finite differences
+    """
+
+    def __init__(self, id, species_ids, reaction_ids, stoichiometry, fluxes, x_0, flux_jacobian=None):
+        """
+        Args:
+            id (:obj:`str`): id
+            species_ids (:obj:`tuple` of :obj:`str`): ids of the species which the submodel reads or updates
+            reaction_ids (:obj:`tuple` of :obj:`str`): ids of the reactions
+            stoichiometry (:obj:`numpy.ndarray`): stoichiometry of each species (rows) in each reaction (columns)
+            fluxes (:obj:`function`): function which calculates the flux of each reaction from the local species
+                concentrations
+            x_0 (:obj:`numpy.array`): initial concentrations of the species (mM)
+            flux_jacobian (:obj:`function`, optional): function which calculates the partial derivatives of the
+                fluxes with respect to the local species concentrations
+
+        Raises:
+            :obj:`ValueError`: if the dimensions of the stoichiometry or initial concentrations don't match the
+                species and reactions
+        """
+        self.id = id
+        self.species_ids = tuple(species_ids)
+        self.reaction_ids = tuple(reaction_ids)
+        self.stoichiometry = numpy.array(stoichiometry, dtype=float)
+        self.fluxes = fluxes
+        self.x_0 = numpy.array(x_0, dtype=float)
+        self.flux_jacobian = flux_jacobian
+
+        if self.stoichiometry.shape != (len(self.species_ids), len(self.reaction_ids)):
+            raise ValueError('The stoichiometry of submodel {} must have one row for each of its {} species and one '
+                             'column for each of its {} reactions'.format(
+                                 id, len(self.species_ids), len(self.reaction_ids)))
+        if self.x_0.shape != (len(self.species_ids), ):
+            raise ValueError('Submodel {} must have one initial concentration for each of its {} species'.format(
+                id, len(self.species_ids)))
+
+
+class ComposedModel(object):
+    """ Model composed by merging submodels
+
+    Species which are shared among submodels are identified by their ids. The state vector contains each species
+    once, in the order in which the species are first declared by the submodels, and the reactions are ordered by
+    submodel.
+
+    Attributes:
+        submodels (:obj:`list` of :obj:`Submodel`): submodels
+        excluded_reaction_ids (:obj:`set` of :obj:`str`): ids of reactions of the submodels which are excluded from
+            the composed model, e.g., because they are redundant with reactions of other submodels
+        species_ids (:obj:`tuple` of :obj:`str`): ids of the species, in the order of the state vector
+        reaction_ids (:obj:`tuple` of :obj:`str`): ids of the reactions, in the order of the flux vector
+        stoichiometry (:obj:`scipy.sparse.csr_matrix`): stoichiometry of each species (rows) in each reaction
+            (columns)
+        x_0 (:obj:`numpy.array`): initial species concentrations (mM)
+    """
+
+    _jacobian_sparsity = None
+
+    def __init__(self, submodels, excluded_reaction_ids=()):
+        """
+        Args:
+            submodels (:obj:`list` of :obj:`Submodel`): submodels
+            excluded_reaction_ids (:obj:`list` of :obj:`str`, optional): ids of reactions of the submodels which
+                should be excluded from the composed model
+
+        Raises:
+            :obj:`ValueError`: if reaction ids are repeated, excluded reactions aren't defined, or the initial
+                concentrations of shared species are inconsistent
+        """
+        self.submodels = list(submodels)
+        self.excluded_reaction_ids = set(excluded_reaction_ids)
+
+        # merge the species
+        species_ids = []
+        species_indices = {}
+        x_0 = []
+        for submodel in self.submodels:
+            for species_id, species_x_0 in zip(submodel.species_ids, submodel.x_0):
+                if species_id not in species_indices:
+                    species_indices[species_id] = len(species_ids)
+                    species_ids.append(species_id)
+                    x_0.append(species_x_0)
+                elif x_0[species_indices[species_id]] != species_x_0:
+                    raise ValueError('The initial concentrations of shared species {} are inconsistent'.format(
+                        species_id))
+        self.species_ids = tuple(species_ids)
+        self.x_0 = numpy.array(x_0)
+
+        # merge the reactions
+        reaction_ids = []
+        self._species_indices = []
+        self._reaction_indices = []
+        for submodel in self.submodels:
+            i_reactions = []
+            for i_reaction, reaction_id in enumerate(submodel.reaction_ids):
+                if reaction_id in reaction_ids:
+                    raise ValueError('Reaction {} is defined by multiple submodels'.format(reaction_id))
+                if reaction_id not in self.excluded_reaction_ids:
+                    i_reactions.append(i_reaction)
+                    reaction_ids.append(reaction_id)
+            self._species_indices.append(numpy.array([species_indices[species_id]
+                                                      for species_id in submodel.species_ids], dtype=int))
+            self._reaction_indices.append(numpy.array(i_reactions, dtype=int))
+        self.reaction_ids = tuple(reaction_ids)
+
+        undefined_reaction_ids = self.excluded_reaction_ids.difference(
+            reaction_id for submodel in self.submodels for reaction_id in submodel.reaction_ids)
+        if undefined_reaction_ids:
+            raise ValueError('Excluded reactions {} are not defined'.format(', '.join(sorted(undefined_reaction_ids))))
+
+        # merge the stoichiometries
+        rows = []
+        cols = []
+        values = []
+        col_offset = 0
+        for submodel, i_species, i_reactions in zip(self.submodels, self._species_indices, self._reaction_indices):
+            submodel_rows, submodel_cols = numpy.nonzero(submodel.stoichiometry[:, i_reactions])
+            rows.append(i_species[submodel_rows])
+            cols.append(submodel_cols + col_offset)
+            values.append(submodel.stoichiometry[:, i_reactions][submodel_rows, submodel_cols])
+            col_offset += i_reactions.size
+        self.stoichiometry = sparse.csr_matrix(
+            (numpy.concatenate(values), (numpy.concatenate(rows), numpy.concatenate(cols))),
+            shape=(len(self.species_ids), len(self.reaction_ids)))
+
+    def fluxes(self, x):
+        """ Calculate the flux of each reaction
+
+        Args:
+            x (:obj:`numpy.array`): species concentrations (mM)
+
+        Returns:
+            :obj:`numpy.array`: flux of each reaction, in the order of :obj:`reaction_ids` (mM min\ :sup:`-1`)
+        """
+        return numpy.concatenate([
+            submodel.fluxes(x[i_species])[i_reactions]
+            for submodel, i_species, i_reactions in zip(self.submodels, self._species_indices, self._reaction_indices)
+        ])
+
+    def dx_dt(self, x):
+        """ Calculate the time derivative of the species concentrations
+
+        Args:
+            x (:obj:`numpy.array`): species concentrations (mM)
+
+        Returns:
+            :obj:`numpy.array`: time derivative of the species concentrations (mM min\ :sup:`-1`)
+        """
+        return self.stoichiometry.dot(self.fluxes(x))
+
+    def get_flux_jacobian(self, x, rel_step=1.49012e-8):
+        """ Calculate the partial derivatives of the fluxes with respect to the species concentrations. The
+        derivatives of each submodel which doesn't provide them analytically are estimated by forward differences with
+        respect to its own species.
+
+        Args:
+            x (:obj:`numpy.array`): species concentrations (mM)
+            rel_step (:obj:`float`, optional): relative step size of the finite differences
+
+        Returns:
+            :obj:`numpy.ndarray`: partial derivative of each flux (rows) with respect to each species concentration
+            (columns) (min\ :sup:`-1`)
+        """
+        x = numpy.array(x, dtype=float)
+        flux_jacobian = numpy.zeros((len(self.reaction_ids), len(self.species_ids)))
+        row_offset = 0
+        for submodel, i_species, i_reactions in zip(self.submodels, self._species_indices, self._reaction_indices):
+            x_submodel = x[i_species]
+            if submodel.flux_jacobian:
+                submodel_flux_jacobian = submodel.flux_jacobian(x_submodel)
+            else:
+                fluxes = submodel.fluxes(x_submodel)
+                submodel_flux_jacobian = numpy.zeros((fluxes.size, x_submodel.size))
+                for i_submodel_species in range(x_submodel.size):
+                    x_perturbed = x_submodel.copy()
+                    step = rel_step * max(abs(x_submodel[i_submodel_species]), 1.)
+                    x_perturbed[i_submodel_species] += step
+                    submodel_flux_jacobian[:, i_submodel_species] = (submodel.fluxes(x_perturbed) - fluxes) / step
+
+            rows = numpy.arange(row_offset, row_offset + i_reactions.size)
+            flux_jacobian[rows[:, numpy.newaxis], i_species[numpy.newaxis, :]] += submodel_flux_jacobian[i_reactions, :]
+            row_offset += i_reactions.size
+        return flux_jacobian
+
+    def jacobian(self, x):
+        """ Calculate the Jacobian of the time derivatives of the species concentrations
+
+        Args:
+            x (:obj:`numpy.array`): species concentrations (mM)
+
+        Returns:
+            :obj:`numpy.ndarray`: partial derivative of the time derivative of each species (rows) with respect to the
+            concentration of each species (columns) (min\ :sup:`-1`)
+        """
+        return self.stoichiometry.dot(self.get_flux_jacobian(x))
+
+    def get_jacobian_sparsity(self):
+        """ Get the sparsity pattern of the Jacobian. The pattern is derived once and reused by subsequent calls.
+
+        Returns:
+            :obj:`scipy.sparse.csc_matrix`: sparsity pattern of the Jacobian
+        """
+        if self._jacobian_sparsity is None:
+            rate_dependencies = numpy.zeros((len(self.reaction_ids), len(self.species_ids)), dtype=bool)
+            row_offset = 0
+            for submodel, i_species, i_reactions in zip(self.submodels, self._species_indices, self._reaction_indices):
+                rate_laws = [lambda x, i_reaction=i_reaction: submodel.fluxes(x)[i_reaction]
+                             for i_reaction in i_reactions]
+                rows = numpy.arange(row_offset, row_offset + i_reactions.size)
+                rate_dependencies[rows[:, numpy.newaxis], i_species[numpy.newaxis, :]] = \
+                    get_rate_dependencies(rate_laws, submodel.x_0)
+                row_offset += i_reactions.size
+            self._jacobian_sparsity = get_jacobian_sparsity(self.stoichiometry.toarray(), rate_dependencies)
+        return self._jacobian_sparsity
+
+    def simulate(self, t_0=0, t_end=20.0, t_step=0.2, steady_state_tol=None, method='BDF', compiled=False):
+        """ Simulate the model
+
+        Args:
+            t_0 (:obj:`float`, optional): start time (min)
+            t_end (:obj:`float`, optional): end time (min)
+            t_step (:obj:`float`, optional): time step to record predicted concentrations (min)
+            steady_state_tol (:obj:`float`, optional): if set, stop the integration once the norm of the time
+                derivatives falls below this tolerance (mM min\ :sup:`-1`), and report the steady state for the
+                subsequent time points
+            method (:obj:`str`, optional): integration method; the implicit methods (:obj:`BDF` and :obj:`Radau`)
+                use the Jacobian assembled from the submodels
+            compiled (:obj:`bool`, optional): if :obj:`True`, integrate a right-hand side generated by
+                :obj:`codegen.compile_model`, compiled with numba if it is installed
+
+        Returns:
+            :obj:`tuple`:
+                * :obj:`numpy.array`: time (min)
+                * :obj:`numpy.ndarray`: species concentrations (rows: time, columns: species) (mM)
+        """
+        assert ((t_end - t_0) / t_step % 1 == 0)
+        t = numpy.linspace(t_0, t_end, int((t_end - t_0) / t_step) + 1)
+        dx_dt = codegen.compile_model(self, jit=True).dx_dt if compiled else self.dx_dt
+        x = ode.integrate(lambda t, x: dx_dt(x), self.x_0, t_0, t_end, t_eval=t, method=method,
+                          jac=(lambda t, x: self.jacobian(x)) if method in ['BDF', 'Radau'] else None,
+                          steady_state_tol=steady_state_tol).x
+        return (t, x)
+
+
+def get_rate_dependencies(rate_laws, x, n_samples=3, rel_step=1e-3):
+    """ Determine which species each rate law depends on by perturbing the concentration of each species
+
+    Args:
+        rate_laws (:obj:`list` of :obj:`function`): rate law of each reaction
+        x (:obj:`numpy.array`): typical species concentrations (mM) around which to sample
+        n_samples (:obj:`int`, optional): number of random states at which to probe the rate laws
+        rel_step (:obj:`float`, optional): relative perturbation of each concentration
+
+    Returns:
+        :obj:`numpy.ndarray`: boolean matrix which indicates whether each rate law (rows) depends on each species
+        (columns)
+    """
+    random_state = numpy.random.RandomState(0)
+    x = numpy.array(x, dtype=float)
+    dependencies = numpy.zeros((len(rate_laws), x.size), dtype=bool)
+    for i_sample in range(n_samples):
+        x_sample = numpy.maximum(x, 0.1) * random_state.uniform(0.5, 1.5, x.size)
+        rates = numpy.array([rate_law(x_sample) for rate_law in rate_laws])
+        for i_species in range(x.size):
+            x_perturbed = x_sample.copy()
+            x_perturbed[i_species] *= 1 + rel_step
+            dependencies[:, i_species] |= numpy.array([rate_law(x_perturbed) for rate_law in rate_laws]) != rates
+    return dependencies
+
+
+def get_jacobian_sparsity(stoichiometry, rate_dependencies):
+    """ Get the sparsity pattern of the Jacobian of a reaction network
+
+    Args:
+        stoichiometry (:obj:`numpy.ndarray`): stoichiometry of each species (rows) in each reaction (columns)
+        rate_dependencies (:obj:`numpy.ndarray`): boolean matrix which indicates whether each rate law (rows) depends
+            on each species (columns)
+
+    Returns:
+        :obj:`scipy.sparse.csc_matrix`: sparsity pattern of the Jacobian
+    """
+    return sparse.csc_matrix((stoichiometry != 0).astype(int).dot(rate_dependencies.astype(int)) > 0)
+
+
+def benchmark_solvers(model, methods=('odeint', 'LSODA', 'BDF', 'Radau'), t_end=20.0, t_step=0.2, compiled=False):
+    """ Compare the wall time and number of evaluations of the right-hand side of several integration methods,
+    including :obj:`scipy.integrate.odeint` without a Jacobian
+
+    Args:
+        model (:obj:`GlycolysisModel`, :obj:`MergedModel` or :obj:`ComposedModel`): model
+        methods (:obj:`tuple` of :obj:`str`, optional): integration methods
+        t_end (:obj:`float`, optional): end time (min)
+        t_step (:obj:`float`, optional): time step to record predicted concentrations (min)
+        compiled (:obj:`bool`, optional): if :obj:`True`, integrate a right-hand side generated by
+            :obj:`codegen.compile_model`, compiled with numba if it is installed. The right-hand side is generated
+            and compiled before the integrations are timed.
+
+    Returns:
+        :obj:`dict`: dictionary which maps each method to a dictionary of its wall time (s), number of evaluations of
+        the right-hand side, and predicted concentrations
+    """
+    t = numpy.linspace(0, t_end, int(t_end / t_step) + 1)
+    if compiled:
+        model_dx_dt = codegen.compile_model(model, jit=True).dx_dt
+        model_dx_dt(model.x_0)
+    else:
+        model_dx_dt = model.dx_dt
+    results = {}
+    for method in methods:
+        n_rhs_evals = [0]
+
+        def dx_dt(x):
+            n_rhs_evals[0] += 1
+            return model_dx_dt(x)
+
+        start_time = time.time()
+        if method == 'odeint':
+            x = integrate.odeint(lambda x, t: dx_dt(x), model.x_0, t)
+        else:
+            jac_sparsity = model.get_jacobian_sparsity() if method in ['BDF', 'Radau'] else None
+            x = ode.integrate(lambda t, x: dx_dt(x), model.x_0, 0., t_end, t_eval=t, method=method,
+                              jac_sparsity=jac_sparsity).x
+        results[method] = {
+            'wall_time': time.time() - start_time,
+            'n_rhs_evals': n_rhs_evals[0],
+            'x': x,
+        }
+    return results
+
+
+def compare_models(variants, reference_id=None, t_end=20.0, t_step=0.2, n_processes=None):
+    """ Simulate several variants of the models in parallel, and compare their predictions of their shared observables
+    (e.g., DHAP and G3P)
+
+    Args:
+        variants (:obj:`dict`): dictionary which maps the id of each variant to a tuple of a model class (e.g.,
+            :obj:`MergedModel`) and a dictionary which maps the names of parameters to perturbed values. Parameters of
+            submodels are named by their paths (e.g., ``glycerol_model.Vf1``).
+        reference_id (:obj:`str`, optional): id of the variant to compare the other variants with; defaults to the
+            first variant
+        t_end (:obj:`float`, optional): end time (min)
+        t_step (:obj:`float`, optional): time step to record predicted concentrations (min)
+        n_processes (:obj:`int`, optional): number of processes; if 1, simulate the variants in this process
+
+    Returns:
+        :obj:`tuple`:
+
+            * :obj:`numpy.ndarray`: structured array with the variant, observable, time (min) and concentration (mM)
+              of each prediction
+            * :obj:`numpy.ndarray`: structured array with the maximum absolute difference, root mean square difference,
+              and final difference (mM) of each observable of each variant from the reference variant
+    """
+    variant_ids = list(variants.keys())
+    reference_id = reference_id or variant_ids[0]
+    if reference_id not in variants:
+        raise ValueError('Reference variant {} is not defined'.format(reference_id))
+
+    jobs = [(variant_id, variants[variant_id][0], variants[variant_id][1], t_end, t_step) for variant_id in variant_ids]
+
+    if n_processes is None:
+        n_processes = min(len(jobs), os.cpu_count() or 1)
+
+    if n_processes <= 1:
+        variant_results = [_simulate_variant(*job) for job in jobs]
+    else:
+        with futures.ProcessPoolExecutor(max_workers=n_processes) as executor:
+            variant_results = list(executor.map(_simulate_variant, *zip(*jobs)))
+
+    # tabulate the predictions
+    observable_ids = sorted(set(observable_id for _, observables in variant_results for observable_id in observables))
+    id_len = max([len(id) for id in variant_ids + observable_ids] + [1])
+    n_predictions = sum(t.size * len(observables) for t, observables in variant_results)
+    results = numpy.zeros(n_predictions, dtype=[
+        ('variant', 'U{}'.format(id_len)),
+        ('observable', 'U{}'.format(id_len)),
+        ('time', float),
+        ('concentration', float),
+    ])
+    i_prediction = 0
+    for variant_id, (t, observables) in zip(variant_ids, variant_results):
+        for observable_id in observable_ids:
+            if observable_id in observables:
+                predictions = results[i_prediction:i_prediction + t.size]
+                predictions['variant'] = variant_id
+                predictions['observable'] = observable_id
+                predictions['time'] = t
+                predictions['concentration'] = observables[observable_id]
+                i_prediction += t.size
+
+    # compare the variants with the reference on their shared observables
+    _, reference_observables = variant_results[variant_ids.index(reference_id)]
+    divergences = []
+    for variant_id, (t, observables) in zip(variant_ids, variant_results):
+        for observable_id in observable_ids:
+            if observable_id in observables and observable_id in reference_observables:
+                diff = observables[observable_id] - reference_observables[observable_id]
+                divergences.append((variant_id, observable_id, numpy.max(numpy.abs(diff)),
+                                    numpy.sqrt(numpy.mean(diff ** 2)), diff[-1]))
+    divergences = numpy.array(divergences, dtype=[
+        ('variant', 'U{}'.format(id_len)),
+        ('observable', 'U{}'.format(id_len)),
+        ('max_abs_diff', float),
+        ('rms_diff', float),
+        ('final_diff', float),
+    ])
+
+    return (results, divergences)
+
+
+def _simulate_variant(variant_id, model_class, parameters, t_end, t_step):
+    """ Simulate a variant of a model
+
+    Args:
+        variant_id (:obj:`str`): id of the variant
+        model_class (:obj:`type`): model class
+        parameters (:obj:`dict`): dictionary which maps the paths of parameters to perturbed values
+        t_end (:obj:`float`): end time (min)
+        t_step (:obj:`float`): time step to record predicted concentrations (min)
+
+    Returns:
+        :obj:`tuple`:
+
+            * :obj:`numpy.array`: time (min)
+            * :obj:`dict`: dictionary which maps the id of each observable to its predicted concentrations (mM)
+
+    Raises:
+        :obj:`ValueError`: if a parameter isn't defined or the simulation fails
+    """
+    model = model_class()
+    for path, value in parameters.items():
+        obj = model
+        names = path.split('.')
+        for name in names[0:-1]:
+            obj = getattr(obj, name)
+        if not hasattr(obj, names[-1]):
+            raise ValueError('Variant {}: {} does not have parameter {}'.format(
+                variant_id, model_class.__name__, path))
+        setattr(obj, names[-1], value)
+
+    try:
+        t, *observables = model.simulate(t_end=t_end, t_step=t_step)
+    except ValueError as error:
+        raise ValueError('Variant {}: {}'.format(variant_id, str(error)))
+    return (t, {observable_id: numpy.ravel(observable)
+                for observable_id, observable in zip(model.observable_ids, observables)})
+
+
+def plot_comparison(results, ylims=None):
+    """ Plot the predictions of several variants of the models
+
+    Args:
+        results (:obj:`numpy.ndarray`): predictions of the variants (from :obj:`compare_models`)
+        ylims (:obj:`dict`, optional): dictionary which maps the ids of observables to their y-axis limits
+
+    Returns:
+        :obj:`matplotlib.figure.Figure`: figure
+    """
+    ylims = ylims or {}
+    observable_ids = sorted(set(results['observable']))
+    variant_ids = list(dict.fromkeys(results['variant']))
+
+    fig, axes = pyplot.subplots(nrows=len(observable_ids), ncols=1, squeeze=False)
+    for observable_id, axis in zip(observable_ids, axes[:, 0]):
+        for variant_id in variant_ids:
+            predictions = results[(results['variant'] == variant_id) & (results['observable'] == observable_id)]
+            if predictions.size:
+                axis.plot(predictions['time'], predictions['concentration'], label=variant_id)
+        axis.set_xlim((results['time'].min(), results['time'].max()))
+        if observable_id in ylims:
+            axis.set_ylim(ylims[observable_id])
+        axis.set_ylabel('{} (mM)'.format(observable_id))
+        axis.legend()
+    axes[-1, 0].set_xlabel('Time (min)')
+
+    return fig
+
+
 def main(out_dir=None):
     """ Simulate individual models and combined model, plot results, and save plots
 
     Args:
         out_dir (:obj:`str`, optional): path to directory to save results
+
+    Returns:
+        :obj:`numpy.ndarray`: differences between the predictions of the individual models and the merged model (see
+        :obj:`compare_models`)
     """
 
     out_dir = out_dir or os.path.join(os.path.dirname(__file__), '..', '..', 'docs', 'cell_modeling', 'model_composition')
@@ -730,47 +1470,39 @@ def main(out_dir=None):
     if not os.path.isdir(out_dir):
         os.makedirs(out_dir)
 
-    # simulate the glycolysis model
-    glycolysis_model = GlycolysisModel()
-    t, glycolysis_model_dhap = glycolysis_model.simulate()
-    fig = glycolysis_model.plot_simulation_results(t, glycolysis_model_dhap)
+    # simulate the glycolysis, glycerol and merged models
+    results, divergences = compare_models(collections.OrderedDict([
+        ('Merged', (MergedModel, {})),
+        ('Glycerol synthesis', (GlycerolModel, {})),
+        ('Glycolysis', (GlycolysisModel, {})),
+    ]))
+
+    def get_predictions(variant_id, observable_id):
+        predictions = results[(results['variant'] == variant_id) & (results['observable'] == observable_id)]
+        return (predictions['time'], predictions['concentration'])
+
+    # plot the results of the glycolysis model
+    t, glycolysis_model_dhap = get_predictions('Glycolysis', 'DHAP')
+    fig = GlycolysisModel().plot_simulation_results(t, glycolysis_model_dhap)
     # pyplot.show(block=False)
     filename = os.path.join(out_dir, 'glycolysis-model.png')
     fig.savefig(filename, transparent=True, bbox_inches='tight')
     pyplot.close(fig)
 
-    # simulate the glycerol model
-    glycerol_model = GlycerolModel()
-    t, glycerol_model_dhap, glycerol_model_g3p = glycerol_model.simulate()
-    fig = glycerol_model.plot_simulation_results(t, glycerol_model_dhap, glycerol_model_g3p)
+    # plot the results of the glycerol model
+    t, glycerol_model_dhap = get_predictions('Glycerol synthesis', 'DHAP')
+    t, glycerol_model_g3p = get_predictions('Glycerol synthesis', 'G3P')
+    fig = GlycerolModel().plot_simulation_results(t, glycerol_model_dhap, glycerol_model_g3p)
     # pyplot.show(block=False)
     filename = os.path.join(out_dir, 'glycerol-model.png')
     fig.savefig(filename, transparent=True, bbox_inches='tight')
     pyplot.close(fig)
 
-    # simulate merged model
-    merged_model = MergedModel()
-    t, merged_model_dhap, merged_model_g3p = merged_model.simulate()
-
     # compare results
-    fig, axes = pyplot.subplots(nrows=2, ncols=1)
-
-    axes[0].plot(t, merged_model_dhap, label='Merged')
-    axes[0].plot(t, glycerol_model_dhap, label='Glycerol synthesis')
-    axes[0].plot(t, glycolysis_model_dhap, label='Glycolysis')
-    axes[0].set_xlim((t[0], t[-1]))
-    axes[0].set_ylim((0, 5.))
-    axes[0].set_ylabel('DHAP (mM)')
-    axes[0].legend()
-
-    axes[1].plot(t, merged_model_g3p, label='Merged')
-    axes[1].plot(t, glycerol_model_g3p, label='Glycerol synthesis model')
-    axes[1].set_xlim((t[0], t[-1]))
-    axes[1].set_ylim((0, 0.8))
-    axes[1].set_xlabel('Time (min)')
-    axes[1].set_ylabel('G3P (mM)')
-
+    fig = plot_comparison(results, ylims={'DHAP': (0, 5.), 'G3P': (0, 0.8)})
     # pyplot.show(block=False)
     filename = os.path.join(out_dir, 'merged-model.png')
     fig.savefig(filename, transparent=True, bbox_inches='tight')
     pyplot.close(fig)
+
+    return divergences
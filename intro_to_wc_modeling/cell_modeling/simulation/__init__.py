@@ -1,4 +1,5 @@
 from . import boolean
+from . import codegen
 from . import dfba
 from . import ode
 from . import stochastic
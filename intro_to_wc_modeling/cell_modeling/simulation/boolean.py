@@ -6,7 +6,9 @@
 :License: MIT
 """
 
+from concurrent import futures
 from matplotlib import pyplot
+import collections.abc
 import numpy
 import os
 
@@ -35,7 +37,7 @@ initial_state = {
 ################################
 
 
-def simulate(regulatory_functions, initial_state, n_steps, update_scheme):
+def simulate(regulatory_functions, initial_state, n_steps, update_scheme, run_length_encode=False):
     """ Simulates a Boolean network for :obj:`n_steps` using :obj:`update_scheme`
 
     Args:
@@ -43,20 +45,20 @@ def simulate(regulatory_functions, initial_state, n_steps, update_scheme):
         initial_state (:obj:`dict` of :obj:`str`, :obj:`bool`): dictionary of initial values of each species
         n_steps (:obj:`int`): number of steps to simulate
         update_scheme (:obj:`method`): update schema
+        run_length_encode (:obj:`bool`, optional): if :obj:`True`, only store the states which differ from the previous
+            state
 
     Returns:
         :obj:`tuple`:
 
             * :obj:`numpy.ndarray`: array of step numbers
-            * :obj:`dict` of :obj:`str`, :obj:`numpy.ndarray`: dictionary of histories of each species
+            * :obj:`BooleanHistory`: dictionary-like history of each species
     """
 
     # initalize data structures to store predicted time course and copy initial state to state history
     step_history = numpy.array(range(n_steps + 1))
-    state_history = {}
-    for node_name, node_initial_state in initial_state.items():
-        state_history[node_name] = numpy.full(n_steps + 1, False, bool)
-        state_history[node_name][0] = node_initial_state
+    state_history = BooleanHistory(list(initial_state.keys()), n_steps, run_length_encode=run_length_encode)
+    state_history.record(0, initial_state)
 
     # set current state to initial state
     current_state = initial_state
@@ -67,13 +69,118 @@ def simulate(regulatory_functions, initial_state, n_steps, update_scheme):
         current_state = update_scheme(regulatory_functions, step, current_state)
 
         # store current value
-        for node_name, node_current_state in current_state.items():
-            state_history[node_name][step] = node_current_state
+        state_history.record(step, current_state)
 
     # return predicted dynamics
     return (step_history, state_history)
 
 
+class BooleanHistory(collections.abc.Mapping):
+    """ Compact history of the states of a Boolean network
+
+    Each state is packed into a row of bytes, one bit per node, so the history of a network with :math:`n` nodes
+    requires :math:`n/8` bytes per step. Optionally, the history can be run-length encoded by only storing the states
+    which differ from the previous state, which compresses long stable stretches. The history of each node is unpacked
+    when it is accessed, as for a dictionary of arrays (e.g., ``history['A']``).
+
+    Attributes:
+        node_names (:obj:`tuple` of :obj:`str`): names of the nodes
+        n_steps (:obj:`int`): number of steps
+        run_length_encode (:obj:`bool`): if :obj:`True`, only the states which differ from the previous state are
+            stored
+    """
+
+    def __init__(self, node_names, n_steps, run_length_encode=False):
+        """
+        Args:
+            node_names (:obj:`list` of :obj:`str`): names of the nodes
+            n_steps (:obj:`int`): number of steps
+            run_length_encode (:obj:`bool`, optional): if :obj:`True`, only store the states which differ from the
+                previous state
+        """
+        self.node_names = tuple(node_names)
+        self.n_steps = n_steps
+        self.run_length_encode = run_length_encode
+        self._node_indices = {node_name: i_node for i_node, node_name in enumerate(self.node_names)}
+
+        n_bytes = -(-len(self.node_names) // 8)
+        if run_length_encode:
+            self._run_starts = []
+            self._run_states = []
+            self._packed_runs = None
+        else:
+            self._states = numpy.zeros((n_steps + 1, n_bytes), dtype=numpy.uint8)
+
+    def record(self, step, state):
+        """ Record a state. With run-length encoding, the states must be recorded in order.
+
+        Args:
+            step (:obj:`int`): step
+            state (:obj:`dict` of :obj:`str`, :obj:`bool`): dictionary of values of each node
+        """
+        packed_state = numpy.packbits(numpy.fromiter((state[node_name] for node_name in self.node_names),
+                                                     dtype=bool, count=len(self.node_names)))
+        if self.run_length_encode:
+            if not self._run_states or not numpy.array_equal(packed_state, self._run_states[-1]):
+                self._run_starts.append(step)
+                self._run_states.append(packed_state)
+                self._packed_runs = None
+        else:
+            self._states[step, :] = packed_state
+
+    @property
+    def nbytes(self):
+        """ :obj:`int`: number of bytes used to store the states """
+        if self.run_length_encode:
+            return sum(run_state.nbytes for run_state in self._run_states) + 8 * len(self._run_starts)
+        return self._states.nbytes
+
+    def _get_packed_states(self):
+        """ Get the packed states and the number of steps that each one lasts. With run-length encoding, the runs are
+        stacked once and reused until another state is recorded.
+
+        Returns:
+            :obj:`tuple`:
+
+                * :obj:`numpy.ndarray`: packed states
+                * :obj:`numpy.ndarray`: number of consecutive steps of each state, or :obj:`None` if each state lasts
+                  one step
+        """
+        if self.run_length_encode:
+            if self._packed_runs is None:
+                run_starts = numpy.array(self._run_starts + [self.n_steps + 1])
+                run_states = numpy.array(self._run_states).reshape((len(self._run_states), -1))
+                self._packed_runs = (run_states, numpy.diff(run_starts))
+            return self._packed_runs
+        return (self._states, None)
+
+    def __getitem__(self, node_name):
+        i_node = self._node_indices[node_name]
+        packed_states, run_lengths = self._get_packed_states()
+        values = (packed_states[:, i_node // 8] >> (7 - i_node % 8)) & 1 == 1
+        if run_lengths is not None:
+            values = numpy.repeat(values, run_lengths)
+        return values
+
+    def __iter__(self):
+        return iter(self.node_names)
+
+    def __len__(self):
+        return len(self.node_names)
+
+    def to_array(self):
+        """ Unpack the history of all of the nodes
+
+        Returns:
+            :obj:`numpy.ndarray`: value of each node (columns) at each step (rows)
+        """
+        packed_states, run_lengths = self._get_packed_states()
+        values = numpy.unpackbits(packed_states, axis=1, count=len(self.node_names)).astype(bool)
+        if run_lengths is not None:
+            values = numpy.repeat(values, run_lengths, axis=0)
+        return values
+
+
 def sync_update_scheme(regulatory_functions, step, current_state):
     """ Synchronously update species values
 
@@ -107,7 +214,7 @@ def deterministic_async_update_scheme(regulatory_functions, step, current_state)
     """
     # calculate next state
     node_names = sorted(current_state.keys())
-    node_name = node_names[(step-1) % 3]
+    node_name = node_names[(step-1) % len(node_names)]
     current_state[node_name] = regulatory_functions[node_name](current_state)
 
     # return state
@@ -126,12 +233,498 @@ def random_async_update_scheme(regulatory_functions, step, current_state):
          :obj:`dict` of :obj:`str`, :obj:`bool`: dictionary of values of each species
     """
     # calculate next state
-    node_name = numpy.random.choice(list(current_state.keys()))
+    node_names = list(current_state.keys())
+    node_name = node_names[numpy.random.randint(len(node_names))]
     current_state[node_name] = regulatory_functions[node_name](current_state)
 
     # return state
     return current_state
 
+
+class BooleanNetwork(object):
+    """ Boolean network compiled for simulating many initial states in parallel
+
+    The regulatory function of each node is compiled into a truth table over the nodes that it reads, and the truth
+    table is reduced to a decision tree over its inputs. States are bit-packed so that each node is represented by an
+    array of :obj:`numpy.uint64` words, where each bit of each word is the value of the node in one of the simulated
+    states. Each step therefore updates 64 states per word using bitwise operations.
+
+    Attributes:
+        node_names (:obj:`tuple` of :obj:`str`): names of the nodes, in the order of the rows of packed states
+        inputs (:obj:`list` of :obj:`numpy.ndarray`): indices of the nodes which each regulatory function reads
+        truth_tables (:obj:`list` of :obj:`numpy.ndarray`): value of each regulatory function for each combination
+            of the values of its inputs, where the value of the i-th input is bit i of the index into the table
+    """
+
+    def __init__(self, regulatory_functions, max_inputs=16):
+        """
+        Args:
+            regulatory_functions (:obj:`dict` of :obj:`str`, :obj:`function`): dictionary of regulatory functions for
+                each species
+            max_inputs (:obj:`int`, optional): maximum number of inputs of each regulatory function
+
+        Raises:
+            :obj:`ValueError`: if a regulatory function reads an undefined node or more than :obj:`max_inputs` nodes
+        """
+        self.node_names = tuple(regulatory_functions.keys())
+        node_indices = {node_name: i_node for i_node, node_name in enumerate(self.node_names)}
+
+        self.inputs = []
+        self.truth_tables = []
+        self._trees = []
+        for node_name in self.node_names:
+            input_names, truth_table = self._get_truth_table(regulatory_functions[node_name], max_inputs)
+            undefined_names = set(input_names).difference(node_indices)
+            if undefined_names:
+                raise ValueError('The regulatory function of {} reads undefined nodes {}'.format(
+                    node_name, ', '.join(sorted(undefined_names))))
+            self.inputs.append(numpy.array([node_indices[input_name] for input_name in input_names], dtype=int))
+            self.truth_tables.append(truth_table)
+            self._trees.append(self._get_decision_tree(truth_table, len(input_names)))
+
+        # pad the inputs with the index of an extra node which is always false, and concatenate the truth tables, so that
+        # the nodes can be updated with a fixed number of vectorized lookups
+        max_n_inputs = max([inputs.size for inputs in self.inputs] + [0])
+        self._padded_inputs = numpy.full((self.n_nodes, max_n_inputs), self.n_nodes, dtype=int)
+        for i_node, inputs in enumerate(self.inputs):
+            self._padded_inputs[i_node, 0:inputs.size] = inputs
+        self._input_weights = 1 << numpy.arange(max_n_inputs)
+        self._truth_table_offsets = numpy.cumsum([0] + [truth_table.size for truth_table in self.truth_tables[0:-1]])
+        self._concatenated_truth_tables = numpy.concatenate([numpy.zeros(0, bool)] + self.truth_tables)
+
+    @property
+    def n_nodes(self):
+        """ :obj:`int`: number of nodes """
+        return len(self.node_names)
+
+    @staticmethod
+    def _get_truth_table(regulatory_function, max_inputs):
+        """ Determine the nodes which a regulatory function reads, and tabulate the function over their values
+
+        The inputs are discovered by recording the nodes which the function reads. Each time the function reads a new
+        node, the function is re-tabulated over all of the values of the inputs discovered so far. Once it only reads
+        the discovered inputs, its value can't depend on any other node.
+
+        Args:
+            regulatory_function (:obj:`function`): regulatory function
+            max_inputs (:obj:`int`): maximum number of inputs
+
+        Returns:
+            :obj:`tuple`:
+
+                * :obj:`list` of :obj:`str`: names of the inputs
+                * :obj:`numpy.ndarray`: truth table
+        """
+        input_names = []
+        while True:
+            n_inputs = len(input_names)
+            truth_table = numpy.zeros(2 ** n_inputs, dtype=bool)
+            for i_row in range(2 ** n_inputs):
+                state = _RecordingState((input_name, bool((i_row >> i_input) & 1))
+                                        for i_input, input_name in enumerate(input_names))
+                truth_table[i_row] = bool(regulatory_function(state))
+                for input_name in state.read_names:
+                    if input_name not in input_names:
+                        input_names.append(input_name)
+            if len(input_names) == n_inputs:
+                return (input_names, truth_table)
+            if len(input_names) > max_inputs:
+                raise ValueError('Regulatory functions must read at most {} nodes'.format(max_inputs))
+
+    @classmethod
+    def _get_decision_tree(cls, truth_table, n_inputs):
+        """ Reduce a truth table to a decision tree over its inputs
+
+        Args:
+            truth_table (:obj:`numpy.ndarray`): truth table
+            n_inputs (:obj:`int`): number of inputs
+
+        Returns:
+            :obj:`bool` or :obj:`tuple`: constant value, or tuple of the position of the input which the tree branches
+            on and the subtrees for when the input is false and true
+        """
+        if not truth_table.any():
+            return False
+        if truth_table.all():
+            return True
+        # branch on the last input, which is the most significant bit of the index into the table
+        low = truth_table[0:2 ** (n_inputs - 1)]
+        high = truth_table[2 ** (n_inputs - 1):]
+        if numpy.array_equal(low, high):
+            return cls._get_decision_tree(low, n_inputs - 1)
+        return (n_inputs - 1, cls._get_decision_tree(low, n_inputs - 1), cls._get_decision_tree(high, n_inputs - 1))
+
+    @staticmethod
+    def pack_states(states):
+        """ Pack states into words
+
+        Args:
+            states (:obj:`numpy.ndarray`): boolean array of the value of each node (columns) in each state (rows)
+
+        Returns:
+            :obj:`numpy.ndarray`: :obj:`numpy.uint64` array whose rows represent the nodes, and whose bits represent the
+            states
+        """
+        states = numpy.asarray(states, dtype=bool)
+        n_words = -(-states.shape[0] // 64)
+        padded_states = numpy.zeros((n_words * 64, states.shape[1]), dtype=bool)
+        padded_states[0:states.shape[0], :] = states
+        return numpy.ascontiguousarray(
+            numpy.packbits(padded_states.T, axis=1, bitorder='little')).view('<u8').astype(numpy.uint64)
+
+    @staticmethod
+    def unpack_states(packed_states, n_states):
+        """ Unpack words into states
+
+        Args:
+            packed_states (:obj:`numpy.ndarray`): packed states (see :obj:`pack_states`)
+            n_states (:obj:`int`): number of states
+
+        Returns:
+            :obj:`numpy.ndarray`: boolean array of the value of each node (columns) in each state (rows)
+        """
+        bytes = numpy.ascontiguousarray(packed_states, dtype='<u8').view(numpy.uint8)
+        return numpy.unpackbits(bytes, axis=-1, count=n_states, bitorder='little').view(bool).swapaxes(-1, -2)
+
+    def sync_step(self, packed_states):
+        """ Synchronously update the nodes of packed states
+
+        Args:
+            packed_states (:obj:`numpy.ndarray`): packed states (see :obj:`pack_states`)
+
+        Returns:
+            :obj:`numpy.ndarray`: packed next states
+        """
+        next_states = numpy.empty_like(packed_states)
+        for i_node, (inputs, tree) in enumerate(zip(self.inputs, self._trees)):
+            next_states[i_node] = self._evaluate(tree, packed_states[inputs])
+        return next_states
+
+    def update_node(self, packed_states, i_node):
+        """ Calculate the next value of one node of packed states
+
+        Args:
+            packed_states (:obj:`numpy.ndarray`): packed states (see :obj:`pack_states`)
+            i_node (:obj:`int`): index of the node
+
+        Returns:
+            :obj:`numpy.ndarray`: packed next values of the node
+        """
+        return self._evaluate(self._trees[i_node], packed_states[self.inputs[i_node]])
+
+    @classmethod
+    def _evaluate(cls, tree, inputs):
+        """ Evaluate a decision tree on packed values of its inputs
+
+        Args:
+            tree (:obj:`bool` or :obj:`tuple`): decision tree
+            inputs (:obj:`numpy.ndarray`): packed values of the inputs
+
+        Returns:
+            :obj:`numpy.ndarray`: packed values of the tree
+        """
+        if tree is False:
+            return numpy.zeros(inputs.shape[1:], dtype=numpy.uint64)
+        if tree is True:
+            return numpy.full(inputs.shape[1:], numpy.iinfo(numpy.uint64).max, dtype=numpy.uint64)
+        i_input, low, high = tree
+        value = inputs[i_input]
+        if low is False and high is True:
+            return value.copy()
+        if low is True and high is False:
+            return ~value
+        if low is False:
+            return value & cls._evaluate(high, inputs)
+        if high is False:
+            return ~value & cls._evaluate(low, inputs)
+        return (value & cls._evaluate(high, inputs)) | (~value & cls._evaluate(low, inputs))
+
+    def simulate(self, initial_states, n_steps):
+        """ Synchronously simulate many initial states in parallel
+
+        Args:
+            initial_states (:obj:`numpy.ndarray`): boolean array of the initial value of each node (columns) in each
+                state (rows)
+            n_steps (:obj:`int`): number of steps to simulate
+
+        Returns:
+            :obj:`tuple`:
+
+                * :obj:`numpy.ndarray`: array of step numbers
+                * :obj:`numpy.ndarray`: packed states at each step (steps x nodes x words); use
+                  :obj:`unpack_states` to obtain the value of each node in each state
+        """
+        packed_states = self.pack_states(initial_states)
+        packed_history = numpy.empty((n_steps + 1, ) + packed_states.shape, dtype=numpy.uint64)
+        packed_history[0] = packed_states
+        for step in range(1, n_steps + 1):
+            packed_history[step] = self.sync_step(packed_history[step - 1])
+        return (numpy.arange(n_steps + 1), packed_history)
+
+    def simulate_async(self, initial_states, n_steps, update_scheme='random', seed=None, block_size=1024,
+                       return_history=True):
+        """ Asynchronously simulate many independent trajectories in parallel
+
+        At each step, one node of each trajectory is updated. The nodes are identified by their indices, and the
+        regulatory functions of the nodes of all of the trajectories are evaluated together by looking up their values
+        in the concatenated truth tables. For the random update scheme, the indices of the nodes to update are drawn
+        in blocks of steps.
+
+        Args:
+            initial_states (:obj:`numpy.ndarray`): boolean array of the initial value of each node (columns) of each
+                trajectory (rows)
+            n_steps (:obj:`int`): number of steps to simulate
+            update_scheme (:obj:`str`, optional): ``random`` to update a random node of each trajectory at each step,
+                or ``deterministic`` to update the nodes in the order of :obj:`node_names`
+            seed (:obj:`int`, optional): seed for the random number generator
+            block_size (:obj:`int`, optional): number of steps for which to draw the nodes to update at once
+            return_history (:obj:`bool`, optional): if :obj:`False`, only return the final states, e.g., to estimate
+                the probabilities of reaching attractors without storing the trajectories
+
+        Returns:
+            :obj:`tuple`:
+
+                * :obj:`numpy.ndarray`: array of step numbers
+                * :obj:`numpy.ndarray`: value of each node of each trajectory at each step (steps x trajectories x
+                  nodes), or, if :obj:`return_history` is :obj:`False`, at the final step (trajectories x nodes)
+
+        Raises:
+            :obj:`ValueError`: if the update scheme isn't supported
+        """
+        if update_scheme not in ['random', 'deterministic']:
+            raise ValueError('Update scheme {} is not supported'.format(update_scheme))
+
+        initial_states = numpy.asarray(initial_states, dtype=bool)
+        n_trajectories = initial_states.shape[0]
+        trajectories = numpy.arange(n_trajectories)
+        random_state = numpy.random.default_rng(seed)
+
+        # the last column represents the padding node, which is always false
+        states = numpy.zeros((n_trajectories, self.n_nodes + 1), dtype=bool)
+        states[:, 0:-1] = initial_states
+        if return_history:
+            state_history = numpy.empty((n_steps + 1, n_trajectories, self.n_nodes), dtype=bool)
+            state_history[0] = initial_states
+
+        for block_start in range(1, n_steps + 1, block_size):
+            block_steps = numpy.arange(block_start, min(block_start + block_size, n_steps + 1))
+            if update_scheme == 'random':
+                block_nodes = random_state.integers(self.n_nodes, size=(block_steps.size, n_trajectories))
+            else:
+                block_nodes = numpy.repeat(((block_steps - 1) % self.n_nodes)[:, numpy.newaxis], n_trajectories, axis=1)
+
+            for step, nodes in zip(block_steps, block_nodes):
+                input_values = states[trajectories[:, numpy.newaxis], self._padded_inputs[nodes, :]]
+                rows = self._truth_table_offsets[nodes] + input_values.dot(self._input_weights)
+                states[trajectories, nodes] = self._concatenated_truth_tables[rows]
+                if return_history:
+                    state_history[step] = states[:, 0:-1]
+
+        if return_history:
+            return (numpy.arange(n_steps + 1), state_history)
+        return (numpy.arange(n_steps + 1), states[:, 0:-1])
+
+
+def enumerate_attractors(network, max_nodes=20):
+    """ Find the attractors of the synchronous dynamics of a small network, and the basin of attraction of each state,
+    by enumerating its entire state space
+
+    The successor of every state is calculated with one packed step. Each state is then mapped onto the attractor
+    which it reaches by repeatedly squaring the successor map, so that the long transients are never simulated.
+
+    Args:
+        network (:obj:`BooleanNetwork`): network
+        max_nodes (:obj:`int`, optional): maximum number of nodes
+
+    Returns:
+        :obj:`tuple`:
+
+            * :obj:`list` of :obj:`numpy.ndarray`: states (rows) of each attractor (fixed points have one state), in
+              the order in which they are visited starting from the lexicographically smallest state, sorted by their
+              length and smallest state
+            * :obj:`numpy.ndarray`: index of the attractor which each state reaches, where the bits of the index of each
+              state are the values of the nodes (the value of the first node is the least significant bit)
+
+    Raises:
+        :obj:`ValueError`: if the network has more than :obj:`max_nodes` nodes
+    """
+    n_nodes = network.n_nodes
+    if n_nodes > max_nodes:
+        raise ValueError('The state spaces of networks with more than {} nodes are too large to enumerate'.format(
+            max_nodes))
+    n_states = 2 ** n_nodes
+
+    states = (numpy.arange(n_states)[:, numpy.newaxis] >> numpy.arange(n_nodes)) & 1 == 1
+    next_states = network.unpack_states(network.sync_step(network.pack_states(states)), n_states)
+    successors = next_states.dot(1 << numpy.arange(n_nodes, dtype=numpy.int64))
+
+    # rank the states lexicographically, with the first node most significant
+    keys = states.dot(1 << numpy.arange(n_nodes - 1, -1, -1, dtype=numpy.int64))
+
+    # after k squarings, `jumps` maps each state to the state 2^k steps later, and `min_keys` is the smallest key of the
+    # 2^k states starting from each state
+    jumps = successors
+    min_keys = keys
+    for _ in range(n_nodes):
+        min_keys = numpy.minimum(min_keys, min_keys[jumps])
+        jumps = jumps[jumps]
+
+    # 2^n_nodes steps are enough to reach an attractor and to traverse it, so the smallest key reachable from the
+    # attractor state identifies it
+    attractor_keys = min_keys[jumps]
+    unique_keys, basins = numpy.unique(attractor_keys, return_inverse=True)
+
+    key_to_state = numpy.empty(n_states, dtype=numpy.int64)
+    key_to_state[keys] = numpy.arange(n_states)
+    attractors = []
+    for key in unique_keys:
+        cycle = [key_to_state[key]]
+        while successors[cycle[-1]] != cycle[0]:
+            cycle.append(successors[cycle[-1]])
+        attractors.append(states[cycle, :])
+
+    order = sorted(range(len(attractors)), key=lambda i_attractor: (len(attractors[i_attractor]), i_attractor))
+    ranks = numpy.empty(len(order), dtype=int)
+    ranks[order] = numpy.arange(len(order))
+    return ([attractors[i_attractor] for i_attractor in order], ranks[basins.ravel()])
+
+
+def sample_attractors(network, n_samples, max_steps=10000, batch_size=65536, seed=None, n_processes=None):
+    """ Estimate the attractors of the synchronous dynamics of a large network, and the relative sizes of their basins
+    of attraction, by sampling random initial states
+
+    The samples are simulated in batches of packed states, and the batches are simulated in parallel. The trajectory
+    of each sample is stopped as soon as it revisits a state, using Brent's cycle detection algorithm.
+
+    Args:
+        network (:obj:`BooleanNetwork`): network
+        n_samples (:obj:`int`): number of initial states to sample
+        max_steps (:obj:`int`, optional): maximum number of steps to simulate each sample
+        batch_size (:obj:`int`, optional): number of samples to simulate together
+        seed (:obj:`int`, optional): seed for the random number generator
+        n_processes (:obj:`int`, optional): number of processes; if 1, simulate the batches in this process
+
+    Returns:
+        :obj:`tuple`:
+
+            * :obj:`list` of :obj:`numpy.ndarray`: states (rows) of each attractor, in the order in which they are
+              visited starting from the lexicographically smallest state, sorted by their length and smallest state
+            * :obj:`numpy.ndarray`: number of samples which reached each attractor
+            * :obj:`int`: number of samples which didn't reach an attractor within :obj:`max_steps`
+    """
+    batch_sizes = [min(batch_size, n_samples - i_sample) for i_sample in range(0, n_samples, batch_size)]
+    seeds = numpy.random.SeedSequence(seed).spawn(len(batch_sizes))
+    jobs = [(network, size, batch_seed, max_steps) for size, batch_seed in zip(batch_sizes, seeds)]
+
+    if n_processes is None:
+        n_processes = min(len(jobs), os.cpu_count() or 1)
+
+    if n_processes <= 1:
+        batch_results = [_sample_attractors_batch(*job) for job in jobs]
+    else:
+        with futures.ProcessPoolExecutor(max_workers=n_processes) as executor:
+            batch_results = list(executor.map(_sample_attractors_batch, *zip(*jobs)))
+
+    n_bytes = -(-network.n_nodes // 8)
+    min_states = numpy.concatenate([numpy.zeros((0, n_bytes), numpy.uint8)] + [result[0] for result in batch_results])
+    n_undetected = sum(result[1] for result in batch_results)
+
+    unique_min_states, counts = numpy.unique(min_states, axis=0, return_counts=True)
+    attractors = []
+    for min_state in unique_min_states:
+        state = numpy.unpackbits(min_state, count=network.n_nodes).astype(bool)
+        cycle = [state]
+        while True:
+            state = network.unpack_states(network.sync_step(network.pack_states(state[numpy.newaxis, :])), 1)[0]
+            if numpy.array_equal(state, cycle[0]):
+                break
+            cycle.append(state)
+        attractors.append(numpy.array(cycle))
+
+    # numpy.unique sorts the smallest states lexicographically; sort the attractors by their lengths, then by their
+    # smallest states
+    order = sorted(range(len(attractors)), key=lambda i_attractor: (len(attractors[i_attractor]), i_attractor))
+    return ([attractors[i_attractor] for i_attractor in order], counts[order], n_undetected)
+
+
+def _sample_attractors_batch(network, n_samples, seed, max_steps):
+    """ Simulate a batch of random initial states until each reaches an attractor
+
+    Args:
+        network (:obj:`BooleanNetwork`): network
+        n_samples (:obj:`int`): number of initial states to sample
+        seed (:obj:`numpy.random.SeedSequence`): seed for the random number generator
+        max_steps (:obj:`int`): maximum number of steps to simulate each sample
+
+    Returns:
+        :obj:`tuple`:
+
+            * :obj:`numpy.ndarray`: lexicographically smallest state of the attractor reached by each sample which
+              reached an attractor, packed into bytes
+            * :obj:`int`: number of samples which didn't reach an attractor
+    """
+    random_state = numpy.random.default_rng(seed)
+    initial_states = random_state.random((n_samples, network.n_nodes)) < 0.5
+
+    # Brent's algorithm: the tortoise jumps to the hare each time the number of steps since its last jump reaches a
+    # power of two, and the hare steps until it meets the tortoise. The schedule of the jumps is the same for every
+    # sample, so the samples can be stepped together.
+    tortoise = network.pack_states(initial_states)
+    hare = network.sync_step(tortoise)
+    power = cycle_length = 1
+    cycle_lengths = numpy.zeros(n_samples, dtype=int)
+    cycle_states = numpy.zeros((n_samples, network.n_nodes), dtype=bool)
+    detected = numpy.zeros(n_samples, dtype=bool)
+    for step in range(max_steps):
+        met = ~network.unpack_states(numpy.bitwise_or.reduce(tortoise ^ hare, axis=0)[numpy.newaxis, :],
+                                     n_samples)[:, 0]
+        new = met & ~detected
+        if new.any():
+            cycle_lengths[new] = cycle_length
+            cycle_states[new, :] = network.unpack_states(tortoise, n_samples)[new, :]
+            detected |= new
+            if detected.all():
+                break
+        if power == cycle_length:
+            tortoise = hare
+            power *= 2
+            cycle_length = 0
+        hare = network.sync_step(hare)
+        cycle_length += 1
+
+    # find the lexicographically smallest state of each attractor
+    cycle_states = cycle_states[detected, :]
+    cycle_lengths = cycle_lengths[detected]
+    min_states = numpy.packbits(cycle_states, axis=1)
+    packed_states = network.pack_states(cycle_states)
+    for i_step in range(1, cycle_lengths.max(initial=0)):
+        packed_states = network.sync_step(packed_states)
+        states = numpy.packbits(network.unpack_states(packed_states, cycle_states.shape[0]), axis=1)
+        differ = states != min_states
+        first_diff = numpy.argmax(differ, axis=1)
+        rows = numpy.arange(states.shape[0])
+        smaller = differ.any(axis=1) & (states[rows, first_diff] < min_states[rows, first_diff])
+        smaller &= i_step < cycle_lengths
+        min_states[smaller, :] = states[smaller, :]
+
+    return (min_states, int(n_samples - detected.sum()))
+
+
+class _RecordingState(dict):
+    """ State which records the names of the nodes which are read """
+
+    def __init__(self, *args, **kwargs):
+        super(_RecordingState, self).__init__(*args, **kwargs)
+        self.read_names = []
+
+    def __getitem__(self, node_name):
+        self.read_names.append(node_name)
+        return super(_RecordingState, self).get(node_name, False)
+
+    def get(self, node_name, default=None):
+        return self[node_name]
+
+
 def main():
     # seed random number generator
     numpy.random.seed(0)
@@ -0,0 +1,326 @@
+""" Code generation of flat, optionally compiled, right-hand sides of ODE models
+
+The rate laws of a model are traced by evaluating its :obj:`fluxes` method on symbolic species concentrations. Each
+arithmetic operation is recorded as an assignment to a temporary variable, and parameters are folded into literal
+constants. The recorded operations are then emitted as a straight-line Python function which calculates the fluxes,
+and a function which multiplies them by the stoichiometry matrix. Because intermediate values which the model shares
+among rate laws (e.g., the adenine nucleotides of the glycolysis model) are traced once, they are also calculated once
+by the generated code.
+
+:Author: Jonathan Karr <jonrkarr@gmail.com>
+:Date: 2026-10-19
+:Copyright: 2026, Karr Lab
+:License: MIT
+"""
+
+from scipy import sparse
+import hashlib
+import importlib.util
+import numbers
+import numpy
+import os
+import sys
+import tempfile
+
+try:
+    import numba
+except ImportError:
+    numba = None
+
+
+class CompiledModel(object):
+    """ Generated right-hand side of an ODE model
+
+    Attributes:
+        source (:obj:`str`): source code of the generated module
+        hash (:obj:`str`): SHA-256 hash of :obj:`source`
+        filename (:obj:`str`): path to the generated module
+        fluxes (:obj:`function`): function which calculates the flux of each reaction from the species concentrations
+        dx_dt (:obj:`function`): function which calculates the time derivatives of the species concentrations
+        jit (:obj:`bool`): if :obj:`True`, :obj:`fluxes` and :obj:`dx_dt` were compiled with numba
+    """
+
+    def __init__(self, source, hash, filename, fluxes, dx_dt, jit):
+        self.source = source
+        self.hash = hash
+        self.filename = filename
+        self.fluxes = fluxes
+        self.dx_dt = dx_dt
+        self.jit = jit
+
+
+# compiled models which have already been loaded by this process, keyed by the hash of their source and whether they
+# were compiled with numba
+_compiled_models = {}
+
+
+def compile_model(model, cache_dir=None, jit=False):
+    """ Generate a flat function which calculates the right-hand side of a model
+
+    The generated module is saved to :obj:`cache_dir` under a name derived from the hash of its source, which encodes
+    the rate laws, parameter values and stoichiometry of the model. The module is therefore only generated once for
+    each distinct model, and numba can cache its machine code across processes.
+
+    Args:
+        model (:obj:`object`): model with a :obj:`fluxes` method which calculates the flux of each reaction from the
+            species concentrations using arithmetic operations, a :obj:`stoichiometry` matrix, and initial species
+            concentrations :obj:`x_0`
+        cache_dir (:obj:`str`, optional): directory to save generated modules; defaults to a directory in the system's
+            temporary directory
+        jit (:obj:`bool`, optional): if :obj:`True` and numba is installed, compile the generated functions with
+            numba
+
+    Returns:
+        :obj:`CompiledModel`: generated right-hand side
+    """
+    source = generate_source(model)
+    hash = hashlib.sha256(source.encode()).hexdigest()
+    jit = jit and numba is not None
+
+    if (hash, jit) in _compiled_models:
+        return _compiled_models[(hash, jit)]
+
+    cache_dir = cache_dir or os.path.join(tempfile.gettempdir(), 'intro_to_wc_modeling', 'compiled_models')
+    if not os.path.isdir(cache_dir):
+        os.makedirs(cache_dir)
+    module_name = 'compiled_model_{}'.format(hash[0:16])
+    filename = os.path.join(cache_dir, module_name + '.py')
+    if not os.path.isfile(filename):
+        # write to a temporary file and then rename it so that concurrent processes never read a partial module
+        tmp_filename = '{}.{}.tmp'.format(filename, os.getpid())
+        with open(tmp_filename, 'w') as file:
+            file.write(source)
+        os.replace(tmp_filename, filename)
+
+    spec = importlib.util.spec_from_file_location(module_name, filename)
+    module = importlib.util.module_from_spec(spec)
+    # numba's cache re-imports the module of a compiled function by name
+    sys.modules[module_name] = module
+    spec.loader.exec_module(module)
+
+    if jit:
+        # `dx_dt` calls `fluxes` through the module's globals, so `fluxes` must be compiled first
+        module.fluxes = numba.njit(cache=True)(module.fluxes)
+        module.dx_dt = numba.njit(cache=True)(module.dx_dt)
+
+    compiled_model = CompiledModel(source, hash, filename, module.fluxes, module.dx_dt, jit)
+    _compiled_models[(hash, jit)] = compiled_model
+    return compiled_model
+
+
+def generate_source(model):
+    """ Generate the source code of a module which calculates the fluxes and time derivatives of a model
+
+    Args:
+        model (:obj:`object`): model with a :obj:`fluxes` method, a :obj:`stoichiometry` matrix and initial species
+            concentrations :obj:`x_0`
+
+    Returns:
+        :obj:`str`: source code
+    """
+    n_species = len(model.x_0)
+    stoichiometry = model.stoichiometry
+    if sparse.issparse(stoichiometry):
+        stoichiometry = stoichiometry.toarray()
+    stoichiometry = numpy.array(stoichiometry)
+
+    # trace the rate laws
+    tracer = _Tracer()
+    x = numpy.empty(n_species, dtype=object)
+    for i_species in range(n_species):
+        x[i_species] = _Symbol(tracer, 'x[{}]'.format(i_species))
+    fluxes = list(model.fluxes(x))
+    n_reactions = len(fluxes)
+    if stoichiometry.shape != (n_species, n_reactions):
+        raise ValueError('The stoichiometry must have one row for each of the {} species and one column for each of '
+                         'the {} reactions'.format(n_species, n_reactions))
+
+    # remove operations which don't contribute to the fluxes, and count the uses of each intermediate value
+    n_uses = {}
+    for flux in fluxes:
+        if isinstance(flux, _Symbol):
+            n_uses[flux.name] = n_uses.get(flux.name, 0) + 1
+    operations = []
+    for name, template, arguments in reversed(tracer.operations):
+        if name in n_uses:
+            operations.append((name, template, arguments))
+            for argument in arguments:
+                if isinstance(argument, _Symbol):
+                    n_uses[argument.name] = n_uses.get(argument.name, 0) + 1
+    operations.reverse()
+
+    # inline the intermediate values which are only used once
+    expressions = {}
+
+    def format_argument(argument):
+        if isinstance(argument, _Symbol) and argument.name in expressions:
+            return '(' + expressions.pop(argument.name) + ')'
+        return _format(argument)
+
+    assignments = []
+    for name, template, arguments in operations:
+        expression = template.format(*[format_argument(argument) for argument in arguments])
+        if n_uses[name] == 1:
+            expressions[name] = expression
+        else:
+            assignments.append((name, expression))
+
+    lines = [
+        '""" Generated right-hand side of an ODE model; do not edit """',
+        '',
+        'import numpy',
+        '',
+        '',
+        'def fluxes(x):',
+    ]
+    for name, expression in assignments:
+        lines.append('    {} = {}'.format(name, expression))
+    lines.append('    v = numpy.empty({})'.format(n_reactions))
+    for i_reaction, flux in enumerate(fluxes):
+        if isinstance(flux, _Symbol) and flux.name in expressions:
+            lines.append('    v[{}] = {}'.format(i_reaction, expressions.pop(flux.name)))
+        else:
+            lines.append('    v[{}] = {}'.format(i_reaction, _format(flux)))
+    lines.append('    return v')
+
+    lines += [
+        '',
+        '',
+        'def dx_dt(x):',
+        '    v = fluxes(x)',
+        '    dx = numpy.empty({})'.format(n_species),
+    ]
+    for i_species in range(n_species):
+        terms = []
+        for i_reaction in numpy.nonzero(stoichiometry[i_species, :])[0]:
+            coefficient = stoichiometry[i_species, i_reaction]
+            if abs(coefficient) == 1:
+                term = 'v[{}]'.format(i_reaction)
+            else:
+                term = '{} * v[{}]'.format(_format(abs(coefficient)), i_reaction)
+            if terms:
+                terms.append(('- ' if coefficient < 0 else '+ ') + term)
+            else:
+                terms.append(('-' if coefficient < 0 else '') + term)
+        lines.append('    dx[{}] = {}'.format(i_species, ' '.join(terms) or '0.'))
+    lines.append('    return dx')
+
+    return '\n'.join(lines) + '\n'
+
+
+class _Tracer(object):
+    """ Record of the arithmetic operations of a trace
+
+    Attributes:
+        operations (:obj:`list` of :obj:`tuple`): name of the temporary variable, template of the expression and
+            arguments (symbols and constants) of each operation
+    """
+
+    def __init__(self):
+        self.operations = []
+
+    def record(self, template, *arguments):
+        name = 't{}'.format(len(self.operations))
+        self.operations.append((name, template, arguments))
+        return _Symbol(self, name)
+
+
+class _Symbol(object):
+    """ Symbolic value of a trace
+
+    Attributes:
+        tracer (:obj:`_Tracer`): tracer
+        name (:obj:`str`): expression which refers to the value
+    """
+    # make NumPy defer binary operations with symbols to the methods below
+    __array_ufunc__ = None
+
+    def __init__(self, tracer, name):
+        self.tracer = tracer
+        self.name = name
+
+    def __add__(self, other):
+        return self.tracer.record('{} + {}', self, other)
+
+    def __radd__(self, other):
+        return self.tracer.record('{} + {}', other, self)
+
+    def __sub__(self, other):
+        return self.tracer.record('{} - {}', self, other)
+
+    def __rsub__(self, other):
+        return self.tracer.record('{} - {}', other, self)
+
+    def __mul__(self, other):
+        return self.tracer.record('{} * {}', self, other)
+
+    def __rmul__(self, other):
+        return self.tracer.record('{} * {}', other, self)
+
+    def __truediv__(self, other):
+        return self.tracer.record('{} / {}', self, other)
+
+    def __rtruediv__(self, other):
+        return self.tracer.record('{} / {}', other, self)
+
+    def __pow__(self, other):
+        return self.tracer.record('{} ** {}', self, other)
+
+    def __rpow__(self, other):
+        return self.tracer.record('{} ** {}', other, self)
+
+    def __neg__(self):
+        return self.tracer.record('-{}', self)
+
+    def __pos__(self):
+        return self
+
+    def __abs__(self):
+        return self.tracer.record('abs({})', self)
+
+    def exp(self):
+        return self.tracer.record('numpy.exp({})', self)
+
+    def log(self):
+        return self.tracer.record('numpy.log({})', self)
+
+    def sqrt(self):
+        return self.tracer.record('numpy.sqrt({})', self)
+
+    def __bool__(self):
+        raise TypeError('Rate laws which branch on the species concentrations cannot be traced')
+
+    def __lt__(self, other):
+        self.__bool__()
+
+    def __le__(self, other):
+        self.__bool__()
+
+    def __gt__(self, other):
+        self.__bool__()
+
+    def __ge__(self, other):
+        self.__bool__()
+
+
+def _format(value):
+    """ Format a symbol or constant as an expression
+
+    Args:
+        value (:obj:`_Symbol` or :obj:`numbers.Real`): symbol or constant
+
+    Returns:
+        :obj:`str`: expression
+    """
+    if isinstance(value, _Symbol):
+        return value.name
+    if isinstance(value, numbers.Integral):
+        return '({})'.format(int(value)) if value < 0 else str(int(value))
+    if isinstance(value, numbers.Real):
+        value = float(value)
+        if numpy.isnan(value):
+            return 'numpy.nan'
+        if numpy.isinf(value):
+            return '-numpy.inf' if value < 0 else 'numpy.inf'
+        return '({!r})'.format(value) if value < 0 else repr(value)
+    raise TypeError('Rate laws must only combine the species concentrations with numbers')
@@ -11,13 +11,289 @@ from matplotlib import pyplot
 import numpy
 import optlang
 import os
+import scipy.integrate
 
 
-def main(init_concs=None):
-    """ Run dFBA simsulation, plot results, and save plots
+class DfbaSimulation(object):
+    """ Dynamic FBA simulation
 
-    Args:
-        init_concs (:obj:`dict`, optional): initial concentrations
+    The linear program is built once. At each time step, only the upper bounds of the exchange fluxes are updated, and
+    the solver is restarted from the optimal basis of the previous step, which typically only needs a few pivots to
+    reach the new optimum.
+
+    Attributes:
+        model (:obj:`optlang.Model`): FBA model whose objective is the growth rate
+        observables (:obj:`list` of :obj:`str`): ids of the species whose concentrations are simulated
+        variable_names (:obj:`list` of :obj:`str`): names of the variables of :obj:`model`
+        exchange_variables (:obj:`list` of :obj:`optlang.Variable`): variables whose upper bounds depend on the
+            concentrations of the observables
+        get_exchange_bounds (:obj:`function`): function which calculates the upper bound of each exchange variable
+            from the concentrations of the observables (:obj:`numpy.ndarray`)
+        stoichiometry (:obj:`numpy.ndarray`): rate of change of the concentration of each observable (rows) per unit
+            flux of each variable (columns)
+        n_solves (:obj:`int`): number of linear programs which have been solved
+    """
+
+    def __init__(self, model, observables, exchange_variable_names, get_exchange_bounds, stoichiometry):
+        """
+        Args:
+            model (:obj:`optlang.Model`): FBA model whose objective is the growth rate
+            observables (:obj:`list` of :obj:`str`): ids of the species whose concentrations are simulated
+            exchange_variable_names (:obj:`list` of :obj:`str`): names of the variables whose upper bounds depend on
+                the concentrations of the observables
+            get_exchange_bounds (:obj:`function`): function which calculates the upper bound of each exchange variable
+                from the concentrations of the observables (:obj:`numpy.ndarray`)
+            stoichiometry (:obj:`dict` of :obj:`str`, :obj:`dict` of :obj:`str`, :obj:`float`): rate of change of the
+                concentration of each observable per unit flux of each variable
+        """
+        self.model = model
+        self.observables = list(observables)
+        self.variable_names = list(model.variables.keys())
+        self.exchange_variables = [model.variables[name] for name in exchange_variable_names]
+        self.get_exchange_bounds = get_exchange_bounds
+
+        variable_indices = {name: i_variable for i_variable, name in enumerate(self.variable_names)}
+        self.stoichiometry = numpy.zeros((len(self.observables), len(self.variable_names)))
+        for i_observable, observable in enumerate(self.observables):
+            for name, coefficient in stoichiometry.get(observable, {}).items():
+                self.stoichiometry[i_observable, variable_indices[name]] = coefficient
+
+        # presolving discards the basis of the previous solution
+        self.model.configuration.presolve = False
+
+        self.n_solves = 0
+
+    def solve(self, concentrations, fluxes=None):
+        """ Calculate the maximum growth rate and optimal fluxes for the concentrations of the observables
+
+        Args:
+            concentrations (:obj:`numpy.ndarray`): concentration of each observable
+            fluxes (:obj:`numpy.ndarray`, optional): array to store the flux of each variable
+
+        Returns:
+            :obj:`tuple`:
+
+                * :obj:`float`: growth rate
+                * :obj:`numpy.ndarray`: flux of each variable
+
+        Raises:
+            :obj:`ValueError`: if the linear program has no optimal solution
+        """
+        for variable, bound in zip(self.exchange_variables, self.get_exchange_bounds(concentrations)):
+            variable.ub = bound
+
+        status = self.model.optimize()
+        self.n_solves += 1
+        if status != 'optimal':
+            raise ValueError('The FBA problem is {}'.format(status))
+
+        if fluxes is None:
+            fluxes = numpy.empty(len(self.variable_names))
+        fluxes[:] = list(self.model.primal_values.values())
+        return (self.model.objective.value, fluxes)
+
+    def simulate(self, init_concs, time_max, time_step=1.):
+        """ Simulate the concentrations of the observables with a fixed time step
+
+        Args:
+            init_concs (:obj:`dict` of :obj:`str`, :obj:`float`): initial concentration of each observable
+            time_max (:obj:`float`): simulation end time
+            time_step (:obj:`float`, optional): time step
+
+        Returns:
+            :obj:`tuple`:
+
+                * :obj:`numpy.ndarray`: time of each step
+                * :obj:`numpy.ndarray`: concentration of each observable (columns) at each step (rows)
+                * :obj:`numpy.ndarray`: flux of each variable (columns) at each step (rows)
+                * :obj:`numpy.ndarray`: growth rate at each step
+
+        Raises:
+            :obj:`ValueError`: if the concentration of an observable becomes negative
+        """
+        n_steps = int(round(time_max / time_step))
+        time_hist = numpy.linspace(0., n_steps * time_step, n_steps + 1)
+        conc_hist = numpy.full((n_steps + 1, len(self.observables)), numpy.nan)
+        flux_hist = numpy.full((n_steps + 1, len(self.variable_names)), numpy.nan)
+        growth_hist = numpy.full(n_steps + 1, numpy.nan)
+
+        concentrations = numpy.array([init_concs[observable] for observable in self.observables], dtype=float)
+        for i_time in range(n_steps + 1):
+            conc_hist[i_time, :] = concentrations
+            growth_hist[i_time], _ = self.solve(concentrations, fluxes=flux_hist[i_time, :])
+
+            concentrations = concentrations + time_step * self.stoichiometry.dot(flux_hist[i_time, :])
+
+            i_negative = numpy.flatnonzero(concentrations < 0)
+            if i_negative.size:
+                raise ValueError("Error: concentration of {} at {}, which is below 0, at time {}".format(
+                    self.observables[i_negative[0]], concentrations[i_negative[0]], time_hist[i_time]))
+
+        return (time_hist, conc_hist, flux_hist, growth_hist)
+
+    def simulate_adaptive(self, init_concs, time_max, max_time_step=1., min_time_step=1e-12, max_relative_change=0.1,
+                          abs_tol=1e-6):
+        """ Simulate the concentrations of the observables with an adaptive time step
+
+        Each step uses the fluxes of the linear program at the beginning of the step. The step is halved until no
+        concentration becomes negative, and no concentration changes by more than :obj:`max_relative_change` of its
+        value plus :obj:`abs_tol`. Because the fluxes are constant over a step, rejected steps don't require additional
+        solutions of the linear program. After each step, the step is doubled, up to :obj:`max_time_step`.
+
+        Args:
+            init_concs (:obj:`dict` of :obj:`str`, :obj:`float`): initial concentration of each observable
+            time_max (:obj:`float`): simulation end time
+            max_time_step (:obj:`float`, optional): maximum time step
+            min_time_step (:obj:`float`, optional): minimum time step
+            max_relative_change (:obj:`float`, optional): maximum relative change of each concentration in one step
+            abs_tol (:obj:`float`, optional): absolute tolerance of the change of each concentration in one step
+
+        Returns:
+            :obj:`tuple`:
+
+                * :obj:`numpy.ndarray`: time of each step
+                * :obj:`numpy.ndarray`: concentration of each observable (columns) at each step (rows)
+                * :obj:`numpy.ndarray`: flux of each variable (columns) at each step (rows)
+                * :obj:`numpy.ndarray`: growth rate at each step
+
+        Raises:
+            :obj:`ValueError`: if the time step must be reduced below :obj:`min_time_step`
+        """
+        time = 0.
+        time_step = max_time_step
+        concentrations = numpy.array([init_concs[observable] for observable in self.observables], dtype=float)
+
+        time_hist = []
+        conc_hist = []
+        flux_hist = []
+        growth_hist = []
+        while True:
+            growth, fluxes = self.solve(concentrations)
+            time_hist.append(time)
+            conc_hist.append(concentrations)
+            flux_hist.append(fluxes)
+            growth_hist.append(growth)
+
+            if time >= time_max:
+                break
+
+            d_conc_d_t = self.stoichiometry.dot(fluxes)
+            time_step = min(time_step, time_max - time)
+            while True:
+                changes = time_step * d_conc_d_t
+                next_concentrations = concentrations + changes
+                if numpy.all(next_concentrations >= 0) and \
+                        numpy.all(numpy.abs(changes) <= max_relative_change * numpy.abs(concentrations) + abs_tol):
+                    break
+                time_step /= 2
+                if time_step < min_time_step:
+                    raise ValueError('The time step at time {} must be below the minimum time step {}'.format(
+                        time, min_time_step))
+
+            # avoid round-off from accumulating time steps at the end of the simulation
+            if time_step == time_max - time:
+                time = time_max
+            else:
+                time += time_step
+            concentrations = next_concentrations
+            time_step = min(2 * time_step, max_time_step)
+
+        return (numpy.array(time_hist), numpy.array(conc_hist), numpy.array(flux_hist), numpy.array(growth_hist))
+
+    def simulate_direct(self, init_concs, time_max, time_step=1., depletion_conc=1e-6, rtol=1e-6, atol=1e-9):
+        """ Simulate the concentrations of the observables by integrating an ODE whose right-hand side solves the
+        linear program
+
+        The right-hand side is discontinuous when a nutrient is depleted. Therefore, the integration stops when the
+        concentration of a consumed observable falls to :obj:`depletion_conc`, the observable is fixed at zero, and the
+        integration is restarted.
+
+        Args:
+            init_concs (:obj:`dict` of :obj:`str`, :obj:`float`): initial concentration of each observable
+            time_max (:obj:`float`): simulation end time
+            time_step (:obj:`float`, optional): interval at which to report the concentrations
+            depletion_conc (:obj:`float`, optional): concentration at which consumed observables are depleted
+            rtol (:obj:`float`, optional): relative tolerance of the integrator
+            atol (:obj:`float`, optional): absolute tolerance of the integrator
+
+        Returns:
+            :obj:`tuple`:
+
+                * :obj:`numpy.ndarray`: time of each reported step and each depletion
+                * :obj:`numpy.ndarray`: concentration of each observable (columns) at each time (rows)
+                * :obj:`numpy.ndarray`: flux of each variable (columns) at each time (rows)
+                * :obj:`numpy.ndarray`: growth rate at each time
+
+        Raises:
+            :obj:`ValueError`: if the integration fails
+        """
+        concentrations = numpy.array([init_concs[observable] for observable in self.observables], dtype=float)
+        consumed = numpy.flatnonzero(numpy.any(self.stoichiometry < 0, axis=1))
+        depleted = numpy.zeros(len(self.observables), dtype=bool)
+        depleted[consumed] = concentrations[consumed] <= depletion_conc
+        concentrations[depleted] = 0.
+        fluxes = numpy.empty(len(self.variable_names))
+
+        def d_conc_d_t(time, concentrations):
+            concentrations = numpy.maximum(concentrations, 0.)
+            concentrations[depleted] = 0.
+            self.solve(concentrations, fluxes=fluxes)
+            d_conc_d_t = self.stoichiometry.dot(fluxes)
+            d_conc_d_t[depleted] = numpy.maximum(d_conc_d_t[depleted], 0.)
+            return d_conc_d_t
+
+        events = []
+        for i_observable in consumed:
+            def event(time, concentrations, i_observable=i_observable):
+                if depleted[i_observable]:
+                    return 1.
+                return concentrations[i_observable] - depletion_conc
+            event.terminal = True
+            event.direction = -1
+            events.append(event)
+
+        n_steps = int(round(time_max / time_step))
+        report_times = numpy.linspace(0., n_steps * time_step, n_steps + 1)
+
+        time = 0.
+        time_hist = [time]
+        conc_hist = [concentrations]
+        while time < time_max:
+            solution = scipy.integrate.solve_ivp(d_conc_d_t, (time, time_max), concentrations,
+                                                 t_eval=report_times[report_times > time], events=events,
+                                                 rtol=rtol, atol=atol)
+            if solution.status == -1:
+                raise ValueError('Integration failed at time {}: {}'.format(time, solution.message))
+            if len(solution.t):
+                time_hist.extend(solution.t)
+                conc_hist.extend(solution.y.T)
+
+            if solution.status == 1:
+                i_event = next(i_event for i_event, event_times in enumerate(solution.t_events) if event_times.size)
+                depleted[consumed[i_event]] = True
+                time = solution.t_events[i_event][0]
+                concentrations = solution.y_events[i_event][0].copy()
+                concentrations[depleted] = 0.
+                time_hist.append(time)
+                conc_hist.append(concentrations)
+            else:
+                time = time_max
+
+        time_hist = numpy.array(time_hist)
+        conc_hist = numpy.array(conc_hist)
+        flux_hist = numpy.full((time_hist.size, len(self.variable_names)), numpy.nan)
+        growth_hist = numpy.full(time_hist.size, numpy.nan)
+        for i_time, concentrations in enumerate(conc_hist):
+            growth_hist[i_time], _ = self.solve(numpy.maximum(concentrations, 0.), fluxes=flux_hist[i_time, :])
+
+        return (time_hist, conc_hist, flux_hist, growth_hist)
+
+
+def get_tutorial_simulation():
+    """ Get a dFBA simulation of the uptake of glucose and amino acids and their use for growth
+
+    Returns:
+        :obj:`DfbaSimulation`: simulation
     """
 
     # create a model
@@ -56,63 +332,46 @@ def main(init_concs=None):
     # observe these concentration variables
     observables = ['glc_e', 'aa_e', 'biomass']
 
-    # set non-zero initial conditions
-    if not init_concs:
-        init_concs = dict(zip(observables, [200., 120., 1.]))
-
-    # simulation end time
-    time_max = 70
-
-    # setup matrices to store the history of simulation predictions
-    time_hist = numpy.array(range(time_max + 1))
-    flux_hist = numpy.full((time_max + 1, len(model.variables)), numpy.nan)
-    growth_hist = numpy.full(time_max + 1, numpy.nan)
+    # constrain fluxes based on avialable nutrients
+    # todo: explain these expressions
+    def get_exchange_bounds(concentrations):
+        conc_glc_e, conc_aa_e, conc_biomass = concentrations
+        return (5e-3 * conc_glc_e * conc_biomass, 1e-3 * conc_aa_e * conc_biomass)
 
-    conc_hist = {}
-    for observable in observables:
-        conc_hist[observable] = numpy.full(time_max + 1, numpy.nan)
+    # the concentrations change by the uptake of nutrients and growth
+    stoichiometry = {
+        'glc_e': {'glc_tx': -1.},
+        'aa_e': {'aa_tx': -1.},
+        'biomass': {'growth': 1.},
+    }
 
-    # set initial concentrations
-    concentrations = init_concs.copy()
+    return DfbaSimulation(model, observables, ['glc_ex', 'aa_ex'], get_exchange_bounds, stoichiometry)
 
-    variable_names = model.variables.keys()
 
-    # iterate over time
-    for i_time in range(time_max + 1):
-
-        # constrain fluxes based on avialable nutrients
-        # todo: explain these expressions
-        glc_ex.ub = 5e-3 * concentrations['glc_e'] * concentrations['biomass']
-        aa_ex.ub = 1e-3 * concentrations['aa_e'] * concentrations['biomass']
-
-        # solve for the maximum growth and optimal fluxes
-        status = model.optimize()
-        assert(status == 'optimal')
+def main(init_concs=None):
+    """ Run dFBA simsulation, plot results, and save plots
 
-        # store history
-        growth_hist[i_time] = model.objective.value
-        for i_var, var_name in enumerate(variable_names):
-            flux_hist[i_time, i_var] = model.variables[var_name].primal
+    Args:
+        init_concs (:obj:`dict`, optional): initial concentrations
+    """
+    sim = get_tutorial_simulation()
+    observables = sim.observables
 
-        for observable in observables:
-            conc_hist[observable][i_time] = concentrations[observable]
+    # set non-zero initial conditions
+    if not init_concs:
+        init_concs = dict(zip(observables, [200., 120., 1.]))
 
-        # Update the concentrations which are being recorded.
-        # Since the time step is 1, the concentration change = flux * 1
-        concentrations['glc_e'] -= model.variables['glc_tx'].primal
-        concentrations['aa_e'] -= model.variables['aa_tx'].primal
-        concentrations['biomass'] += model.variables['growth'].primal
+    # simulation end time
+    time_max = 70
 
-        for observable in observables:
-            if concentrations[observable] < 0:
-                raise ValueError("Error: concentration of {} at {}, which is below 0, at time {}".format(
-                    observable, concentrations[observable], i_time))
+    # simulate the concentrations with a time step of 1
+    time_hist, conc_hist, _, _ = sim.simulate(init_concs, time_max)
 
     # plot results
     plot_labels = ['Glucose', 'Amino acid', 'Biomass']
     lines = []
-    for observable, plot_label in zip(observables, plot_labels):
-        lines.append(pyplot.plot(time_hist, conc_hist[observable], '-', label=plot_label)[0])
+    for i_observable, plot_label in enumerate(plot_labels):
+        lines.append(pyplot.plot(time_hist, conc_hist[:, i_observable], '-', label=plot_label)[0])
     pyplot.legend(lines, plot_labels)
     pyplot.xlim(0, time_max)
     pyplot.xlabel('Time (s)')
@@ -6,6 +6,8 @@
 :License: MIT
 """
 
+from intro_to_wc_modeling.cell_modeling.simulation import ode
+from intro_to_wc_modeling.cell_modeling.simulation import stochastic
 from matplotlib import colors
 from matplotlib import pyplot
 from numpy import linalg
@@ -230,13 +232,16 @@ class OdeSimulation(object):
             else:
                 return 'unstable spiral source'
 
-    def simulate(self, t_0=0., t_end=100., t_step=1.):
+    def simulate(self, t_0=0., t_end=100., t_step=1., steady_state_tol=None):
         """ Run the simulation
 
         Args:
             t_0 (:obj:`float`, optional): initial time (h)
             t_end (:obj:`float`, optional): end time (h)
             t_step (:obj:`float`, optional): period at which to record predicted mRNA and proteins (h)
+            steady_state_tol (:obj:`float`, optional): if set, stop the integration once the norm of the rate of change
+                falls below this tolerance (molecules h\ :sup:`-1`), and report the steady state for the subsequent
+                time points
 
         Return:
             :obj:`tuple`:
@@ -246,8 +251,9 @@ class OdeSimulation(object):
         """
         assert ((t_end - t_0) / t_step % 1 == 0)
         t = numpy.linspace(t_0, t_end, int((t_end - t_0) / t_step) + 1)
-        x = integrate.odeint(lambda x, t: self.dx_dt(x), self.x_0, t, Dfun=lambda x, t: self.jacobian(x))
-        return (t, x[:, 0], x[:, 1])
+        result = ode.integrate(lambda t, x: self.dx_dt(x), self.x_0, t_0, t_end, t_eval=t,
+                               jac=lambda t, x: self.jacobian(x), steady_state_tol=steady_state_tol)
+        return (t, result.x[:, 0], result.x[:, 1])
 
     def plot_simulation_results(self, t, m, n):
         """ Plot simulation results
@@ -766,48 +772,17 @@ class SsaSimulation(object):
         assert ((t_end - t_0) / t_step % 1 == 0)
         t_hist = numpy.linspace(t_0, t_end, int((t_end - t_0) / t_step) + 1)
 
-        # data structure to store predicted copy numbers
-        m_hist = numpy.full(t_hist.shape, self.m_0)
-        n_hist = numpy.full(t_hist.shape, self.n_0)
-
-        # initial conditions
-        t = t_hist[0]
-        m = self.m_0
-        n = self.n_0
-
-        # iterate over time
-        while t < t_hist[-1]:
-            # calculate reaction properties/rates
-            propensities = numpy.array([
-                self.r_m_syn(m, n),
-                self.r_m_deg(m, n),
-                self.r_n_syn(m, n),
-                self.r_n_deg(m, n),
-            ])
-            total_propensity = numpy.sum(propensities)
-
-            # select the length of the time step from an exponential distributuon
-            dt = numpy.random.exponential(1. / total_propensity)
-
-            # select the next reaction to fire
-            i_reaction = numpy.random.choice(4, p=propensities / total_propensity)
-
-            # update the time
-            t += dt
-
-            # update the copy numbers based on the selected reaction
-            if i_reaction == 0:
-                m += 1
-            elif i_reaction == 1:
-                m -= 1
-            elif i_reaction == 2:
-                n += 1
-            else:
-                n -= 1
-
-            # store copy number history
-            m_hist[t < t_hist] = m
-            n_hist[t < t_hist] = n
+        # represent the model as a network of mass-action reactions: mRNA synthesis and degradation, and protein
+        # synthesis (catalyzed by mRNA) and degradation
+        network = stochastic.ReactionNetwork(
+            [[1, -1, 0, 0], [0, 0, 1, -1]],
+            [self.k_m, self.gamma_m, self.k_n, self.gamma_n],
+            reactant_stoichiometries=[[0, 1, 1, 0], [0, 0, 0, 1]])
+
+        # simulate the entire trajectory with the compiled SSA kernel
+        _, copy_number_hist = stochastic.simulate_network(network, [self.m_0, self.n_0], t_end - t_0, t_step)
+        m_hist = copy_number_hist[:, 0]
+        n_hist = copy_number_hist[:, 1]
 
         return (t_hist, m_hist, n_hist)
 
@@ -1,4 +1,5 @@
 from . import analysis
+from . import history
 from . import model
 from . import simulation
 from . import submodel_simulation
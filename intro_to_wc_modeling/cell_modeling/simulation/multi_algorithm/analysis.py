@@ -5,13 +5,25 @@ Analysis utility functions
 @date 3/26/2016
 '''
 
+from concurrent import futures
 from intro_to_wc_modeling.cell_modeling.simulation.multi_algorithm.model import Model, Submodel
 from intro_to_wc_modeling.cell_modeling.simulation.multi_algorithm.util import N_AVOGADRO
+from matplotlib import figure
 from matplotlib import pyplot
 from matplotlib import ticker
+from matplotlib.backends import backend_agg
+from scipy import sparse
+import functools
 import numpy as np
+import os
 import re
 
+# maximum number of values to read from a species counts history at once
+MAX_CHUNK_SIZE = 2 ** 24
+
+# pattern for the ids of species in compartments (e.g. `ATP[c]`)
+SPECIES_COMPARTMENT_ID_PATTERN = re.compile(r'^(?P<speciesId>[a-z0-9\-_]+)\[(?P<compartmentId>[a-z0-9\-_]+)\]$', re.I)
+
 
 def plot(model, time=np.zeros(0),
          speciesCounts=None, volume=np.zeros(0), extracellularVolume=np.zeros(0),
@@ -19,9 +31,6 @@ def plot(model, time=np.zeros(0),
          yDatas={},
          units='mM', fileName=''):
 
-    # convert time to hours
-    time = time.copy() / 3600
-
     # create figure
     fig = pyplot.figure()
 
@@ -33,10 +42,107 @@ def plot(model, time=np.zeros(0),
             speciesId, compartmentId, yData = get_y_data(model, speciesCounts, speciesCompartmentId)
 
             # scale
-            yData *= get_scale(units, compartmentId, volume, extracellularVolume)
+            yData = yData * get_scale(units, compartmentId, volume, extracellularVolume)
 
             yDatas[speciesCompartmentId] = yData
 
+    # plot results
+    draw_plot(fig.gca(), time, yDatas, units=units, legend=len(selectedSpeciesCompartments) > 1)
+
+    # save
+    if fileName:
+        fig.savefig(fileName, transparent=True, bbox_inches='tight')
+        pyplot.close(fig)
+
+
+def plot_batch(model, specs, time=np.zeros(0),
+               speciesCounts=None, volume=np.zeros(0), extracellularVolume=np.zeros(0),
+               nProcesses=None):
+    """ Render several plots of the results of a simulation to files
+
+    The data for all of the plots is extracted once, so series which appear in several plots are only read and
+    scaled once. The figures are then rendered with the Agg backend, without the global :obj:`pyplot` state, in a
+    pool of processes.
+
+    Args:
+        model (:obj:`Model` or :obj:`Submodel`): model
+        specs (:obj:`list` of :obj:`dict`): list of plots. Each plot is described by a dictionary with the keys
+            ``fileName`` and either ``yDatas`` or ``selectedSpeciesCompartments``, and optionally ``units``
+            (default: ``mM``).
+        time (:obj:`numpy.ndarray`, optional): time (s)
+        speciesCounts (:obj:`numpy.ndarray`, optional): species counts history
+        volume (:obj:`numpy.ndarray`, optional): cell volume
+        extracellularVolume (:obj:`numpy.ndarray`, optional): extracellular volume
+        nProcesses (:obj:`int`, optional): number of processes to render the plots; if 1, render the plots in
+            this process; if :obj:`None`, use one process per CPU
+    """
+    # extract data to plot
+    selectedSpeciesCompartments = {}
+    for spec in specs:
+        if not spec.get('yDatas', {}):
+            selectedSpeciesCompartments.setdefault(spec.get('units', 'mM'), set()).update(
+                spec.get('selectedSpeciesCompartments', []))
+
+    yDataCache = {}
+    for units, speciesCompartmentIds in selectedSpeciesCompartments.items():
+        speciesCompartmentIds = sorted(speciesCompartmentIds)
+        speciesIds, compartmentIds, yDatas = get_y_data(model, speciesCounts, speciesCompartmentIds)
+        yDatas = yDatas * get_scale(units, compartmentIds, volume, extracellularVolume)
+        for speciesCompartmentId, yData in zip(speciesCompartmentIds, yDatas):
+            yDataCache[(speciesCompartmentId, units)] = yData
+
+    jobs = []
+    for spec in specs:
+        units = spec.get('units', 'mM')
+        selectedSpeciesCompartmentIds = spec.get('selectedSpeciesCompartments', [])
+
+        yDatas = spec.get('yDatas', {})
+        if not yDatas:
+            yDatas = {id: yDataCache[(id, units)] for id in selectedSpeciesCompartmentIds}
+
+        jobs.append((time, yDatas, units, len(selectedSpeciesCompartmentIds) > 1, spec['fileName']))
+
+    # render plots
+    if nProcesses is None:
+        nProcesses = min(len(jobs), os.cpu_count() or 1)
+
+    if nProcesses <= 1:
+        for job in jobs:
+            render_plot(*job)
+    else:
+        with futures.ProcessPoolExecutor(max_workers=nProcesses) as executor:
+            list(executor.map(render_plot, *zip(*jobs)))
+
+
+def render_plot(time, yDatas, units, legend, fileName):
+    """ Render a plot to a file with the Agg backend, without using the global :obj:`pyplot` state
+
+    Args:
+        time (:obj:`numpy.ndarray`): time (s)
+        yDatas (:obj:`dict` of :obj:`str`, :obj:`numpy.ndarray`): dictionary of the data of each series
+        units (:obj:`str`): units of the data
+        legend (:obj:`bool`): if :obj:`True`, add a legend
+        fileName (:obj:`str`): path to save the plot
+    """
+    fig = figure.Figure()
+    backend_agg.FigureCanvasAgg(fig)
+    draw_plot(fig.add_subplot(1, 1, 1), time, yDatas, units=units, legend=legend)
+    fig.savefig(fileName, transparent=True, bbox_inches='tight')
+
+
+def draw_plot(axes, time, yDatas, units='mM', legend=False):
+    """ Draw the time courses of one or more series
+
+    Args:
+        axes (:obj:`matplotlib.axes.Axes`): axes
+        time (:obj:`numpy.ndarray`): time (s)
+        yDatas (:obj:`dict` of :obj:`str`, :obj:`numpy.ndarray`): dictionary of the data of each series
+        units (:obj:`str`, optional): units of the data
+        legend (:obj:`bool`, optional): if :obj:`True`, add a legend
+    """
+    # convert time to hours
+    time = time / 3600
+
     # plot results
     yMin = 1e12
     yMax = -1e12
@@ -46,58 +152,82 @@ def plot(model, time=np.zeros(0),
         yMax = max(yMax, np.max(yData))
 
         # add to plot
-        pyplot.plot(time, yData, label=label)
+        axes.plot(time, yData, label=label)
 
     # set axis limits
-    pyplot.xlim((0, time[-1]))
-    pyplot.ylim((yMin, yMax))
+    axes.set_xlim((0, time[-1]))
+    axes.set_ylim((yMin, yMax))
 
     # add axis labels and legend
-    pyplot.xlabel('Time (h)')
+    axes.set_xlabel('Time (h)')
 
     if units == 'molecules':
-        pyplot.ylabel('Copy number')
+        axes.set_ylabel('Copy number')
     else:
-        pyplot.ylabel('Concentration (%s)' % units)
+        axes.set_ylabel('Concentration (%s)' % units)
 
     y_formatter = ticker.ScalarFormatter(useOffset=False)
-    pyplot.gca().get_yaxis().set_major_formatter(y_formatter)
-
-    if len(selectedSpeciesCompartments) > 1:
-        pyplot.legend()
+    axes.get_yaxis().set_major_formatter(y_formatter)
 
-    # save
-    if fileName:
-        fig.savefig(fileName, transparent=True, bbox_inches='tight')
-        pyplot.close(fig)
+    if legend:
+        axes.legend()
 
 
 def get_y_data(model, speciesCounts, speciesCompartmentId):
-    """
+    """ Get the history of one or more species
+
     Args:
-        model
-        speciesCompartmentId
+        model (:obj:`Model` or :obj:`Submodel`): model
+        speciesCounts (:obj:`numpy.ndarray` or :obj:`dict`): species counts history
+        speciesCompartmentId (:obj:`str` or :obj:`list` of :obj:`str`): id (e.g. ``ATP[c]``) or list of ids of
+            species in compartments
 
     Returns:
-        species
-        compartment
-        yData
+        :obj:`tuple`:
+            * :obj:`str` or :obj:`list` of :obj:`str`: species id(s)
+            * :obj:`str` or :obj:`list` of :obj:`str`: compartment id(s)
+            * :obj:`numpy.ndarray`: history of the species (time) or, for a list of ids, the histories of the
+              species (species x time)
     """
+    if isinstance(speciesCompartmentId, str):
+        speciesId, compartmentId = parse_species_compartment_id(speciesCompartmentId)
+        if isinstance(model, Model):
+            # read one series with scalar indices, which change logs reconstruct without the rest of the history
+            iSpecies, iCompartment = model.getSpeciesCompartmentIndex()[speciesCompartmentId]
+            return (speciesId, compartmentId, speciesCounts[iSpecies, iCompartment, :])
+        speciesIds, compartmentIds, yData = get_y_data(model, speciesCounts, [speciesCompartmentId])
+        return (speciesId, compartmentId, yData[0, :])
 
-    match = re.match(r'^(?P<speciesId>[a-z0-9\-_]+)\[(?P<compartmentId>[a-z0-9\-_]+)\]$', speciesCompartmentId, re.I).groupdict()
-    speciesId = match['speciesId']
-    compartmentId = match['compartmentId']
+    speciesCompartmentIds = speciesCompartmentId
+    speciesIds, compartmentIds = zip(*map(parse_species_compartment_id, speciesCompartmentIds)) \
+        if speciesCompartmentIds else ((), ())
 
     if isinstance(model, Model):
-        species = model.getComponentById(speciesId)
-        compartment = model.getComponentById(compartmentId)
-        yData = speciesCounts[species.index, compartment.index, :]
+        index = model.getSpeciesCompartmentIndex()
+        iSpecies, iCompartments = np.array([index[id] for id in speciesCompartmentIds], dtype=int).reshape((-1, 2)).T
+        yData = speciesCounts[iSpecies, iCompartments, :]
     elif isinstance(model, Submodel):
-        yData = speciesCounts[speciesCompartmentId]
+        yData = np.array([speciesCounts[id] for id in speciesCompartmentIds])
     else:
         raise Exception('Invalid model type %s' % model.__class__.__name__)
 
-    return (speciesId, compartmentId, yData)
+    return (list(speciesIds), list(compartmentIds), yData)
+
+
+@functools.lru_cache(maxsize=None)
+def parse_species_compartment_id(speciesCompartmentId):
+    """ Parse the id of a species in a compartment (e.g. ``ATP[c]``)
+
+    Args:
+        speciesCompartmentId (:obj:`str`): id of a species in a compartment
+
+    Returns:
+        :obj:`tuple`:
+            * :obj:`str`: species id
+            * :obj:`str`: compartment id
+    """
+    match = SPECIES_COMPARTMENT_ID_PATTERN.match(speciesCompartmentId)
+    return (match.group('speciesId'), match.group('compartmentId'))
 
 
 def get_scale(units, compartmentId, volume, extracellularVolume):
@@ -105,13 +235,19 @@ def get_scale(units, compartmentId, volume, extracellularVolume):
 
     Args:
         units (:obj:`str`): units
-        compartmentId (:obj:`str`): compartment id
+        compartmentId (:obj:`str` or :obj:`list` of :obj:`str`): compartment id or list of compartment ids
         volume (:obj:`float`): volume
         extracellularVolume (:obj:`float`): extracellular volume
 
     Returns:
-        :obj:`float`: scale
+        :obj:`float`: scale or, for a list of compartment ids, a 2-D array of the scale for each compartment which
+        can be broadcast against the output of :obj:`get_y_data`
     """
+    if not isinstance(compartmentId, str):
+        scales = {id: get_scale(units, id, volume, extracellularVolume) for id in set(compartmentId)}
+        scale = np.array(np.broadcast_arrays(*[scales[id] for id in compartmentId]))
+        return scale.reshape((len(compartmentId), -1))
+
     if compartmentId == 'c':
         V = volume
     else:
@@ -125,3 +261,120 @@ def get_scale(units, compartmentId, volume, extracellularVolume):
         return 1.
     else:
         raise Exception('Invalid units "%s"' % units)
+
+
+def get_group_index(model, key='type'):
+    """ Group the species of a model
+
+    Args:
+        model (:obj:`Model`): model
+        key (:obj:`str` or :obj:`function`, optional): name of the species attribute to group by (e.g. ``type``),
+            or function which maps each species to its group
+
+    Returns:
+        :obj:`tuple`:
+            * :obj:`list`: groups
+            * :obj:`scipy.sparse.csc_matrix`: groups x species matrix whose entries are 1 for the species of each group
+    """
+    if not callable(key):
+        attr = key
+        key = lambda species: getattr(species, attr)
+
+    groupIndices = {}
+    speciesGroups = np.zeros(len(model.species), dtype=int)
+    speciesIndices = np.zeros(len(model.species), dtype=int)
+    for i, species in enumerate(model.species):
+        speciesGroups[i] = groupIndices.setdefault(key(species), len(groupIndices))
+        speciesIndices[i] = species.index
+
+    membership = sparse.csc_matrix((np.ones(len(model.species)), (speciesGroups, speciesIndices)),
+                                   shape=(len(groupIndices), len(model.species)))
+    return (list(groupIndices.keys()), membership)
+
+
+def aggregate_by_group(model, speciesCounts, key='type', compartmentId='c', groupIndex=None, chunkSize=MAX_CHUNK_SIZE):
+    """ Calculate the total counts of each group of species (e.g. each :obj:`Species.type`) in a compartment
+
+    The totals of all groups are calculated with one sparse matrix product of the group membership matrix and the
+    history. The history is read in blocks of species so that large, memory-mapped (see
+    :obj:`history.openSpeciesCountsHistory`) and change-log histories are never fully loaded into memory.
+
+    Args:
+        model (:obj:`Model`): model
+        speciesCounts (:obj:`numpy.ndarray` or :obj:`history.SpeciesCountsChangeLog`): species counts history
+            (species x compartments x time)
+        key (:obj:`str` or :obj:`function`, optional): name of the species attribute to group by, or function which
+            maps each species to its group
+        compartmentId (:obj:`str`, optional): compartment id
+        groupIndex (:obj:`tuple`, optional): grouping precomputed with :obj:`get_group_index`; if provided,
+            :obj:`key` is ignored
+        chunkSize (:obj:`int`, optional): maximum number of values to read at once
+
+    Returns:
+        :obj:`dict`: dictionary of the total counts of each group at each time point
+    """
+    compartment = model.getComponentById(compartmentId, model.compartments)
+    groups, membership = groupIndex or get_group_index(model, key)
+
+    nTimes = speciesCounts.shape[2]
+    nSpeciesPerChunk = max(1, chunkSize // max(1, nTimes))
+
+    totals = np.zeros((len(groups), nTimes))
+    for iStart in range(0, membership.shape[1], nSpeciesPerChunk):
+        rows = slice(iStart, iStart + nSpeciesPerChunk)
+        totals += membership[:, rows] @ np.asarray(speciesCounts[rows, compartment.index, :])
+
+    return dict(zip(groups, totals))
+
+
+def get_totals_by_type(model, speciesCounts, types, compartmentId='c', chunkSize=MAX_CHUNK_SIZE):
+    """ Calculate the total counts of the species of each type (e.g. RNA, protein) in a compartment
+
+    Args:
+        model (:obj:`Model`): model
+        speciesCounts (:obj:`numpy.ndarray`): species counts history (species x compartments x time)
+        types (:obj:`list` of :obj:`str`): species types
+        compartmentId (:obj:`str`, optional): compartment id
+        chunkSize (:obj:`int`, optional): maximum number of values to read at once
+
+    Returns:
+        :obj:`dict` of :obj:`str`, :obj:`numpy.ndarray`: dictionary of the total counts of each type at each time point
+    """
+    totals = aggregate_by_group(model, speciesCounts, key='type', compartmentId=compartmentId, chunkSize=chunkSize)
+    return {type: totals.get(type, np.zeros(speciesCounts.shape[2])) for type in types}
+
+
+def get_concentrations(model, speciesCounts, compartmentId, volume, extracellularVolume, speciesIds=None,
+                       units='mM', chunkSize=MAX_CHUNK_SIZE):
+    """ Calculate the concentrations of species in a compartment
+
+    Args:
+        model (:obj:`Model`): model
+        speciesCounts (:obj:`numpy.ndarray`): species counts history (species x compartments x time)
+        compartmentId (:obj:`str`): compartment id
+        volume (:obj:`numpy.ndarray`): cell volume at each time point
+        extracellularVolume (:obj:`numpy.ndarray`): extracellular volume at each time point
+        speciesIds (:obj:`list` of :obj:`str`, optional): ids of the species; if :obj:`None`, return the
+            concentrations of all species
+        units (:obj:`str`, optional): units
+        chunkSize (:obj:`int`, optional): maximum number of values to read at once
+
+    Returns:
+        :obj:`numpy.ndarray`: concentrations (species x time)
+    """
+    compartment = model.getComponentById(compartmentId, model.compartments)
+    if speciesIds is None:
+        speciesIndices = np.array([species.index for species in model.species], dtype=int)
+    else:
+        speciesIndices = np.array([model.getComponentById(id, model.species).index for id in speciesIds], dtype=int)
+
+    scale = get_scale(units, compartmentId, volume, extracellularVolume)
+
+    nTimes = speciesCounts.shape[2]
+    nSpeciesPerChunk = max(1, chunkSize // max(1, nTimes))
+
+    concs = np.zeros((speciesIndices.size, nTimes))
+    for iStart in range(0, speciesIndices.size, nSpeciesPerChunk):
+        rows = slice(iStart, iStart + nSpeciesPerChunk)
+        concs[rows, :] = speciesCounts[speciesIndices[rows], compartment.index, :] * scale
+    return concs
@@ -0,0 +1,217 @@
+'''
+Simulation history containers
+
+@author Jonathan Karr, karr@mssm.edu
+@date 10/19/2026
+'''
+
+import numpy as np
+
+
+class SpeciesCountsChangeLog(object):
+    ''' Sparse history of species counts which only stores changes
+
+    Rather than storing a dense species x compartment snapshot at every time step, the log stores the
+    initial counts and a list of (time index, species index, compartment index, new value) tuples for the
+    counts which changed since the previous recorded step. Dense trajectories are reconstructed on demand.
+
+    The log supports the indexing used to read dense histories (e.g., ``log[iSpecies, iCompartment, :]``)
+    so it can be passed to the analysis functions in place of a dense array.
+
+    Attributes:
+        initialCounts (:obj:`numpy.ndarray`): initial species counts (rows: species, columns: compartments)
+        nTimeSteps (:obj:`int`): number of recorded time steps, including the initial state
+    '''
+
+    def __init__(self, initialCounts, nTimeSteps):
+        '''
+        Args:
+            initialCounts (:obj:`numpy.ndarray`): initial species counts (rows: species, columns: compartments)
+            nTimeSteps (:obj:`int`): number of recorded time steps, including the initial state
+        '''
+        self.initialCounts = np.array(initialCounts, dtype=np.float64)
+        self.nTimeSteps = nTimeSteps
+
+        self._currentCounts = self.initialCounts.copy()
+        self._chunks = []
+        self._changes = None
+        self._index = None
+
+    @property
+    def shape(self):
+        ''' :obj:`tuple` of :obj:`int`: shape of the equivalent dense history '''
+        return self.initialCounts.shape + (self.nTimeSteps,)
+
+    @property
+    def nChanges(self):
+        ''' :obj:`int`: number of recorded changes '''
+        return self.getChanges()[0].size
+
+    def record(self, iTime, speciesCounts):
+        ''' Record the counts which changed since the previous recorded time step
+
+        Args:
+            iTime (:obj:`int`): index of the time step
+            speciesCounts (:obj:`numpy.ndarray`): species counts at the time step
+        '''
+        iSpecies, iCompartments = np.nonzero(speciesCounts != self._currentCounts)
+        if iSpecies.size:
+            values = speciesCounts[iSpecies, iCompartments]
+            self._currentCounts[iSpecies, iCompartments] = values
+            self._addChanges(np.full(iSpecies.size, iTime), iSpecies, iCompartments, values)
+
+    def recordChange(self, iTime, iSpecies, iCompartment, value):
+        ''' Record a single change, e.g., from one SSA event. Changes must be recorded in chronological order.
+
+        Args:
+            iTime (:obj:`int`): index of the time step
+            iSpecies (:obj:`int`): species index
+            iCompartment (:obj:`int`): compartment index
+            value (:obj:`float`): new copy number
+        '''
+        self._currentCounts[iSpecies, iCompartment] = value
+        self._addChanges(np.array([iTime]), np.array([iSpecies]), np.array([iCompartment]), np.array([value]))
+
+    def _addChanges(self, iTimes, iSpecies, iCompartments, values):
+        self._chunks.append((iTimes, iSpecies, iCompartments, values))
+        self._changes = None
+        self._index = None
+
+    def getChanges(self):
+        ''' Get all of the recorded changes in the order in which they were recorded
+
+        Returns:
+            :obj:`tuple`:
+                * :obj:`numpy.ndarray`: time indices
+                * :obj:`numpy.ndarray`: species indices
+                * :obj:`numpy.ndarray`: compartment indices
+                * :obj:`numpy.ndarray`: new values
+        '''
+        if self._changes is None:
+            if self._chunks:
+                self._changes = tuple(np.concatenate(arrays) for arrays in zip(*self._chunks))
+            else:
+                self._changes = (np.zeros(0, int), np.zeros(0, int), np.zeros(0, int), np.zeros(0))
+            self._chunks = [self._changes]
+        return self._changes
+
+    def getSeries(self, iSpecies, iCompartment):
+        ''' Reconstruct the dense trajectory of one species in one compartment
+
+        Args:
+            iSpecies (:obj:`int`): species index
+            iCompartment (:obj:`int`): compartment index
+
+        Returns:
+            :obj:`numpy.ndarray`: counts at each time step
+        '''
+        iTimes, _, _, values = self.getChanges()
+        sortedKeys, order = self._getIndex()
+
+        key = iSpecies * self.initialCounts.shape[1] + iCompartment
+        start = np.searchsorted(sortedKeys, key, side='left')
+        stop = np.searchsorted(sortedKeys, key, side='right')
+        changeTimes = iTimes[order[start:stop]]
+        changeValues = np.concatenate(([self.initialCounts[iSpecies, iCompartment]], values[order[start:stop]]))
+
+        iLastChanges = np.searchsorted(changeTimes, np.arange(self.nTimeSteps), side='right')
+        return changeValues[iLastChanges]
+
+    def getSeriesBlock(self, iSpecies, iCompartments):
+        ''' Reconstruct the dense trajectories of several species, without reconstructing the entire history
+
+        Args:
+            iSpecies (:obj:`numpy.ndarray`): species indices
+            iCompartments (:obj:`numpy.ndarray`): compartment index of each species
+
+        Returns:
+            :obj:`numpy.ndarray`: counts of each species (rows) at each time step (columns)
+        '''
+        block = np.empty((len(iSpecies), self.nTimeSteps))
+        for iRow, (iSpecie, iCompartment) in enumerate(zip(iSpecies, iCompartments)):
+            block[iRow, :] = self.getSeries(iSpecie, iCompartment)
+        return block
+
+    def _getIndex(self):
+        # sort the changes by species/compartment, preserving their temporal order
+        if self._index is None:
+            _, iSpecies, iCompartments, _ = self.getChanges()
+            keys = iSpecies * self.initialCounts.shape[1] + iCompartments
+            order = np.argsort(keys, kind='stable')
+            self._index = (keys[order], order)
+        return self._index
+
+    def toArray(self):
+        ''' Reconstruct the dense history
+
+        Returns:
+            :obj:`numpy.ndarray`: species counts (species x compartments x time)
+        '''
+        hist = np.empty(self.shape)
+        for iTime, counts in enumerate(self.iterCounts()):
+            hist[:, :, iTime] = counts
+        return hist
+
+    def iterCounts(self):
+        ''' Iterate over the species counts at each time step
+
+        Yields:
+            :obj:`numpy.ndarray`: species counts (rows: species, columns: compartments). The same array is updated
+            in place and yielded at each step.
+        '''
+        iTimes, iSpecies, iCompartments, values = self.getChanges()
+
+        counts = self.initialCounts.copy()
+        bounds = np.searchsorted(iTimes, np.arange(self.nTimeSteps + 1), side='left')
+        for iTime in range(self.nTimeSteps):
+            changes = slice(bounds[iTime], bounds[iTime + 1])
+            counts[iSpecies[changes], iCompartments[changes]] = values[changes]
+            yield counts
+
+    def __getitem__(self, key):
+        if isinstance(key, tuple) and len(key) == 3:
+            iSpecies, iCompartments, times = key
+            if isinstance(iSpecies, (int, np.integer)) and isinstance(iCompartments, (int, np.integer)):
+                return self.getSeries(iSpecies, iCompartments)[times]
+
+            # read blocks of species (e.g., ``log[rows, iCompartment, :]``) series by series
+            if isinstance(iSpecies, slice):
+                iSpecies = np.arange(self.initialCounts.shape[0])[iSpecies]
+            iSpecies = np.asarray(iSpecies)
+            iCompartments = np.asarray(iCompartments)
+            if iSpecies.ndim <= 1 and iCompartments.ndim <= 1 \
+                    and np.issubdtype(iSpecies.dtype, np.integer) and np.issubdtype(iCompartments.dtype, np.integer):
+                iSpecies, iCompartments = np.broadcast_arrays(iSpecies, iCompartments)
+                if iSpecies.ndim == 1:
+                    return self.getSeriesBlock(iSpecies, iCompartments)[:, times]
+        return self.toArray()[key]
+
+
+def saveSpeciesCountsHistory(fileName, speciesCounts):
+    ''' Save a species counts history to a NumPy ``.npy`` file which can be memory-mapped
+
+    Args:
+        fileName (:obj:`str`): path to save the history
+        speciesCounts (:obj:`numpy.ndarray` or :obj:`SpeciesCountsChangeLog`): species counts history
+            (species x compartments x time)
+    '''
+    hist = np.lib.format.open_memmap(fileName, mode='w+', dtype=np.float64, shape=speciesCounts.shape)
+    if isinstance(speciesCounts, SpeciesCountsChangeLog):
+        for iTime, counts in enumerate(speciesCounts.iterCounts()):
+            hist[:, :, iTime] = counts
+    else:
+        hist[:] = speciesCounts
+    hist.flush()
+    del hist
+
+
+def openSpeciesCountsHistory(fileName):
+    ''' Open a saved species counts history as a read-only memory map, without loading it into memory
+
+    Args:
+        fileName (:obj:`str`): path to a history saved with :obj:`saveSpeciesCountsHistory`
+
+    Returns:
+        :obj:`numpy.memmap`: species counts history (species x compartments x time)
+    '''
+    return np.load(fileName, mmap_mode='r')
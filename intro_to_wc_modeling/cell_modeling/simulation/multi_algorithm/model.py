@@ -40,6 +40,8 @@ class Model(object):
     extracellularVolume = None  # media volume
     growth = None
 
+    _speciesCompartmentIndex = None
+
     def __init__(self, submodels=None, compartments=None, species=None, reactions=None, parameters=None, references=None):
         if submodels is None:
             submodels = []
@@ -135,6 +137,18 @@ class Model(object):
             obj.index = index
         for index, obj in enumerate(self.references):
             obj.index = index
+        self._speciesCompartmentIndex = None
+
+    def getSpeciesCompartmentIndex(self):
+        # get dictionary which maps the id of each species in each compartment (e.g. `ATP[c]`) to the indices of
+        # the species and compartment; the dictionary is built once and reused
+
+        if self._speciesCompartmentIndex is None:
+            self._speciesCompartmentIndex = {}
+            for species in self.species:
+                for compartment in self.compartments:
+                    self._speciesCompartmentIndex['%s[%s]' % (species.id, compartment.id)] = (species.index, compartment.index)
+        return self._speciesCompartmentIndex
 
     def getSpeciesCountsDict(self):
         # get species counts as dictionary
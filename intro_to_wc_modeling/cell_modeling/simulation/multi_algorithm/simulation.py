@@ -7,6 +7,7 @@ Simulates metabolism submodel
 
 # required libraries
 from intro_to_wc_modeling.cell_modeling.simulation.multi_algorithm import analysis
+from intro_to_wc_modeling.cell_modeling.simulation.multi_algorithm import history
 from intro_to_wc_modeling.cell_modeling.simulation.multi_algorithm import model
 from intro_to_wc_modeling.cell_modeling.simulation.multi_algorithm import util
 from numpy import random
@@ -22,8 +23,11 @@ DEFAULT_OUTPUT_DIRECTORY = os.path.join(os.path.dirname(__file__), '..', '..', '
 RANDOM_SEED = 10000000
 
 
-def simulate(mdl):
+def simulate(mdl, recordChanges=False):
     # simulates model
+    #
+    # if `recordChanges` is `True`, the species counts history is returned as a
+    # `history.SpeciesCountsChangeLog` which only stores the counts which change at each step
 
     # Get FBA, SSA submodels
     ssaSubmodels = []
@@ -56,8 +60,11 @@ def simulate(mdl):
     growthHist = np.full(nTimeStepsRecord, np.nan)
     growthHist[0] = np.log(2) / cellCycleLength
 
-    speciesCountsHist = np.zeros((len(mdl.species), len(mdl.compartments), nTimeStepsRecord))
-    speciesCountsHist[:, :, 0] = mdl.speciesCounts
+    if recordChanges:
+        speciesCountsHist = history.SpeciesCountsChangeLog(mdl.speciesCounts, nTimeStepsRecord)
+    else:
+        speciesCountsHist = np.zeros((len(mdl.species), len(mdl.compartments), nTimeStepsRecord))
+        speciesCountsHist[:, :, 0] = mdl.speciesCounts
 
     # Simulate dynamics
     print('Simulating for {} time steps from 0-{} s'.format(nTimeSteps, timeMax))
@@ -119,7 +126,10 @@ def simulate(mdl):
         # Record state
         volumeHist[iTime] = mdl.volume
         growthHist[iTime] = mdl.growth
-        speciesCountsHist[:, :, iTime] = mdl.speciesCounts
+        if recordChanges:
+            speciesCountsHist.record(iTime, mdl.speciesCounts)
+        else:
+            speciesCountsHist[:, :, iTime] = mdl.speciesCounts
 
     return (timeHist, volumeHist, growthHist, speciesCountsHist)
 
@@ -130,81 +140,53 @@ def analyzeResults(mdl, time, volume, growth, speciesCounts, output_directory):
     if not os.path.exists(output_directory):
         os.makedirs(output_directory)
 
-    cellComp = mdl.getComponentById('c')
+    totals = analysis.get_totals_by_type(mdl, speciesCounts, ['RNA', 'Protein'], compartmentId='c')
+    totalRna = totals['RNA']
+    totalProt = totals['Protein']
 
-    totalRna = np.zeros(len(time))
-    totalProt = np.zeros(len(time))
-    for species in mdl.species:
-        if species.type == 'RNA':
-            totalRna += speciesCounts[species.index, cellComp.index, :]
-        elif species.type == 'Protein':
-            totalProt += speciesCounts[species.index, cellComp.index, :]
-
-    analysis.plot(
-        model=mdl,
-        time=time,
-        yDatas={'Volume': volume},
-        fileName=os.path.join(output_directory, 'Volume.png')
-    )
-
-    analysis.plot(
-        model=mdl,
-        time=time,
-        yDatas={'Growth': growth},
-        fileName=os.path.join(output_directory, 'Growth.png')
-    )
-
-    analysis.plot(
-        model=mdl,
-        time=time,
-        yDatas={'RNA': totalRna},
-        fileName=os.path.join(output_directory, 'Total-RNA.png')
-    )
-
-    analysis.plot(
-        model=mdl,
-        time=time,
-        yDatas={'Protein': totalProt},
-        fileName=os.path.join(output_directory, 'Total-protein.png')
-    )
-
-    analysis.plot(
+    analysis.plot_batch(
         model=mdl,
         time=time,
         volume=volume,
         speciesCounts=speciesCounts,
-        units='molecules',
-        selectedSpeciesCompartments=['ATP[c]', 'CTP[c]', 'GTP[c]', 'UTP[c]'],
-        fileName=os.path.join(output_directory, 'NTPs.png')
-    )
-
-    analysis.plot(
-        model=mdl,
-        time=time,
-        volume=volume,
-        speciesCounts=speciesCounts,
-        selectedSpeciesCompartments=['AMP[c]', 'CMP[c]', 'GMP[c]', 'UMP[c]'],
-        units='uM',
-        fileName=os.path.join(output_directory, 'NMPs.png')
-    )
-
-    analysis.plot(
-        model=mdl,
-        time=time,
-        volume=volume,
-        speciesCounts=speciesCounts,
-        selectedSpeciesCompartments=['ALA[c]', 'ARG[c]', 'ASN[c]', 'ASP[c]'],
-        units='uM',
-        fileName=os.path.join(output_directory, 'Amino-acids.png')
-    )
-
-    analysis.plot(
-        model=mdl,
-        time=time,
-        speciesCounts=speciesCounts,
-        units='molecules',
-        selectedSpeciesCompartments=['RnaPolymerase-Protein[c]', 'Adk-Protein[c]', 'Apt-Protein[c]', 'Cmk-Protein[c]'],
-        fileName=os.path.join(output_directory, 'Proteins.png')
+        specs=[
+            {
+                'yDatas': {'Volume': volume},
+                'fileName': os.path.join(output_directory, 'Volume.png'),
+            },
+            {
+                'yDatas': {'Growth': growth},
+                'fileName': os.path.join(output_directory, 'Growth.png'),
+            },
+            {
+                'yDatas': {'RNA': totalRna},
+                'fileName': os.path.join(output_directory, 'Total-RNA.png'),
+            },
+            {
+                'yDatas': {'Protein': totalProt},
+                'fileName': os.path.join(output_directory, 'Total-protein.png'),
+            },
+            {
+                'units': 'molecules',
+                'selectedSpeciesCompartments': ['ATP[c]', 'CTP[c]', 'GTP[c]', 'UTP[c]'],
+                'fileName': os.path.join(output_directory, 'NTPs.png'),
+            },
+            {
+                'selectedSpeciesCompartments': ['AMP[c]', 'CMP[c]', 'GMP[c]', 'UMP[c]'],
+                'units': 'uM',
+                'fileName': os.path.join(output_directory, 'NMPs.png'),
+            },
+            {
+                'selectedSpeciesCompartments': ['ALA[c]', 'ARG[c]', 'ASN[c]', 'ASP[c]'],
+                'units': 'uM',
+                'fileName': os.path.join(output_directory, 'Amino-acids.png'),
+            },
+            {
+                'units': 'molecules',
+                'selectedSpeciesCompartments': ['RnaPolymerase-Protein[c]', 'Adk-Protein[c]', 'Apt-Protein[c]', 'Cmk-Protein[c]'],
+                'fileName': os.path.join(output_directory, 'Proteins.png'),
+            },
+        ],
     )
 
 
@@ -127,48 +127,36 @@ def analyzeResults(mdl, time, volume, growth, speciesCounts, output_directory):
 
     submdl = mdl.getComponentById('Metabolism')
 
-    analysis.plot(
-        model=submdl,
-        time=time,
-        yDatas={'Volume': volume},
-        fileName=os.path.join(output_directory, 'Volume.png')
-    )
-
-    analysis.plot(
-        model=submdl,
-        time=time,
-        yDatas={'Growth': growth},
-        fileName=os.path.join(output_directory, 'Growth.png')
-    )
-
-    analysis.plot(
-        model=submdl,
-        time=time,
-        volume=volume,
-        speciesCounts=speciesCounts,
-        units='mM',
-        selectedSpeciesCompartments=['ATP[c]', 'CTP[c]', 'GTP[c]', 'UTP[c]'],
-        fileName=os.path.join(output_directory, 'NTPs.png')
-    )
-
-    analysis.plot(
-        model=submdl,
-        time=time,
-        volume=volume,
-        speciesCounts=speciesCounts,
-        selectedSpeciesCompartments=['ALA[c]', 'ARG[c]', 'ASN[c]', 'ASP[c]'],
-        units='uM',
-        fileName=os.path.join(output_directory, 'Amino-acids.png')
-    )
-
-    analysis.plot(
+    analysis.plot_batch(
         model=submdl,
         time=time,
         volume=volume,
         speciesCounts=speciesCounts,
-        units='molecules',
-        selectedSpeciesCompartments=['Adk-Protein[c]', 'Apt-Protein[c]', 'Cmk-Protein[c]'],
-        fileName=os.path.join(output_directory, 'Proteins.png')
+        specs=[
+            {
+                'yDatas': {'Volume': volume},
+                'fileName': os.path.join(output_directory, 'Volume.png'),
+            },
+            {
+                'yDatas': {'Growth': growth},
+                'fileName': os.path.join(output_directory, 'Growth.png'),
+            },
+            {
+                'units': 'mM',
+                'selectedSpeciesCompartments': ['ATP[c]', 'CTP[c]', 'GTP[c]', 'UTP[c]'],
+                'fileName': os.path.join(output_directory, 'NTPs.png'),
+            },
+            {
+                'selectedSpeciesCompartments': ['ALA[c]', 'ARG[c]', 'ASN[c]', 'ASP[c]'],
+                'units': 'uM',
+                'fileName': os.path.join(output_directory, 'Amino-acids.png'),
+            },
+            {
+                'units': 'molecules',
+                'selectedSpeciesCompartments': ['Adk-Protein[c]', 'Apt-Protein[c]', 'Cmk-Protein[c]'],
+                'fileName': os.path.join(output_directory, 'Proteins.png'),
+            },
+        ],
     )
 
 
@@ -6,11 +6,152 @@
 :License: MIT
 """
 
+from concurrent import futures
 from matplotlib import pyplot
 import numpy
 import scipy.integrate
 import os
 
+class GoldbeterModel(object):
+    """ Goldbeter 1991 cell cycle model
+    (`BIOMD0000000003 <http://www.ebi.ac.uk/biomodels-main/BIOMD0000000003>`_)
+
+    The parameters are bound once when the model is constructed. Each parameter can either be a scalar or an array of
+    values for several parameter sets, in which case the right-hand side and Jacobian are evaluated for all of the
+    parameter sets at once.
+
+    Attributes:
+        cell (:obj:`float` or :obj:`numpy.ndarray`): compartment volume
+        vi (:obj:`float` or :obj:`numpy.ndarray`): cyclin synthesis rate
+        kd (:obj:`float` or :obj:`numpy.ndarray`): default cyclin degradation rate constant
+        vd (:obj:`float` or :obj:`numpy.ndarray`): maximum rate of cyclin degradation by the cyclin protease
+        Kd (:obj:`float` or :obj:`numpy.ndarray`): Michaelis constant of cyclin degradation by the cyclin protease
+        K1 (:obj:`float` or :obj:`numpy.ndarray`): Michaelis constant of Cdc2 activation
+        V2 (:obj:`float` or :obj:`numpy.ndarray`): maximum rate of Cdc2 deactivation
+        K2 (:obj:`float` or :obj:`numpy.ndarray`): Michaelis constant of Cdc2 deactivation
+        K3 (:obj:`float` or :obj:`numpy.ndarray`): Michaelis constant of cyclin protease activation
+        V4 (:obj:`float` or :obj:`numpy.ndarray`): maximum rate of cyclin protease deactivation
+        K4 (:obj:`float` or :obj:`numpy.ndarray`): Michaelis constant of cyclin protease deactivation
+        VM1 (:obj:`float` or :obj:`numpy.ndarray`): maximum rate of Cdc2 activation
+        VM3 (:obj:`float` or :obj:`numpy.ndarray`): maximum rate of cyclin protease activation
+        Kc (:obj:`float` or :obj:`numpy.ndarray`): cyclin concentration at which Cdc2 activation is half maximal
+    """
+
+    def __init__(self, cell=1.0, vi=0.025, kd=0.01, vd=0.25, Kd=0.02, K1=0.005, V2=1.5, K2=0.005, K3=0.005,
+                 V4=0.5, K4=0.005, VM1=3., VM3=1., Kc=0.5):
+        """
+        Args:
+            cell (:obj:`float` or :obj:`numpy.ndarray`, optional): compartment volume
+            vi (:obj:`float` or :obj:`numpy.ndarray`, optional): cyclin synthesis rate
+            kd (:obj:`float` or :obj:`numpy.ndarray`, optional): default cyclin degradation rate constant
+            vd (:obj:`float` or :obj:`numpy.ndarray`, optional): maximum rate of cyclin degradation by the cyclin
+                protease
+            Kd (:obj:`float` or :obj:`numpy.ndarray`, optional): Michaelis constant of cyclin degradation by the
+                cyclin protease
+            K1 (:obj:`float` or :obj:`numpy.ndarray`, optional): Michaelis constant of Cdc2 activation
+            V2 (:obj:`float` or :obj:`numpy.ndarray`, optional): maximum rate of Cdc2 deactivation
+            K2 (:obj:`float` or :obj:`numpy.ndarray`, optional): Michaelis constant of Cdc2 deactivation
+            K3 (:obj:`float` or :obj:`numpy.ndarray`, optional): Michaelis constant of cyclin protease activation
+            V4 (:obj:`float` or :obj:`numpy.ndarray`, optional): maximum rate of cyclin protease deactivation
+            K4 (:obj:`float` or :obj:`numpy.ndarray`, optional): Michaelis constant of cyclin protease deactivation
+            VM1 (:obj:`float` or :obj:`numpy.ndarray`, optional): maximum rate of Cdc2 activation
+            VM3 (:obj:`float` or :obj:`numpy.ndarray`, optional): maximum rate of cyclin protease activation
+            Kc (:obj:`float` or :obj:`numpy.ndarray`, optional): cyclin concentration at which Cdc2 activation is
+                half maximal
+        """
+        self.cell = cell
+        self.vi = vi
+        self.kd = kd
+        self.vd = vd
+        self.Kd = Kd
+        self.K1 = K1
+        self.V2 = V2
+        self.K2 = K2
+        self.K3 = K3
+        self.V4 = V4
+        self.K4 = K4
+        self.VM1 = VM1
+        self.VM3 = VM3
+        self.Kc = Kc
+
+    def d_conc_d_t(self, concs, time):
+        """ Calculate differentials
+
+        Args:
+            concs (:obj:`numpy.ndarray`): array of current concentrations of cyclin, active Cdc2, and active cyclin
+                protease, or a (3 x k) array of the concentrations of k states or parameter sets
+            time (:obj:`float`): time
+
+        Returns:
+            :obj:`numpy.ndarray`: differentials, with the same shape as :obj:`concs`
+        """
+        C = concs[0] # cyclin
+        M = concs[1] # cdc2
+        X = concs[2] # cyclin protease
+
+        V1 = C * self.VM1 / (C + self.Kc)
+        V3 = M * self.VM3
+
+        r_cyclin_creation = self.cell * self.vi
+        r_default_cyclin_degradation = C * self.cell * self.kd
+        r_cdc2_triggered_cyclin_degradation = C * self.cell * self.vd * X / (C + self.Kd)
+        r_activation_of_cdc2 = self.cell * (1 - M) * V1 / (self.K1 - M + 1)
+        r_deactivation_of_cdc2 = self.cell * M * self.V2 / (self.K2 + M)
+        r_activation_of_cyclin_protease = self.cell * V3 * (1 - X) / (self.K3 - X + 1)
+        r_deactivation_of_cyclin_protease = self.cell * self.V4 * X / (self.K4 + X)
+
+        d_cyclin_dt = \
+            + r_cyclin_creation \
+            - r_default_cyclin_degradation \
+            - r_cdc2_triggered_cyclin_degradation
+        d_cdc2_dt = \
+            + r_activation_of_cdc2 \
+            - r_deactivation_of_cdc2
+        d_cyclin_protease_dt = \
+            + r_activation_of_cyclin_protease \
+            - r_deactivation_of_cyclin_protease
+
+        return numpy.array(numpy.broadcast_arrays(
+            d_cyclin_dt,
+            d_cdc2_dt,
+            d_cyclin_protease_dt
+            ))
+
+    def jacobian(self, concs, time):
+        """ Calculate the analytic Jacobian of the differentials
+
+        Args:
+            concs (:obj:`numpy.ndarray`): array of current concentrations of cyclin, active Cdc2, and active cyclin
+                protease, or a (3 x k) array of the concentrations of k states or parameter sets
+            time (:obj:`float`): time
+
+        Returns:
+            :obj:`numpy.ndarray`: (3 x 3) array of the partial derivative of each differential (rows) with respect to
+            each concentration (columns), or a (3 x 3 x k) array for k states or parameter sets
+        """
+        C = concs[0] # cyclin
+        M = concs[1] # cdc2
+        X = concs[2] # cyclin protease
+
+        V1 = C * self.VM1 / (C + self.Kc)
+        V3 = M * self.VM3
+
+        d_cyclin_d_cyclin = -self.cell * (self.kd + self.vd * X * self.Kd / (C + self.Kd) ** 2)
+        d_cyclin_d_cyclin_protease = -self.cell * self.vd * C / (C + self.Kd)
+        d_cdc2_d_cyclin = self.cell * (1 - M) / (self.K1 - M + 1) * self.VM1 * self.Kc / (C + self.Kc) ** 2
+        d_cdc2_d_cdc2 = -self.cell * (V1 * self.K1 / (self.K1 - M + 1) ** 2 + self.V2 * self.K2 / (self.K2 + M) ** 2)
+        d_cyclin_protease_d_cdc2 = self.cell * self.VM3 * (1 - X) / (self.K3 - X + 1)
+        d_cyclin_protease_d_cyclin_protease = -self.cell * (
+            V3 * self.K3 / (self.K3 - X + 1) ** 2 + self.V4 * self.K4 / (self.K4 + X) ** 2)
+
+        jac = numpy.array(numpy.broadcast_arrays(
+            d_cyclin_d_cyclin, 0., d_cyclin_d_cyclin_protease,
+            d_cdc2_d_cyclin, d_cdc2_d_cdc2, 0.,
+            0., d_cyclin_protease_d_cdc2, d_cyclin_protease_d_cyclin_protease,
+            ))
+        return jac.reshape((3, 3) + jac.shape[1:])
+
+
 def d_conc_d_t(concs, time):
     """ Calculate differentials for Goldbeter 1991 cell cycle model
     (`BIOMD0000000003 <http://www.ebi.ac.uk/biomodels-main/BIOMD0000000003>`_)
@@ -22,52 +163,313 @@ def d_conc_d_t(concs, time):
     Returns:
         :obj:`numpy.ndarray`
     """
-    cell = 1.0
-    vi = 0.025
-    kd = 0.01
-    vd = 0.25
-    Kd = 0.02
-    K1 = 0.005
-    V2 = 1.5
-    K2 = 0.005
-    K3 = 0.005
-    V4 = 0.5
-    K4 = 0.005
-    VM1 = 3.
-    VM3 = 1.
-    Kc = 0.5
-
-    C = concs[0] # cyclin
-    M = concs[1] # cdc2
-    X = concs[2] # cyclin protease
-
-    V1 = C * VM1 / (C + Kc)
-    V3 = M * VM3
-
-    r_cyclin_creation = cell * vi
-    r_default_cyclin_degradation = C * cell * kd
-    r_cdc2_triggered_cyclin_degradation = C * cell * vd * X / (C + Kd)
-    r_activation_of_cdc2 = cell * (1 - M) * V1 / (K1 - M + 1)
-    r_deactivation_of_cdc2 = cell * M * V2 / (K2 + M)
-    r_activation_of_cyclin_protease = cell * V3 * (1 - X) / (K3 - X + 1)
-    r_deactivation_of_cyclin_protease = cell * V4 * X / (K4 + X)
-
-    d_cyclin_dt = \
-        + r_cyclin_creation \
-        - r_default_cyclin_degradation \
-        - r_cdc2_triggered_cyclin_degradation
-    d_cdc2_dt = \
-        + r_activation_of_cdc2 \
-        - r_deactivation_of_cdc2
-    d_cyclin_protease_dt = \
-        + r_activation_of_cyclin_protease \
-        - r_deactivation_of_cyclin_protease
-
-    return numpy.array([
-        d_cyclin_dt,
-        d_cdc2_dt,
-        d_cyclin_protease_dt
-        ])
+    return _default_model.d_conc_d_t(concs, time)
+
+
+_default_model = GoldbeterModel()
+
+
+class OdeResult(object):
+    """ Results of an integration with :obj:`integrate`
+
+    Attributes:
+        t (:obj:`numpy.ndarray`): requested time points
+        x (:obj:`numpy.ndarray`): predicted value of each variable (columns) at each requested time point (rows); if
+            the integration stopped at a steady state, the steady state is reported for the subsequent time points
+        t_stop (:obj:`float`): time at which the integration stopped
+        x_stop (:obj:`numpy.ndarray`): value of each variable when the integration stopped
+        steady_state (:obj:`bool`): :obj:`True` if the integration stopped because the system reached a steady state
+        peak_times (:obj:`dict`): dictionary which maps the index of each variable whose peaks were detected to the
+            times of its local maxima
+        crossing_times (:obj:`dict`): dictionary which maps each tuple of the index of a variable and a threshold to
+            the times when the variable crossed the threshold
+        n_rhs_evals (:obj:`int`): number of evaluations of the right-hand side by the solver
+        sol (:obj:`scipy.integrate.OdeSolution`): continuous solution, or :obj:`None` if dense output wasn't requested
+    """
+
+    def __init__(self, t, x, t_stop, x_stop, steady_state, peak_times, crossing_times, n_rhs_evals, sol):
+        """
+        Args:
+            t (:obj:`numpy.ndarray`): requested time points
+            x (:obj:`numpy.ndarray`): predicted value of each variable (columns) at each requested time point (rows)
+            t_stop (:obj:`float`): time at which the integration stopped
+            x_stop (:obj:`numpy.ndarray`): value of each variable when the integration stopped
+            steady_state (:obj:`bool`): :obj:`True` if the integration stopped at a steady state
+            peak_times (:obj:`dict`): times of the local maxima of variables
+            crossing_times (:obj:`dict`): times of the threshold crossings of variables
+            n_rhs_evals (:obj:`int`): number of evaluations of the right-hand side
+            sol (:obj:`scipy.integrate.OdeSolution`): continuous solution
+        """
+        self.t = t
+        self.x = x
+        self.t_stop = t_stop
+        self.x_stop = x_stop
+        self.steady_state = steady_state
+        self.peak_times = peak_times
+        self.crossing_times = crossing_times
+        self.n_rhs_evals = n_rhs_evals
+        self.sol = sol
+
+    def __call__(self, t):
+        """ Evaluate the continuous solution at arbitrary times, without integrating again
+
+        Args:
+            t (:obj:`float` or :obj:`numpy.ndarray`): time or times
+
+        Returns:
+            :obj:`numpy.ndarray`: value of each variable, or of each variable (columns) at each time (rows)
+
+        Raises:
+            :obj:`ValueError`: if dense output wasn't requested
+        """
+        if self.sol is None:
+            raise ValueError('Dense output must be requested to evaluate the solution at arbitrary times')
+
+        t = numpy.asarray(t, dtype=float)
+        x = numpy.array(self.sol(numpy.minimum(t, self.t_stop))).T
+        if self.steady_state:
+            x[t > self.t_stop, ...] = self.x_stop
+        return x
+
+
+def integrate(fun, x_0, t_0, t_end, t_eval=None, jac=None, jac_sparsity=None, method='LSODA', steady_state_tol=None,
+              peak_indices=(), thresholds=(), dense_output=False, rtol=1.49012e-8, atol=1.49012e-8):
+    """ Integrate a system of ODEs with :obj:`scipy.integrate.solve_ivp`, optionally stopping once the system reaches
+    a steady state and detecting the peaks and threshold crossings of variables
+
+    Args:
+        fun (:obj:`function`): function which calculates the time derivatives of the variables, with the signature
+            ``fun(t, x)``
+        x_0 (:obj:`numpy.ndarray`): initial values of the variables
+        t_0 (:obj:`float`): initial time
+        t_end (:obj:`float`): final time
+        t_eval (:obj:`numpy.ndarray`, optional): time points at which to record the variables; by default, the time
+            points chosen by the solver
+        jac (:obj:`function`, optional): function which calculates the Jacobian, with the signature ``jac(t, x)``
+        jac_sparsity (:obj:`scipy.sparse.spmatrix`, optional): sparsity pattern of the Jacobian, which the implicit
+            methods use to estimate the Jacobian with fewer evaluations of :obj:`fun` if :obj:`jac` isn't provided
+        method (:obj:`str`, optional): integration method
+        steady_state_tol (:obj:`float`, optional): if set, stop once the norm of the time derivatives falls below
+            this tolerance
+        peak_indices (:obj:`list` of :obj:`int`, optional): indices of the variables whose peaks should be detected
+        thresholds (:obj:`list` of :obj:`tuple`, optional): list of tuples of the index of a variable and a threshold
+            whose crossings should be detected
+        dense_output (:obj:`bool`, optional): if :obj:`True`, keep a continuous solution
+        rtol (:obj:`float`, optional): relative tolerance
+        atol (:obj:`float`, optional): absolute tolerance
+
+    Returns:
+        :obj:`OdeResult`: results
+    """
+    x_0 = numpy.array(x_0, dtype=float)
+    events = []
+
+    if steady_state_tol is not None:
+        if numpy.linalg.norm(fun(t_0, x_0)) <= steady_state_tol:
+            t = numpy.array([t_0]) if t_eval is None else numpy.array(t_eval, dtype=float)
+            return OdeResult(t, numpy.tile(x_0, (t.size, 1)), t_0, x_0, True,
+                             {i_var: numpy.zeros(0) for i_var in peak_indices},
+                             {tuple(threshold): numpy.zeros(0) for threshold in thresholds},
+                             1, None)
+
+        def steady_state_event(t, x):
+            return numpy.linalg.norm(fun(t, x)) - steady_state_tol
+        steady_state_event.terminal = True
+        steady_state_event.direction = -1
+        events.append(steady_state_event)
+
+    for i_var in peak_indices:
+        events.append(_make_peak_event(fun, i_var))
+
+    for i_var, threshold in thresholds:
+        events.append(_make_threshold_event(i_var, threshold))
+
+    kwargs = {}
+    if jac is not None and method in ['Radau', 'BDF', 'LSODA']:
+        kwargs['jac'] = jac
+    elif jac_sparsity is not None and method in ['Radau', 'BDF']:
+        kwargs['jac_sparsity'] = jac_sparsity
+    result = scipy.integrate.solve_ivp(fun, (t_0, t_end), x_0, method=method, t_eval=t_eval, events=events or None,
+                                       dense_output=dense_output, rtol=rtol, atol=atol, **kwargs)
+    if result.status == -1:
+        raise ValueError('Integration failed: {}'.format(result.message))
+
+    t_events = list(result.t_events or [])
+    steady_state = result.status == 1
+    if steady_state_tol is not None:
+        t_events.pop(0)
+    peak_times = {i_var: t_events.pop(0) for i_var in peak_indices}
+    crossing_times = {(i_var, threshold): t_events.pop(0) for i_var, threshold in thresholds}
+
+    t_stop = result.t_events[0][0] if steady_state else t_end
+    x_stop = result.y_events[0][0] if steady_state else result.y[:, -1]
+
+    t = result.t
+    x = result.y.T
+    if steady_state and t_eval is not None:
+        t = numpy.array(t_eval, dtype=float)
+        x = numpy.concatenate((x, numpy.tile(x_stop, (t.size - x.shape[0], 1))))
+
+    return OdeResult(t, x, t_stop, x_stop, steady_state, peak_times, crossing_times, result.nfev, result.sol)
+
+
+def _make_peak_event(fun, i_var):
+    def peak_event(t, x):
+        return fun(t, x)[i_var]
+    peak_event.direction = -1
+    return peak_event
+
+
+def _make_threshold_event(i_var, threshold):
+    def threshold_event(t, x):
+        return x[i_var] - threshold
+    return threshold_event
+
+
+def make_parameter_grid(**parameter_values):
+    """ Make a grid of all combinations of the values of several parameters
+
+    Args:
+        **parameter_values (:obj:`dict`): dictionary which maps the names of parameters of :obj:`GoldbeterModel` to
+            lists of values
+
+    Returns:
+        :obj:`dict`: dictionary which maps the name of each parameter to an array of its value in each parameter set
+    """
+    names = sorted(parameter_values.keys())
+    grids = numpy.meshgrid(*[numpy.array(parameter_values[name], dtype=float) for name in names], indexing='ij')
+    return {name: grid.ravel() for name, grid in zip(names, grids)}
+
+
+def sweep(parameter_sets, init_concs=(0.01, 0.01, 0.01), time_max=300., time_step=0.1, transient_time=100.,
+          block_size=256, n_processes=None):
+    """ Integrate the model for many parameter sets and extract the period and amplitude of the cyclin oscillations
+
+    The parameter sets are integrated in blocks. The parameter sets in each block are stacked into one system with a
+    block-diagonal (banded) Jacobian, and the blocks are integrated in parallel. The period and amplitude of each
+    trajectory are extracted as soon as its block is integrated, so only the compact table of results is returned.
+
+    Args:
+        parameter_sets (:obj:`dict`): dictionary which maps the names of parameters of :obj:`GoldbeterModel` to
+            arrays of their values in each parameter set (e.g., from :obj:`make_parameter_grid`)
+        init_concs (:obj:`tuple` of :obj:`float`, optional): initial concentrations of cyclin, active Cdc2, and active
+            cyclin protease
+        time_max (:obj:`float`, optional): simulation length (min)
+        time_step (:obj:`float`, optional): frequency at which to sample the trajectories (min)
+        transient_time (:obj:`float`, optional): length of the initial transient to ignore (min)
+        block_size (:obj:`int`, optional): number of parameter sets to integrate together
+        n_processes (:obj:`int`, optional): number of processes; if 1, integrate the blocks in this process
+
+    Returns:
+        :obj:`numpy.ndarray`: structured array with the value of each parameter, the period (min; NaN if the cyclin
+        doesn't oscillate), and the amplitude of the cyclin concentration of each parameter set
+    """
+    names = sorted(parameter_sets.keys())
+    values = numpy.array([numpy.array(parameter_sets[name], dtype=float) for name in names]).reshape((len(names), -1))
+    n_sets = values.shape[1]
+
+    time_hist = numpy.linspace(0., time_max, int(time_max / time_step + 1))
+    jobs = []
+    for i_start in range(0, n_sets, block_size):
+        block_parameters = {name: value[i_start:i_start + block_size] for name, value in zip(names, values)}
+        jobs.append((block_parameters, init_concs, time_hist, transient_time))
+
+    if n_processes is None:
+        n_processes = min(len(jobs), os.cpu_count() or 1)
+
+    if n_processes <= 1:
+        block_results = [_sweep_block(*job) for job in jobs]
+    else:
+        with futures.ProcessPoolExecutor(max_workers=n_processes) as executor:
+            block_results = list(executor.map(_sweep_block, *zip(*jobs)))
+
+    results = numpy.zeros(n_sets, dtype=[(name, float) for name in names] + [('period', float), ('amplitude', float)])
+    for name, value in zip(names, values):
+        results[name] = value
+    if block_results:
+        results['period'] = numpy.concatenate([periods for periods, _ in block_results])
+        results['amplitude'] = numpy.concatenate([amplitudes for _, amplitudes in block_results])
+    return results
+
+
+def _sweep_block(parameters, init_concs, time_hist, transient_time):
+    """ Integrate a block of parameter sets as one stacked system and extract the period and amplitude of each
+
+    Args:
+        parameters (:obj:`dict`): dictionary which maps the names of parameters to arrays of their values
+        init_concs (:obj:`tuple` of :obj:`float`): initial concentrations
+        time_hist (:obj:`numpy.ndarray`): time points to sample
+        transient_time (:obj:`float`): length of the initial transient to ignore
+
+    Returns:
+        :obj:`tuple`:
+
+            * :obj:`numpy.ndarray`: period of each parameter set
+            * :obj:`numpy.ndarray`: amplitude of each parameter set
+    """
+    model = GoldbeterModel(**parameters)
+    n_sets = len(next(iter(parameters.values())))
+
+    # order the stacked state by parameter set, so that the Jacobian is block diagonal with two bands on each side
+    def d_conc_d_t(concs, time):
+        return model.d_conc_d_t(concs.reshape((n_sets, 3)).T, time).T.ravel()
+
+    def jacobian(concs, time):
+        jac = model.jacobian(concs.reshape((n_sets, 3)).T, time) * numpy.ones(n_sets)
+        bands = numpy.zeros((5, n_sets, 3))
+        for i_row in range(3):
+            for i_col in range(3):
+                bands[i_row - i_col + 2, :, i_col] = jac[i_row, i_col, :]
+        return bands.reshape((5, 3 * n_sets))
+
+    init_concs = numpy.tile(numpy.array(init_concs, dtype=float), n_sets)
+    conc_hist = scipy.integrate.odeint(d_conc_d_t, init_concs, time_hist, Dfun=jacobian, ml=2, mu=2)
+    return extract_period_and_amplitude(time_hist[time_hist >= transient_time],
+                                        conc_hist[time_hist >= transient_time, 0::3])
+
+
+def extract_period_and_amplitude(time_hist, conc_hist, rel_tol=1e-3):
+    """ Extract the period and amplitude of several trajectories
+
+    The period is the mean time between the upward crossings of the midpoint between the minimum and maximum of each
+    trajectory.
+
+    Args:
+        time_hist (:obj:`numpy.ndarray`): time points
+        conc_hist (:obj:`numpy.ndarray`): concentration at each time point (rows) of each trajectory (columns)
+        rel_tol (:obj:`float`, optional): minimum amplitude, relative to the maximum, of an oscillation
+
+    Returns:
+        :obj:`tuple`:
+
+            * :obj:`numpy.ndarray`: period of each trajectory (NaN if the trajectory doesn't oscillate)
+            * :obj:`numpy.ndarray`: amplitude of each trajectory
+    """
+    conc_max = numpy.max(conc_hist, axis=0)
+    conc_min = numpy.min(conc_hist, axis=0)
+    amplitude = conc_max - conc_min
+    midpoint = (conc_max + conc_min) / 2
+
+    # interpolate the times of the upward crossings of the midpoints
+    below = conc_hist[:-1, :] < midpoint
+    crossings = below & (conc_hist[1:, :] >= midpoint)
+    n_crossings = numpy.sum(crossings, axis=0)
+    with numpy.errstate(divide='ignore', invalid='ignore'):
+        frac = (midpoint - conc_hist[:-1, :]) / (conc_hist[1:, :] - conc_hist[:-1, :])
+    crossing_times = time_hist[:-1].reshape((-1, 1)) + frac * numpy.diff(time_hist).reshape((-1, 1))
+
+    i_trajectories = numpy.arange(conc_hist.shape[1])
+    i_first = numpy.argmax(crossings, axis=0)
+    i_last = crossings.shape[0] - 1 - numpy.argmax(crossings[::-1, :], axis=0)
+    oscillating = (n_crossings >= 2) & (amplitude > rel_tol * numpy.abs(conc_max))
+    with numpy.errstate(divide='ignore', invalid='ignore'):
+        period = numpy.where(oscillating,
+                             (crossing_times[i_last, i_trajectories] - crossing_times[i_first, i_trajectories])
+                             / (n_crossings - 1),
+                             numpy.nan)
+
+    return (period, amplitude)
+
 
 def main():
     # initial conditions
@@ -77,7 +479,10 @@ def main():
     time_max = 100
     time_step = 0.1
     time_hist = numpy.linspace(0., time_max, int(time_max / time_step + 1))
-    conc_hist = scipy.integrate.odeint(d_conc_d_t, init_concs, time_hist)
+    model = GoldbeterModel()
+    result = integrate(lambda time, concs: model.d_conc_d_t(concs, time), init_concs, 0., time_max, t_eval=time_hist,
+                       jac=lambda time, concs: model.jacobian(concs, time))
+    conc_hist = result.x
 
     # plot results
     line_cyclin, = pyplot.plot(time_hist, conc_hist[:, 0], 'b-', label='Cyclin')
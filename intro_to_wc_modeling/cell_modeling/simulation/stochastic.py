@@ -10,6 +10,11 @@ from matplotlib import pyplot
 import numpy
 import os
 
+try:
+    import numba
+except ImportError:
+    numba = None
+
 # represent the reaction and rate laws of the model
 # - first reaction: synthesis
 # - second reaction: degradation
@@ -20,7 +25,7 @@ k_syn = 2.5 # 1/s
 k_deg = 0.5 # 1/s/molecule
 def kinetic_laws(copy_number):
     return numpy.array([
-        k_syn,
+        k_syn * numpy.ones_like(copy_number),
         k_deg * copy_number,
         ])
 
@@ -46,13 +51,15 @@ def simulate(reaction_stochiometries, kinetic_laws, init_copy_number, time_max,
     """
 
     # data structure to store predicted copy numbers
-    time_hist = numpy.linspace(0., time_max, int(time_max / time_step + 1))
-    copy_number_hist = numpy.full(int(time_max / time_step + 1), numpy.nan)
+    n_time_points = int(time_max / time_step + 1)
+    time_hist = numpy.linspace(0., time_max, n_time_points)
+    copy_number_hist = numpy.full(n_time_points, numpy.nan)
     copy_number_hist[0] = init_copy_number
 
     # initial conditions
     time = 0
     copy_number = init_copy_number
+    i_next_time_point = 1
 
     # iterate over time
     while time < time_max:
@@ -63,46 +70,543 @@ def simulate(reaction_stochiometries, kinetic_laws, init_copy_number, time_max,
         # select the length of the time step from an exponential distributuon
         dt = numpy.random.exponential(1. / total_propensity)
 
+        # update the time
+        time += dt
+
+        # store copy number history at the time points which were crossed before the reaction fired
+        if time < time_max:
+            i_end_time_point = int(numpy.ceil(time / time_step))
+        else:
+            i_end_time_point = n_time_points
+        if i_end_time_point > i_next_time_point:
+            copy_number_hist[i_next_time_point:i_end_time_point] = copy_number
+            i_next_time_point = i_end_time_point
+
+        # stop without selecting a reaction once the simulation has reached its end
+        if time >= time_max:
+            break
+
         # select the next reaction to fire
         i_reaction = numpy.random.choice(len(propensities), p=propensities / total_propensity)
 
-        # update the time and copy number based on the selected reaction
-        time += dt
+        # update the copy number based on the selected reaction
         copy_number += reaction_stochiometries[i_reaction]
 
-        # store copy number history
-        #print(time)
+    return (time_hist, copy_number_hist)
+
+
+def simulate_ensemble(reaction_stochiometries, kinetic_laws, init_copy_number, time_max, time_step, n_simulations):
+    """ Run an ensemble of stochastic simulations
+
+    All of the trajectories are advanced in lockstep: each iteration draws the time to the next reaction and selects
+    the next reaction for every unfinished trajectory with array operations, rather than running each trajectory in
+    a separate loop.
+
+    Args:
+       reaction_stochiometries (:obj:`list` of :obj:`int`): list of stoichiometries of the protein in each reaction
+       kinetic_laws (:obj:`function`): function which calculates the propensity of each reaction (rows) for an
+            array of copy numbers (columns)
+       init_copy_number (:obj:`int`): initial copy number
+       time_max (:obj:`float`): simulation length
+       time_step (:obj:`float`): frequency to record predicted dynamics
+       n_simulations (:obj:`int`): number of trajectories
+
+    Returns:
+        :obj:`tuple`:
+
+            * :obj:`numpy.ndarray`: time points
+            * :obj:`numpy.ndarray`: predicted copy number at each time point (rows) of each trajectory (columns)
+    """
+    # data structure to store predicted copy numbers
+    n_time_points = int(time_max / time_step + 1)
+    time_hist = numpy.linspace(0., time_max, n_time_points)
+    copy_number_hist = numpy.full((n_time_points, n_simulations), numpy.nan)
+    copy_number_hist[0, :] = init_copy_number
+
+    reaction_stochiometries = numpy.array(reaction_stochiometries)
+
+    # initial conditions
+    time = numpy.zeros(n_simulations)
+    copy_number = numpy.full(n_simulations, init_copy_number, dtype=reaction_stochiometries.dtype)
+    i_next_time_point = numpy.ones(n_simulations, dtype=int)
+    running = numpy.arange(n_simulations)
+
+    # iterate over time until all of the trajectories have finished
+    while running.size:
+        # calculate reaction properties/rates
+        propensities = kinetic_laws(copy_number[running])
+        total_propensity = numpy.sum(propensities, axis=0)
+
+        # select the length of the time step from an exponential distributuon
+        dt = numpy.random.exponential(1. / total_propensity)
+
+        # select the next reaction to fire
+        rand = numpy.random.random(running.size) * total_propensity
+        i_reaction = numpy.minimum(numpy.sum(numpy.cumsum(propensities, axis=0) <= rand, axis=0),
+                                   reaction_stochiometries.size - 1)
+
+        # record the copy numbers until the time of the reaction
+        time[running] += dt
+        finished = time[running] >= time_max
+        i_end_time_point = numpy.where(finished, n_time_points,
+                                       numpy.ceil(numpy.minimum(time[running], time_max) / time_step).astype(int))
+        i_time_point = i_next_time_point[running]
+        to_record = numpy.flatnonzero(i_time_point < i_end_time_point)
+        while to_record.size:
+            copy_number_hist[i_time_point[to_record], running[to_record]] = copy_number[running[to_record]]
+            i_time_point[to_record] += 1
+            to_record = to_record[i_time_point[to_record] < i_end_time_point[to_record]]
+        i_next_time_point[running] = i_time_point
+
+        # update the copy numbers based on the selected reactions
+        copy_number[running] += reaction_stochiometries[i_reaction]
+
+        running = running[~finished]
+
+    return (time_hist, copy_number_hist)
+
+
+class EnsembleStatistics(object):
+    """ Streaming statistics of the copy numbers predicted by an ensemble of stochastic simulations
+
+    Trajectories are added one or several at a time and are not stored. The mean and variance at each time point are
+    accumulated with Welford's algorithm, and the quantiles are calculated exactly from a histogram of the integer
+    copy numbers at each time point. Therefore, the memory is constant in the number of trajectories. Statistics
+    accumulated by different workers can be combined with :obj:`merge`.
+
+    Attributes:
+        n_time_points (:obj:`int`): number of time points
+        n_simulations (:obj:`int`): number of trajectories which have been added
+    """
+
+    def __init__(self, n_time_points):
+        """
+        Args:
+            n_time_points (:obj:`int`): number of time points
+        """
+        self.n_time_points = n_time_points
+        self.n_simulations = 0
+        self._mean = numpy.zeros(n_time_points)
+        self._m2 = numpy.zeros(n_time_points)
+        self._min_copy_number = 0
+        self._counts = numpy.zeros((n_time_points, 0), dtype=int)
+
+    @property
+    def mean(self):
+        """ :obj:`numpy.ndarray`: mean copy number at each time point
+
+        Raises:
+            :obj:`ValueError`: if no trajectories have been added
+        """
+        self._validate_not_empty()
+        return self._mean.copy()
+
+    @property
+    def variance(self):
+        """ :obj:`numpy.ndarray`: variance of the copy number at each time point
+
+        Raises:
+            :obj:`ValueError`: if no trajectories have been added
+        """
+        self._validate_not_empty()
+        return self._m2 / self.n_simulations
+
+    @property
+    def std(self):
+        """ :obj:`numpy.ndarray`: standard deviation of the copy number at each time point """
+        return numpy.sqrt(self.variance)
+
+    def add(self, copy_number_hist):
+        """ Add one or more trajectories
+
+        Args:
+            copy_number_hist (:obj:`numpy.ndarray`): predicted copy number at each time point, or at each time point
+                (rows) of each of several trajectories (columns)
+
+        Raises:
+            :obj:`ValueError`: if the number of time points doesn't match or the copy numbers aren't integers
+        """
+        copy_number_hist = numpy.asarray(copy_number_hist, dtype=float)
+        if copy_number_hist.ndim == 1:
+            copy_number_hist = copy_number_hist.reshape((-1, 1))
+        if copy_number_hist.shape[0] != self.n_time_points:
+            raise ValueError('Trajectories must have {} time points'.format(self.n_time_points))
+        if numpy.any(copy_number_hist != numpy.round(copy_number_hist)):
+            raise ValueError('Copy numbers must be integers')
+        if copy_number_hist.shape[1] == 0:
+            return
+
+        n_new = copy_number_hist.shape[1]
+        new_mean = numpy.mean(copy_number_hist, axis=1)
+        new_m2 = numpy.sum((copy_number_hist - new_mean.reshape((-1, 1))) ** 2, axis=1)
+
+        min_copy_number = int(numpy.min(copy_number_hist))
+        n_bins = int(numpy.max(copy_number_hist)) - min_copy_number + 1
+        i_bins = (copy_number_hist.astype(int) - min_copy_number) + \
+            numpy.arange(self.n_time_points).reshape((-1, 1)) * n_bins
+        counts = numpy.bincount(i_bins.ravel(), minlength=self.n_time_points * n_bins) \
+            .reshape((self.n_time_points, n_bins))
+
+        self._combine(n_new, new_mean, new_m2, min_copy_number, counts)
+
+    def merge(self, other):
+        """ Add the trajectories summarized by other statistics, e.g., from another worker
+
+        Args:
+            other (:obj:`EnsembleStatistics`): statistics to merge into these statistics
+
+        Returns:
+            :obj:`EnsembleStatistics`: these statistics
+
+        Raises:
+            :obj:`ValueError`: if the numbers of time points don't match
+        """
+        if other.n_time_points != self.n_time_points:
+            raise ValueError('Trajectories must have {} time points'.format(self.n_time_points))
+        if other.n_simulations:
+            self._combine(other.n_simulations, other._mean, other._m2, other._min_copy_number, other._counts)
+        return self
+
+    def _combine(self, n_other, other_mean, other_m2, other_min_copy_number, other_counts):
+        # combine the means and sums of squared deviations (Chan et al.)
+        n_total = self.n_simulations + n_other
+        delta = other_mean - self._mean
+        self._mean = self._mean + delta * n_other / n_total
+        self._m2 = self._m2 + other_m2 + delta ** 2 * self.n_simulations * n_other / n_total
+
+        # add the histograms over the union of their ranges
+        if self.n_simulations:
+            min_copy_number = min(self._min_copy_number, other_min_copy_number)
+            max_copy_number = max(self._min_copy_number + self._counts.shape[1],
+                                  other_min_copy_number + other_counts.shape[1])
+        else:
+            min_copy_number = other_min_copy_number
+            max_copy_number = other_min_copy_number + other_counts.shape[1]
+        counts = numpy.zeros((self.n_time_points, max_copy_number - min_copy_number), dtype=int)
+        for min_counts, counts_to_add in [(self._min_copy_number, self._counts), (other_min_copy_number, other_counts)]:
+            start = min_counts - min_copy_number
+            counts[:, start:start + counts_to_add.shape[1]] += counts_to_add
+
+        self._min_copy_number = min_copy_number
+        self._counts = counts
+        self.n_simulations = n_total
+
+    def quantile(self, q):
+        """ Calculate a quantile of the copy number at each time point, using the inverse of the empirical cumulative
+        distribution function (i.e., the smallest copy number whose cumulative frequency is at least :obj:`q`)
+
+        Args:
+            q (:obj:`float`): quantile, between 0 and 1
+
+        Returns:
+            :obj:`numpy.ndarray`: quantile at each time point
+
+        Raises:
+            :obj:`ValueError`: if no trajectories have been added
+        """
+        self._validate_not_empty()
+        cum_counts = numpy.cumsum(self._counts, axis=1)
+        i_bins = numpy.argmax(cum_counts >= max(q * self.n_simulations, 1), axis=1)
+        return (self._min_copy_number + i_bins).astype(float)
+
+    def _validate_not_empty(self):
+        """ Check that at least one trajectory has been added
+
+        Raises:
+            :obj:`ValueError`: if no trajectories have been added
+        """
+        if self.n_simulations == 0:
+            raise ValueError('At least one trajectory must be added to calculate statistics')
+
+
+class ReactionNetwork(object):
+    """ Network of reactions among several species with mass-action kinetics
+
+    The propensity of each reaction is the product of its rate constant and the number of distinct combinations of
+    its reactant molecules (e.g., ``k A B`` for ``A + B -> C`` and ``k A (A - 1) / 2`` for
+    ``2 A -> D``). The reactant terms of every reaction are flattened into index arrays once, so that the
+    propensities of all of the reactions can be calculated in one vectorized pass.
+
+    Attributes:
+        stoichiometries (:obj:`numpy.ndarray`): net stoichiometry of each species (rows) in each reaction (columns)
+        reactant_stoichiometries (:obj:`numpy.ndarray`): number of molecules of each species (rows) consumed by each
+            reaction (columns)
+        rate_constants (:obj:`numpy.ndarray`): rate constant of each reaction
+        propensity_functions (:obj:`dict`): dictionary which maps the indices of reactions which don't follow
+            mass-action kinetics to functions which calculate their propensities from the copy numbers
+    """
+
+    def __init__(self, stoichiometries, rate_constants, reactant_stoichiometries=None, propensity_functions=None):
+        """
+        Args:
+            stoichiometries (:obj:`list` of :obj:`list` of :obj:`int`): net stoichiometry of each species (rows) in
+                each reaction (columns)
+            rate_constants (:obj:`list` of :obj:`float`): rate constant of each reaction
+            reactant_stoichiometries (:obj:`list` of :obj:`list` of :obj:`int`, optional): number of molecules of each
+                species (rows) consumed by each reaction (columns); defaults to the negative entries of
+                :obj:`stoichiometries`
+            propensity_functions (:obj:`dict`, optional): dictionary which maps the indices of reactions to functions
+                which calculate their propensities from the copy numbers, instead of mass-action kinetics
+
+        Raises:
+            :obj:`ValueError`: if the dimensions of the stoichiometries and rate constants don't match
+        """
+        self.stoichiometries = numpy.array(stoichiometries, dtype=int, ndmin=2)
+        self.rate_constants = numpy.array(rate_constants, dtype=float, ndmin=1)
+        if reactant_stoichiometries is None:
+            self.reactant_stoichiometries = numpy.maximum(-self.stoichiometries, 0)
+        else:
+            self.reactant_stoichiometries = numpy.array(reactant_stoichiometries, dtype=int, ndmin=2)
+        self.propensity_functions = dict(propensity_functions or {})
+
+        n_species, n_reactions = self.stoichiometries.shape
+        if self.rate_constants.shape != (n_reactions,):
+            raise ValueError('There must be one rate constant for each of the {} reactions'.format(n_reactions))
+        if self.reactant_stoichiometries.shape != self.stoichiometries.shape:
+            raise ValueError('The reactant stoichiometries must have the same shape as the stoichiometries')
+
+        # flatten the reactant terms into a (reactions x max reactant order) table of species indices and offsets; the
+        # term for the m-th molecule of species i is (x_i - m) / (m + 1), and unused entries point to a padding row of
+        # ones
+        orders = self.reactant_stoichiometries.sum(axis=0)
+        max_order = max(int(orders.max()), 1) if n_reactions else 1
+        self._term_species = numpy.full((n_reactions, max_order), n_species)
+        self._term_offsets = numpy.zeros((n_reactions, max_order))
+        for i_reaction in range(n_reactions):
+            i_species = numpy.repeat(numpy.arange(n_species), self.reactant_stoichiometries[:, i_reaction])
+            offsets = numpy.concatenate([numpy.arange(coeff) for coeff in self.reactant_stoichiometries[:, i_reaction]])
+            self._term_species[i_reaction, :i_species.size] = i_species
+            self._term_offsets[i_reaction, :offsets.size] = offsets
+
+    @property
+    def n_species(self):
+        """ :obj:`int`: number of species """
+        return self.stoichiometries.shape[0]
+
+    @property
+    def n_reactions(self):
+        """ :obj:`int`: number of reactions """
+        return self.stoichiometries.shape[1]
+
+    def propensities(self, copy_numbers):
+        """ Calculate the propensity of each reaction
+
+        Args:
+            copy_numbers (:obj:`numpy.ndarray`): copy number of each species, or of each species (rows) in each of
+                several states (columns)
+
+        Returns:
+            :obj:`numpy.ndarray`: propensity of each reaction, or of each reaction (rows) in each state (columns)
+        """
+        copy_numbers = numpy.asarray(copy_numbers, dtype=float)
+        padded = numpy.concatenate((copy_numbers, numpy.ones((1,) + copy_numbers.shape[1:])))
+
+        offsets = self._term_offsets.reshape(self._term_offsets.shape + (1,) * (copy_numbers.ndim - 1))
+        terms = numpy.maximum(padded[self._term_species] - offsets, 0.) / (offsets + 1.)
+        rate_constants = self.rate_constants.reshape(self.rate_constants.shape + (1,) * (copy_numbers.ndim - 1))
+        propensities = rate_constants * numpy.prod(terms, axis=1)
+
+        for i_reaction, propensity_function in self.propensity_functions.items():
+            propensities[i_reaction] = propensity_function(copy_numbers)
+
+        return propensities
+
+
+def simulate_network(network, init_copy_numbers, time_max, time_step, seed=None, jit=True):
+    """ Run a stochastic simulation of a network of reactions among several species
+
+    If all of the reactions follow mass-action kinetics and :obj:`jit` is :obj:`True`, the entire trajectory is
+    simulated by one call to a kernel which is compiled with numba, if numba is installed, or run as pure Python
+    otherwise. Both paths use the same random number stream, and therefore predict the same trajectory for the same
+    seed.
+
+    Args:
+       network (:obj:`ReactionNetwork`): reaction network
+       init_copy_numbers (:obj:`list` of :obj:`int`): initial copy number of each species
+       time_max (:obj:`float`): simulation length
+       time_step (:obj:`float`): frequency to record predicted dynamics
+       seed (:obj:`int`, optional): seed for the random number generator; by default, a seed is drawn from
+            :obj:`numpy.random` so that the simulation can be reproduced by seeding :obj:`numpy.random`
+       jit (:obj:`bool`, optional): if :obj:`True`, simulate mass-action networks with the compiled kernel
+
+    Returns:
+        :obj:`tuple`:
+
+            * :obj:`numpy.ndarray`: time points
+            * :obj:`numpy.ndarray`: predicted copy number of each species (columns) at each time point (rows)
+    """
+    if seed is None:
+        seed = numpy.random.randint(2 ** 31)
+    random_generator = numpy.random.default_rng(seed)
+
+    # data structure to store predicted copy numbers
+    n_time_points = int(time_max / time_step + 1)
+    time_hist = numpy.linspace(0., time_max, n_time_points)
+
+    if jit and not network.propensity_functions:
+        copy_number_hist = simulate_mass_action_kernel(
+            network.stoichiometries, network.rate_constants, network._term_species, network._term_offsets,
+            numpy.array(init_copy_numbers, dtype=float), float(time_max), float(time_step), n_time_points,
+            random_generator)
+        return (time_hist, copy_number_hist)
+
+    copy_number_hist = numpy.full((n_time_points, network.n_species), numpy.nan)
+    copy_number_hist[0, :] = init_copy_numbers
+
+    # initial conditions
+    time = 0
+    copy_numbers = numpy.array(init_copy_numbers, dtype=int)
+    i_next_time_point = 1
+
+    # iterate over time
+    while time < time_max:
+        # calculate reaction properties/rates; networks without reactions remain in their initial state
+        cum_propensities = numpy.cumsum(network.propensities(copy_numbers))
+        total_propensity = cum_propensities[-1] if network.n_reactions else 0.
+
+        # select the length of the time step from an exponential distributuon
+        if total_propensity > 0:
+            dt = -numpy.log(1. - random_generator.random()) / total_propensity
+        else:
+            dt = numpy.inf
+
+        # update the time
+        time += dt
+
+        # store copy number history at the time points which were crossed before the reaction fired
         if time < time_max:
-            copy_number_hist[int(numpy.ceil(time / time_step)):] = copy_number
+            i_end_time_point = int(numpy.ceil(time / time_step))
+        else:
+            i_end_time_point = n_time_points
+        if i_end_time_point > i_next_time_point:
+            copy_number_hist[i_next_time_point:i_end_time_point, :] = copy_numbers
+            i_next_time_point = i_end_time_point
+
+        # stop without selecting a reaction once the simulation has reached its end
+        if time >= time_max:
+            break
+
+        # select the next reaction to fire
+        i_reaction = min(int(numpy.searchsorted(cum_propensities, random_generator.random() * total_propensity,
+                                                side='right')),
+                         network.n_reactions - 1)
+
+        # update the copy numbers based on the selected reaction
+        copy_numbers += network.stoichiometries[:, i_reaction]
 
     return (time_hist, copy_number_hist)
 
+
+def _simulate_mass_action(stoichiometries, rate_constants, term_species, term_offsets, init_copy_numbers,
+                          time_max, time_step, n_time_points, random_generator):
+    """ Simulate one trajectory of a mass-action reaction network with scalar loops which numba can compile
+
+    Args:
+        stoichiometries (:obj:`numpy.ndarray`): net stoichiometry of each species (rows) in each reaction (columns)
+        rate_constants (:obj:`numpy.ndarray`): rate constant of each reaction
+        term_species (:obj:`numpy.ndarray`): species index of each reactant term of each reaction; indices equal to
+            the number of species denote unused terms
+        term_offsets (:obj:`numpy.ndarray`): offset of each reactant term of each reaction
+        init_copy_numbers (:obj:`numpy.ndarray`): initial copy number of each species
+        time_max (:obj:`float`): simulation length
+        time_step (:obj:`float`): frequency to record predicted dynamics
+        n_time_points (:obj:`int`): number of time points to record
+        random_generator (:obj:`numpy.random.Generator`): random number generator
+
+    Returns:
+        :obj:`numpy.ndarray`: predicted copy number of each species (columns) at each time point (rows)
+    """
+    n_species, n_reactions = stoichiometries.shape
+    n_terms = term_species.shape[1]
+
+    copy_numbers = init_copy_numbers.copy()
+    copy_number_hist = numpy.empty((n_time_points, n_species))
+    copy_number_hist[0, :] = copy_numbers
+    cum_propensities = numpy.empty(n_reactions)
+
+    time = 0.
+    i_next_time_point = 1
+    while time < time_max:
+        # calculate the cumulative propensities of the reactions
+        total_propensity = 0.
+        for i_reaction in range(n_reactions):
+            terms = 1.
+            for i_term in range(n_terms):
+                i_species = term_species[i_reaction, i_term]
+                if i_species < n_species:
+                    offset = term_offsets[i_reaction, i_term]
+                    terms *= max(copy_numbers[i_species] - offset, 0.) / (offset + 1.)
+            total_propensity += rate_constants[i_reaction] * terms
+            cum_propensities[i_reaction] = total_propensity
+
+        # select the time of the next reaction
+        if total_propensity > 0.:
+            time += -numpy.log(1. - random_generator.random()) / total_propensity
+        else:
+            time = numpy.inf
+
+        # store the copy numbers at the time points which were crossed before the reaction fired
+        if time < time_max:
+            i_end_time_point = int(numpy.ceil(time / time_step))
+        else:
+            i_end_time_point = n_time_points
+        for i_time_point in range(i_next_time_point, i_end_time_point):
+            copy_number_hist[i_time_point, :] = copy_numbers
+        i_next_time_point = max(i_next_time_point, i_end_time_point)
+
+        if time >= time_max:
+            break
+
+        # select and fire the next reaction
+        rand = random_generator.random() * total_propensity
+        i_reaction = 0
+        while i_reaction < n_reactions - 1 and cum_propensities[i_reaction] <= rand:
+            i_reaction += 1
+        for i_species in range(n_species):
+            copy_numbers[i_species] += stoichiometries[i_species, i_reaction]
+
+    return copy_number_hist
+
+
+if numba is not None:
+    simulate_mass_action_kernel = numba.njit(_simulate_mass_action)
+else:
+    simulate_mass_action_kernel = _simulate_mass_action
+#:obj:`function`: kernel which simulates one trajectory of a mass-action network, compiled if numba is installed
+
+
 def main():
     # seed random number generator
     numpy.random.seed(0)
 
-    # run simulations
+    # run simulations in batches, plotting each trajectory and streaming it into the ensemble statistics rather than
+    # storing all of the trajectories
     time_max = 25.
     time_step = 1.
     n_simulations = 100
-    copy_number_hist = numpy.full((int(time_max / time_step + 1), n_simulations), numpy.nan)
-    for i_sim in range(n_simulations):
-        time_hist, copy_number_hist[:, i_sim] = simulate(reaction_stochiometries, kinetic_laws, init_copy_number, time_max, time_step)
-
-    # plot results
-    for i_sim in range(n_simulations):
-        color = (
-            float(i_sim) / (float(n_simulations) - 1.) / 2,
-            float(i_sim) / (float(n_simulations) - 1.) / 2,
-            float(i_sim) / (float(n_simulations) - 1.) / 2,
-        )
-        pyplot.plot(time_hist, copy_number_hist[:, i_sim], linestyle='-', color=color, linewidth=0.5)
+    batch_size = 20
+    stats = EnsembleStatistics(int(time_max / time_step + 1))
+    for i_batch_start in range(0, n_simulations, batch_size):
+        n_batch_simulations = min(batch_size, n_simulations - i_batch_start)
+        time_hist, copy_number_hist = simulate_ensemble(reaction_stochiometries, kinetic_laws, init_copy_number,
+                                                        time_max, time_step, n_batch_simulations)
+        stats.add(copy_number_hist)
+
+        # plot results
+        for i_batch_sim in range(n_batch_simulations):
+            i_sim = i_batch_start + i_batch_sim
+            color = (
+                float(i_sim) / (float(n_simulations) - 1.) / 2,
+                float(i_sim) / (float(n_simulations) - 1.) / 2,
+                float(i_sim) / (float(n_simulations) - 1.) / 2,
+            )
+            pyplot.plot(time_hist, copy_number_hist[:, i_batch_sim], linestyle='-', color=color, linewidth=0.5)
 
     pyplot.fill_between(time_hist,
-        numpy.mean(copy_number_hist, 1) - numpy.std(copy_number_hist, 1),
-        numpy.mean(copy_number_hist, 1) + numpy.std(copy_number_hist, 1),
+        stats.mean - stats.std,
+        stats.mean + stats.std,
         facecolor=(1, 0, 0, 0.5))
-    pyplot.plot(time_hist, numpy.mean(copy_number_hist, 1), linestyle='-', color='r', linewidth=3)
+    pyplot.plot(time_hist, stats.mean, linestyle='-', color='r', linewidth=3)
 
     pyplot.xlim(0, time_max)
     pyplot.xlabel('Time (s)')
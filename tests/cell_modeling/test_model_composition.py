@@ -6,6 +6,9 @@
 :License: MIT
 """
 
+from matplotlib import pyplot
+import collections
+import numpy
 import shutil
 import tempfile
 import unittest
@@ -23,3 +26,229 @@ class TestModelCompositionTutorial(unittest.TestCase):
     def test(self):
         from intro_to_wc_modeling.cell_modeling import model_composition
         model_composition.main(out_dir=self.out_dir)
+
+
+class TestModelComposition(unittest.TestCase):
+
+    def test_fluxes(self):
+        from intro_to_wc_modeling.cell_modeling import model_composition
+
+        # the single-pass flux vector reproduces the per-species time derivatives
+        model = model_composition.GlycolysisModel()
+        x = numpy.maximum(model.x_0, 0.1) * numpy.linspace(0.8, 1.2, model.x_0.size)
+        fluxes = model.fluxes(x)
+        self.assertEqual(fluxes.shape, (len(model.reaction_ids), ))
+        numpy.testing.assert_allclose(model.dx_dt(x), numpy.array([
+            getattr(model, 'd{}_dt'.format(species_id))(x) for species_id in model.species_ids]), rtol=1e-12, atol=1e-12)
+
+        merged_model = model_composition.MergedModel()
+        x = numpy.concatenate((x, [0.1]))
+        fluxes = merged_model.fluxes(x)
+        self.assertEqual(fluxes.shape, (len(merged_model.reaction_ids), ))
+        v_16 = model.v_16(x[0:-1])
+        v_18 = merged_model.v_18(x)
+        v_19 = merged_model.v_19(x)
+        dx_dt = numpy.concatenate((model.dx_dt(x[0:-1]), [v_18 - v_19]))
+        dx_dt[6] += -v_16 + v_18
+        dx_dt[7] += v_16 - v_18
+        dx_dt[13] += v_16 - v_18
+        numpy.testing.assert_allclose(merged_model.dx_dt(x), dx_dt, rtol=1e-12, atol=1e-12)
+
+    def test_adenylates(self):
+        from intro_to_wc_modeling.cell_modeling import model_composition
+
+        # the adenine nucleotides conserve the total pool and the high energy phosphates, and satisfy the equilibrium
+        # of adenylate kinase
+        model = model_composition.GlycolysisModel()
+        x = model.x_0.copy()
+        for Prb in [0.5, model.Prb_0, 8.]:
+            x[12] = Prb
+            ATP, ADP, AMP = model.get_adenylates(x)
+            self.assertAlmostEqual(ATP + ADP + AMP, model.SUMAXP, delta=1e-12)
+            self.assertAlmostEqual(2 * ATP + ADP, Prb, delta=1e-12)
+            self.assertAlmostEqual(ATP * AMP / ADP**2, model.KeqAK, delta=1e-12)
+
+            adenylates = (ATP, ADP, AMP)
+            for reaction_id in ['v_1', 'v_5', 'v_8', 'v_11', 'v_17']:
+                rate_law = getattr(model, reaction_id)
+                self.assertEqual(rate_law(x, adenylates), rate_law(x))
+            self.assertEqual(model.v_17(x), model.KATPASE * ATP)
+
+    def test_adenylates_regression(self):
+        from intro_to_wc_modeling.cell_modeling import model_composition
+
+        def get_old_rates(m, x):
+            # rate laws which calculated the adenine nucleotides inline, with the repeated terms factored out verbatim
+            root = (m.SUMAXP**2 - 2*m.SUMAXP*x[12] + 8*m.KeqAK*m.SUMAXP*x[12] + x[12]**2 - 4*m.KeqAK*x[12]**2)**0.5
+            atp_term = (-m.SUMAXP + x[12] - 4*m.KeqAK*x[12] + root)
+            neg_atp_term = (m.SUMAXP - x[12] + 4*m.KeqAK*x[12] - root)
+            adp_term = (m.SUMAXP - root)
+            return {
+                'v_1': (m.VmGLK*(-((x[4]*adp_term)/((1 - 4*m.KeqAK)*m.KeqGLK)) + (x[5]*atp_term)/(2 -
+                    8*m.KeqAK)))/(m.KmGLKATP*m.KmGLKGLCi*(1 + x[4]/m.KmGLKG6P + x[5]/m.KmGLKGLCi)*(1 + adp_term/((1 -
+                    4*m.KeqAK)*m.KmGLKADP) + atp_term/((2 - 8*m.KeqAK)*m.KmGLKATP))),
+                'v_5': (m.gR*m.VmPFK*x[3]*atp_term*(1 + x[3]/m.KmPFKF6P + atp_term/((2 - 8*m.KeqAK)*m.KmPFKATP) +
+                    (m.gR*x[3]*atp_term)/((2 - 8*m.KeqAK)*m.KmPFKATP*m.KmPFKF6P)))/((2 -
+                    8*m.KeqAK)*m.KmPFKATP*m.KmPFKF6P*((m.L0*(1 + (m.CPFKF26BP*m.F26BP)/m.KPFKF26BP +
+                    (m.CPFKF16BP*x[2])/m.KPFKF16BP)**2*(1 + (2*m.CPFKAMP*m.KeqAK*adp_term**2)/((-1 +
+                    4*m.KeqAK)*m.KPFKAMP*neg_atp_term))**2*(1 + (m.CiPFKATP*atp_term)/((2 -
+                    8*m.KeqAK)*m.KiPFKATP))**2*(1 + (m.CPFKATP*atp_term)/((2 - 8*m.KeqAK)*m.KmPFKATP))**2)/((1 +
+                    m.F26BP/m.KPFKF26BP + x[2]/m.KPFKF16BP)**2*(1 + (2*m.KeqAK*adp_term**2)/((-1 +
+                    4*m.KeqAK)*m.KPFKAMP*neg_atp_term))**2*(1 + atp_term/((2 - 8*m.KeqAK)*m.KiPFKATP))**2) + (1 +
+                    x[3]/m.KmPFKF6P + atp_term/((2 - 8*m.KeqAK)*m.KmPFKATP) + (m.gR*x[3]*atp_term)/((2 -
+                    8*m.KeqAK)*m.KmPFKATP*m.KmPFKF6P))**2)),
+                'v_8': (m.VmPGK*((m.KeqPGK*x[1]*adp_term)/(1 - 4*m.KeqAK) - (x[9]*atp_term)/(2 -
+                    8*m.KeqAK)))/(m.KmPGKATP*m.KmPGKP3G*(1 + x[1]/m.KmPGKBPG + x[9]/m.KmPGKP3G)*(1 + adp_term/((1 -
+                    4*m.KeqAK)*m.KmPGKADP) + atp_term/((2 - 8*m.KeqAK)*m.KmPGKATP))),
+                'v_11': (m.VmPYK*((x[10]*adp_term)/(1 - 4*m.KeqAK) - (atp_term*x[11])/((2 -
+                    8*m.KeqAK)*m.KeqPYK)))/(m.KmPYKADP*m.KmPYKPEP*(1 + adp_term/((1 - 4*m.KeqAK)*m.KmPYKADP) +
+                    atp_term/((2 - 8*m.KeqAK)*m.KmPYKATP))*(1 + x[10]/m.KmPYKPEP + x[11]/m.KmPYKPYR)),
+                'v_17': (m.KATPASE*atp_term)/(2 - 8*m.KeqAK),
+            }
+
+        # the rate laws and time derivatives match those which calculated the adenine nucleotides inline
+        model = model_composition.GlycolysisModel()
+        random_state = numpy.random.RandomState(0)
+        for i_state in range(5):
+            x = model.x_0 * random_state.uniform(0.5, 1.5, model.x_0.size)
+            old_rates = get_old_rates(model, x)
+            for reaction_id, old_rate in old_rates.items():
+                numpy.testing.assert_allclose(getattr(model, reaction_id)(x), old_rate, rtol=1e-12, atol=1e-12)
+
+            old_fluxes = numpy.array([old_rates.get(reaction_id, getattr(model, reaction_id)(x))
+                                      for reaction_id in model.reaction_ids])
+            numpy.testing.assert_allclose(model.dx_dt(x), model.stoichiometry.dot(old_fluxes), rtol=1e-12, atol=1e-12)
+
+    def test_composed_model(self):
+        from intro_to_wc_modeling.cell_modeling import model_composition
+
+        merged_model = model_composition.MergedModel()
+        model = model_composition.ComposedModel(merged_model.get_submodels(), excluded_reaction_ids=['v_16'])
+
+        # shared species are merged by id and the excluded reaction is dropped
+        self.assertEqual(model.species_ids, merged_model.species_ids)
+        self.assertEqual(model.reaction_ids, tuple(id for id in merged_model.reaction_ids if id != 'v_16'))
+        numpy.testing.assert_array_equal(model.stoichiometry.toarray(),
+                                         numpy.delete(merged_model.stoichiometry, 15, axis=1))
+        numpy.testing.assert_array_equal(model.x_0, merged_model.x_0)
+
+        # the composed model reproduces the hand-merged model
+        x = numpy.maximum(model.x_0, 0.1) * numpy.linspace(0.8, 1.2, model.x_0.size)
+        numpy.testing.assert_allclose(model.dx_dt(x), merged_model.dx_dt(x), rtol=1e-12, atol=1e-12)
+        numpy.testing.assert_array_equal(model.get_jacobian_sparsity().toarray(),
+                                         merged_model.get_jacobian_sparsity().toarray())
+
+        jacobian = numpy.zeros((x.size, x.size))
+        for i_species in range(x.size):
+            step = 1e-6 * x[i_species]
+            x_plus = x.copy()
+            x_plus[i_species] += step
+            x_minus = x.copy()
+            x_minus[i_species] -= step
+            jacobian[:, i_species] = (merged_model.dx_dt(x_plus) - merged_model.dx_dt(x_minus)) / (2 * step)
+        numpy.testing.assert_allclose(model.jacobian(x), jacobian, rtol=1e-4, atol=1e-2)
+
+        t, x = model.simulate(t_end=5.)
+        t, dhap, g3p = merged_model.simulate(t_end=5.)
+        numpy.testing.assert_allclose(x[:, -1], g3p, atol=1e-6)
+
+        # analytical flux Jacobians of submodels are used when available
+        submodel = model_composition.Submodel('A_to_B', ('A', 'B'), ('r', ), [[-1], [1]], lambda x: 2. * x[0:1],
+                                              [1., 0.], flux_jacobian=lambda x: numpy.array([[2., 0.]]))
+        model = model_composition.ComposedModel([submodel])
+        numpy.testing.assert_array_equal(model.jacobian(model.x_0), [[-2., 0.], [2., 0.]])
+
+        # errors
+        with self.assertRaisesRegex(ValueError, 'one row for each'):
+            model_composition.Submodel('A_to_B', ('A', 'B'), ('r', ), [[-1, 1]], lambda x: x[0:1], [1., 0.])
+        with self.assertRaisesRegex(ValueError, 'multiple submodels'):
+            model_composition.ComposedModel([submodel, submodel])
+        with self.assertRaisesRegex(ValueError, 'not defined'):
+            model_composition.ComposedModel([submodel], excluded_reaction_ids=['v_1'])
+        inconsistent_submodel = model_composition.Submodel('B_to_C', ('B', 'C'), ('r_2', ), [[-1], [1]],
+                                                           lambda x: x[0:1], [1., 0.])
+        with self.assertRaisesRegex(ValueError, 'inconsistent'):
+            model_composition.ComposedModel([submodel, inconsistent_submodel])
+
+    def test_compare_models(self):
+        from intro_to_wc_modeling.cell_modeling import model_composition
+
+        variants = collections.OrderedDict([
+            ('merged', (model_composition.MergedModel, {})),
+            ('merged_fast_g3pdh', (model_composition.MergedModel, {'glycerol_model.Vf1': 94.})),
+            ('glycolysis', (model_composition.GlycolysisModel, {})),
+        ])
+        results, divergences = model_composition.compare_models(variants, t_end=2., n_processes=2)
+
+        # predictions are tabulated by variant, observable and time
+        self.assertEqual(results.size, 11 * (2 + 2 + 1))
+        merged_g3p = results[(results['variant'] == 'merged') & (results['observable'] == 'G3P')]
+        t, merged_dhap, g3p = model_composition.MergedModel().simulate(t_end=2.)
+        numpy.testing.assert_array_equal(merged_g3p['time'], t)
+        numpy.testing.assert_allclose(merged_g3p['concentration'], g3p)
+
+        # divergences are calculated for the observables which each variant shares with the reference
+        self.assertEqual([(divergence['variant'], divergence['observable']) for divergence in divergences], [
+            ('merged', 'DHAP'), ('merged', 'G3P'),
+            ('merged_fast_g3pdh', 'DHAP'), ('merged_fast_g3pdh', 'G3P'),
+            ('glycolysis', 'DHAP'),
+        ])
+        self.assertEqual(divergences['max_abs_diff'][0], 0.)
+        self.assertGreater(divergences['max_abs_diff'][3], 0.)
+        self.assertGreaterEqual(divergences['max_abs_diff'][3], divergences['rms_diff'][3])
+
+        # the processes don't change the results
+        serial_results, serial_divergences = model_composition.compare_models(variants, t_end=2., n_processes=1)
+        numpy.testing.assert_array_equal(serial_results, results)
+
+        fig = model_composition.plot_comparison(results, ylims={'G3P': (0, 1.)})
+        self.assertEqual(len(fig.axes), 2)
+        self.assertEqual(fig.axes[1].get_ylim(), (0, 1.))
+        pyplot.close(fig)
+
+        with self.assertRaisesRegex(ValueError, 'does not have parameter'):
+            model_composition.compare_models({'merged': (model_composition.MergedModel, {'Vf1': 94.})}, n_processes=1)
+        with self.assertRaisesRegex(ValueError, 'not defined'):
+            model_composition.compare_models(variants, reference_id='glycerol', n_processes=1)
+
+    def test_jacobian_sparsity(self):
+        from intro_to_wc_modeling.cell_modeling import model_composition
+
+        for model in [model_composition.GlycolysisModel(), model_composition.MergedModel()]:
+            # the stoichiometry and rate laws reproduce the time derivatives
+            x = numpy.maximum(model.x_0, 0.1) * numpy.linspace(0.8, 1.2, model.x_0.size)
+            rates = numpy.array([rate_law(x) for rate_law in model.get_rate_laws()])
+            self.assertEqual(model.stoichiometry.shape, (len(model.species_ids), len(model.reaction_ids)))
+            numpy.testing.assert_allclose(model.stoichiometry.dot(rates), model.dx_dt(x), atol=1e-10)
+
+            # the sparsity pattern covers the non-zero entries of the numerical Jacobian
+            sparsity = model.get_jacobian_sparsity().toarray()
+            jacobian = numpy.zeros((x.size, x.size))
+            for i_species in range(x.size):
+                x_perturbed = x.copy()
+                x_perturbed[i_species] *= 1 + 1e-6
+                jacobian[:, i_species] = (model.dx_dt(x_perturbed) - model.dx_dt(x)) / (x[i_species] * 1e-6)
+            self.assertFalse(numpy.any((jacobian != 0) & ~sparsity))
+            self.assertLess(numpy.sum(sparsity), 0.5 * sparsity.size)
+
+            # the sparsity pattern is derived once per model
+            self.assertIs(model.get_jacobian_sparsity(), model.get_jacobian_sparsity())
+
+    def test_stiff_solvers(self):
+        from intro_to_wc_modeling.cell_modeling import model_composition
+
+        model = model_composition.MergedModel()
+        results = model_composition.benchmark_solvers(model, methods=('odeint', 'BDF'), t_end=5.)
+        self.assertEqual(set(results.keys()), set(['odeint', 'BDF']))
+        for result in results.values():
+            self.assertGreater(result['wall_time'], 0)
+            self.assertGreater(result['n_rhs_evals'], 0)
+        numpy.testing.assert_allclose(results['BDF']['x'], results['odeint']['x'], atol=1e-4)
+
+        compiled_results = model_composition.benchmark_solvers(model, methods=('BDF', ), t_end=5., compiled=True)
+        numpy.testing.assert_allclose(compiled_results['BDF']['x'], results['BDF']['x'], atol=1e-10)
+
+        t, dhap_bdf, g3p_bdf = model.simulate(t_end=5., method='BDF')
+        t, dhap_lsoda, g3p_lsoda = model.simulate(t_end=5., method='LSODA')
+        numpy.testing.assert_allclose(dhap_bdf, dhap_lsoda, atol=1e-4)
+        numpy.testing.assert_allclose(g3p_bdf, g3p_lsoda, atol=1e-4)
@@ -8,14 +8,20 @@
 
 from intro_to_wc_modeling.cell_modeling.simulation import mrna_and_proteins_using_several_methods
 from intro_to_wc_modeling.cell_modeling.simulation.multi_algorithm import analysis
+from intro_to_wc_modeling.cell_modeling.simulation.multi_algorithm import history
 from intro_to_wc_modeling.cell_modeling.simulation.multi_algorithm import model
 from intro_to_wc_modeling.cell_modeling.simulation.multi_algorithm import submodel_simulation
 from intro_to_wc_modeling.cell_modeling.simulation.multi_algorithm import simulation
+import importlib
 import intro_to_wc_modeling.cell_modeling.simulation.boolean
+import intro_to_wc_modeling.cell_modeling.simulation.codegen
 import intro_to_wc_modeling.cell_modeling.simulation.dfba
 import intro_to_wc_modeling.cell_modeling.simulation.ode
 import intro_to_wc_modeling.cell_modeling.simulation.stochastic
+import mock
 import numpy
+import os
+import scipy.integrate
 import shutil
 import tempfile
 import unittest
@@ -26,12 +32,507 @@ class TestSimulationTutorial(unittest.TestCase):
     def test_boolean_exercise(self):
         intro_to_wc_modeling.cell_modeling.simulation.boolean.main()
 
+    def test_boolean_network(self):
+        boolean = intro_to_wc_modeling.cell_modeling.simulation.boolean
+        network = boolean.BooleanNetwork(boolean.regulatory_functions)
+        self.assertEqual(network.node_names, ('A', 'B', 'C'))
+        self.assertEqual([inputs.tolist() for inputs in network.inputs], [[2], [0], [1]])
+        numpy.testing.assert_array_equal(network.truth_tables[0], [True, False])
+
+        # the packed simulation of every initial state matches the simulation of each state
+        initial_states = numpy.array([[(i_state >> i_node) & 1 for i_node in range(3)] for i_state in range(8)], bool)
+        step_hist, packed_hist = network.simulate(initial_states, 10)
+        numpy.testing.assert_array_equal(step_hist, numpy.arange(11))
+        state_hist = network.unpack_states(packed_hist, 8)
+        self.assertEqual(state_hist.shape, (11, 8, 3))
+        for i_state, initial_state in enumerate(initial_states):
+            _, hist = boolean.simulate(boolean.regulatory_functions, dict(zip(network.node_names, initial_state)),
+                                       10, boolean.sync_update_scheme)
+            for i_node, node_name in enumerate(network.node_names):
+                numpy.testing.assert_array_equal(state_hist[:, i_state, i_node], hist[node_name])
+
+        # states are packed into 64-bit words
+        states = numpy.random.RandomState(0).rand(130, 3) < 0.5
+        packed_states = network.pack_states(states)
+        self.assertEqual(packed_states.shape, (3, 3))
+        self.assertEqual(packed_states.dtype, numpy.uint64)
+        numpy.testing.assert_array_equal(network.unpack_states(packed_states, 130), states)
+
+        # regulatory functions which short-circuit are tabulated over all of their inputs
+        network = boolean.BooleanNetwork({
+            'A': lambda nodes: nodes['B'] and (nodes['C'] or not nodes['A']),
+            'B': lambda nodes: True,
+            'C': lambda nodes: nodes.get('A'),
+        })
+        self.assertEqual(sorted(network.inputs[0].tolist()), [0, 1, 2])
+        self.assertEqual(network.inputs[1].tolist(), [])
+        states = numpy.array([[(i_state >> i_node) & 1 for i_node in range(3)] for i_state in range(8)], bool)
+        next_states = network.unpack_states(network.sync_step(network.pack_states(states)), 8)
+        numpy.testing.assert_array_equal(next_states[:, 0], states[:, 1] & (states[:, 2] | ~states[:, 0]))
+        numpy.testing.assert_array_equal(next_states[:, 1], True)
+        numpy.testing.assert_array_equal(next_states[:, 2], states[:, 0])
+
+        with self.assertRaisesRegex(ValueError, 'undefined nodes D'):
+            boolean.BooleanNetwork({'A': lambda nodes: nodes['D']})
+        with self.assertRaisesRegex(ValueError, 'at most 1 nodes'):
+            boolean.BooleanNetwork({'A': lambda nodes: nodes['A'] and nodes['B'], 'B': lambda nodes: True},
+                                   max_inputs=1)
+
+    def test_boolean_attractors(self):
+        boolean = intro_to_wc_modeling.cell_modeling.simulation.boolean
+
+        # the repressilator has two synchronous attractors: a cycle of length 2 and a cycle of length 6
+        network = boolean.BooleanNetwork(boolean.regulatory_functions)
+        attractors, basins = boolean.enumerate_attractors(network)
+        self.assertEqual([attractor.astype(int).tolist() for attractor in attractors], [
+            [[0, 0, 0], [1, 1, 1]],
+            [[0, 0, 1], [0, 1, 1], [0, 1, 0], [1, 1, 0], [1, 0, 0], [1, 0, 1]],
+        ])
+        numpy.testing.assert_array_equal(basins, [0, 1, 1, 1, 1, 1, 1, 0])
+
+        # states with transients reach the attractor found by following their trajectories
+        names = ['A', 'B', 'C', 'D']
+        regulatory_functions = {
+            'A': lambda nodes: nodes['A'] or nodes['D'],
+            'B': lambda nodes: nodes['A'] and not nodes['C'],
+            'C': lambda nodes: nodes['B'],
+            'D': lambda nodes: False,
+        }
+        network = boolean.BooleanNetwork(regulatory_functions)
+        attractors, basins = boolean.enumerate_attractors(network)
+        for i_state in range(2 ** len(names)):
+            state = {name: bool((i_state >> i_name) & 1) for i_name, name in enumerate(names)}
+            _, hist = boolean.simulate(regulatory_functions, state, 20, boolean.sync_update_scheme)
+            final_state = [hist[name][-1] for name in names]
+            self.assertIn(final_state, attractors[basins[i_state]].tolist())
+
+        # sampling finds the same attractors, and estimates the sizes of their basins
+        sampled_attractors, counts, n_undetected = boolean.sample_attractors(
+            network, 2000, batch_size=512, seed=0, n_processes=2)
+        self.assertEqual(len(sampled_attractors), len(attractors))
+        for sampled_attractor, attractor in zip(sampled_attractors, attractors):
+            numpy.testing.assert_array_equal(sampled_attractor, attractor)
+        self.assertEqual(n_undetected, 0)
+        self.assertEqual(counts.sum(), 2000)
+        numpy.testing.assert_allclose(counts / 2000., numpy.bincount(basins) / 16., atol=0.05)
+
+        # the samples are reproducible
+        _, serial_counts, _ = boolean.sample_attractors(network, 2000, batch_size=512, seed=0, n_processes=1)
+        numpy.testing.assert_array_equal(serial_counts, counts)
+
+        # trajectories which are too long aren't attributed to attractors
+        _, counts, n_undetected = boolean.sample_attractors(network, 100, max_steps=0, seed=0, n_processes=1)
+        self.assertEqual(n_undetected, 100)
+        self.assertEqual(counts.sum(), 0)
+
+        with self.assertRaisesRegex(ValueError, 'too large'):
+            boolean.enumerate_attractors(network, max_nodes=3)
+
+    def test_boolean_async(self):
+        boolean = intro_to_wc_modeling.cell_modeling.simulation.boolean
+        names = ['A', 'B', 'C', 'D']
+        regulatory_functions = {
+            'A': lambda nodes: not nodes['D'],
+            'B': lambda nodes: nodes['A'],
+            'C': lambda nodes: nodes['B'] != nodes['A'],
+            'D': lambda nodes: nodes['C'] or nodes['B'],
+        }
+        network = boolean.BooleanNetwork(regulatory_functions)
+        initial_states = numpy.random.RandomState(0).rand(8, 4) < 0.5
+
+        # the deterministic scheme updates every node of networks of any size, and matches the tutorial scheme
+        step_hist, state_hist = network.simulate_async(initial_states, 24, update_scheme='deterministic', block_size=5)
+        numpy.testing.assert_array_equal(step_hist, numpy.arange(25))
+        self.assertEqual(state_hist.shape, (25, 8, 4))
+        for i_trajectory, initial_state in enumerate(initial_states):
+            _, hist = boolean.simulate(regulatory_functions, dict(zip(names, initial_state)), 24,
+                                       boolean.deterministic_async_update_scheme)
+            for i_name, name in enumerate(names):
+                numpy.testing.assert_array_equal(state_hist[:, i_trajectory, i_name], hist[name])
+
+        # the random scheme updates at most one node of each trajectory at each step, to the value of its regulatory
+        # function
+        initial_states = numpy.random.RandomState(1).rand(200, 4) < 0.5
+        _, state_hist = network.simulate_async(initial_states, 50, seed=3, block_size=16)
+        changed = state_hist[1:] != state_hist[0:-1]
+        self.assertTrue(numpy.all(changed.sum(axis=2) <= 1))
+        for step, i_trajectory, i_node in zip(*numpy.nonzero(changed)):
+            state = dict(zip(names, state_hist[step, i_trajectory]))
+            self.assertEqual(regulatory_functions[names[i_node]](state), state_hist[step + 1, i_trajectory, i_node])
+
+        # trajectories are reproducible, independent of the block size, and can be simulated without their histories
+        _, other_state_hist = network.simulate_async(initial_states, 50, seed=3, block_size=7)
+        numpy.testing.assert_array_equal(other_state_hist, state_hist)
+        _, final_states = network.simulate_async(initial_states, 50, seed=3, block_size=16, return_history=False)
+        numpy.testing.assert_array_equal(final_states, state_hist[-1])
+
+        with self.assertRaisesRegex(ValueError, 'not supported'):
+            network.simulate_async(initial_states, 10, update_scheme='sync')
+
+    def test_boolean_history(self):
+        boolean = intro_to_wc_modeling.cell_modeling.simulation.boolean
+
+        # chain of 11 nodes, which spans two bytes and settles into a stable state
+        names = ['N{}'.format(i_node) for i_node in range(11)]
+        regulatory_functions = {names[0]: lambda nodes: True}
+        for name, upstream_name in zip(names[1:], names[0:-1]):
+            regulatory_functions[name] = lambda nodes, upstream_name=upstream_name: not nodes[upstream_name]
+        initial_state = {name: i_node % 3 == 0 for i_node, name in enumerate(names)}
+
+        _, hist = boolean.simulate(regulatory_functions, dict(initial_state), 100, boolean.sync_update_scheme)
+        _, rle_hist = boolean.simulate(regulatory_functions, dict(initial_state), 100, boolean.sync_update_scheme,
+                                       run_length_encode=True)
+        network = boolean.BooleanNetwork(regulatory_functions)
+        _, packed_hist = network.simulate(numpy.array([[initial_state[name] for name in names]]), 100)
+        state_hist = boolean.BooleanNetwork.unpack_states(packed_hist, 1)[:, 0, :]
+
+        self.assertEqual(list(hist.keys()), names)
+        self.assertEqual(len(rle_hist), 11)
+        self.assertIn('N10', rle_hist)
+        self.assertEqual(hist.nbytes, 101 * 2)
+        self.assertLess(rle_hist.nbytes, hist.nbytes)
+        for i_node, name in enumerate(names):
+            self.assertEqual(hist[name].dtype, bool)
+            numpy.testing.assert_array_equal(hist[name], state_hist[:, i_node])
+            numpy.testing.assert_array_equal(rle_hist[name], hist[name])
+        numpy.testing.assert_array_equal(hist.to_array(), state_hist)
+        numpy.testing.assert_array_equal(rle_hist.to_array(), hist.to_array())
+
+        # the stacked runs are reused by subsequent lookups until another state is recorded
+        hist = boolean.BooleanHistory(['A', 'B'], 2, run_length_encode=True)
+        hist.record(0, {'A': True, 'B': False})
+        hist.record(1, {'A': True, 'B': False})
+        packed_runs = hist._get_packed_states()
+        numpy.testing.assert_array_equal(hist['A'], [True, True, True])
+        self.assertIs(hist._get_packed_states(), packed_runs)
+        hist.record(2, {'A': False, 'B': False})
+        self.assertIsNot(hist._get_packed_states(), packed_runs)
+        numpy.testing.assert_array_equal(hist['A'], [True, True, False])
+        numpy.testing.assert_array_equal(hist['B'], [False, False, False])
+
     def test_ode_exercise(self):
         intro_to_wc_modeling.cell_modeling.simulation.ode.main()
 
+    def test_ode_model(self):
+        ode = intro_to_wc_modeling.cell_modeling.simulation.ode
+        model = ode.GoldbeterModel()
+        concs = numpy.array([0.3, 0.4, 0.2])
+
+        numpy.testing.assert_array_equal(model.d_conc_d_t(concs, 0.), ode.d_conc_d_t(concs, 0.))
+
+        # the analytic Jacobian matches central differences
+        jac = model.jacobian(concs, 0.)
+        self.assertEqual(jac.shape, (3, 3))
+        eps = 1e-7
+        num_jac = numpy.stack([
+            (model.d_conc_d_t(concs + eps * e, 0.) - model.d_conc_d_t(concs - eps * e, 0.)) / (2 * eps)
+            for e in numpy.eye(3)], axis=1)
+        numpy.testing.assert_allclose(jac, num_jac, atol=1e-6)
+
+        # several states can be evaluated at once
+        many_concs = numpy.array([[0.3, 0.1, 0.5, 0.01], [0.4, 0.9, 0.2, 0.01], [0.2, 0.6, 0.7, 0.01]])
+        d_concs_d_t = model.d_conc_d_t(many_concs, 0.)
+        jacs = model.jacobian(many_concs, 0.)
+        self.assertEqual(d_concs_d_t.shape, (3, 4))
+        self.assertEqual(jacs.shape, (3, 3, 4))
+        for i_state in range(4):
+            numpy.testing.assert_allclose(d_concs_d_t[:, i_state], model.d_conc_d_t(many_concs[:, i_state], 0.))
+            numpy.testing.assert_allclose(jacs[:, :, i_state], model.jacobian(many_concs[:, i_state], 0.))
+
+        # several parameter sets can be evaluated at once
+        vds = numpy.array([0.2, 0.25, 0.3])
+        models = ode.GoldbeterModel(vd=vds)
+        self.assertEqual(models.d_conc_d_t(concs, 0.).shape, (3, 3))
+        self.assertEqual(models.jacobian(concs, 0.).shape, (3, 3, 3))
+        for i_vd, vd in enumerate(vds):
+            numpy.testing.assert_allclose(models.d_conc_d_t(concs, 0.)[:, i_vd],
+                                          ode.GoldbeterModel(vd=vd).d_conc_d_t(concs, 0.))
+            numpy.testing.assert_allclose(models.jacobian(concs, 0.)[:, :, i_vd],
+                                          ode.GoldbeterModel(vd=vd).jacobian(concs, 0.))
+
+    def test_ode_integrate(self):
+        ode = intro_to_wc_modeling.cell_modeling.simulation.ode
+
+        # stop once synthesis and degradation reach a steady state
+        def fun(t, x):
+            return numpy.array([2. - 0.5 * x[0]])
+
+        t_eval = numpy.linspace(0., 100., 101)
+        result = ode.integrate(fun, [0.], 0., 100., t_eval=t_eval, steady_state_tol=1e-6, thresholds=[(0, 2.)],
+                               dense_output=True)
+        self.assertTrue(result.steady_state)
+        self.assertLess(result.t_stop, 50.)
+        numpy.testing.assert_array_equal(result.t, t_eval)
+        numpy.testing.assert_allclose(result.x[:, 0], 4. * (1 - numpy.exp(-0.5 * t_eval)), atol=1e-5)
+        numpy.testing.assert_allclose(result.crossing_times[(0, 2.)], [2 * numpy.log(2)], rtol=1e-6)
+        t = numpy.array([1., 80.])
+        numpy.testing.assert_allclose(result(t)[:, 0], 4. * (1 - numpy.exp(-0.5 * t)), atol=1e-5)
+
+        result = ode.integrate(fun, [4.], 0., 100., t_eval=t_eval, steady_state_tol=1e-6)
+        self.assertTrue(result.steady_state)
+        self.assertEqual(result.t_stop, 0.)
+        numpy.testing.assert_array_equal(result.x[:, 0], 4.)
+        with self.assertRaisesRegex(ValueError, 'Dense output'):
+            result(1.)
+
+        # detect the peaks of the cell cycle oscillations
+        model = ode.GoldbeterModel()
+        result = ode.integrate(lambda time, concs: model.d_conc_d_t(concs, time), [0.01, 0.01, 0.01], 0., 100.,
+                               jac=lambda time, concs: model.jacobian(concs, time), peak_indices=[0])
+        self.assertFalse(result.steady_state)
+        self.assertEqual(result.t_stop, 100.)
+        peak_times = result.peak_times[0]
+        self.assertEqual(len(peak_times), 3)
+        self.assertAlmostEqual(numpy.diff(peak_times)[-1], ode.sweep({'vi': [0.025]}, n_processes=1)['period'][0],
+                               delta=0.05)
+
+    def test_ode_sweep(self):
+        ode = intro_to_wc_modeling.cell_modeling.simulation.ode
+
+        # period and amplitude of sine waves
+        time_hist = numpy.linspace(0., 100., 1001)
+        conc_hist = numpy.stack([1. + numpy.sin(2 * numpy.pi * time_hist / 20.),
+                                 2. + 0.5 * numpy.sin(2 * numpy.pi * time_hist / 12.5),
+                                 numpy.ones_like(time_hist)], axis=1)
+        period, amplitude = ode.extract_period_and_amplitude(time_hist, conc_hist)
+        numpy.testing.assert_allclose(period[:2], [20., 12.5], rtol=1e-3)
+        self.assertTrue(numpy.isnan(period[2]))
+        numpy.testing.assert_allclose(amplitude, [2., 1., 0.], atol=1e-3)
+
+        # sweep
+        parameter_sets = ode.make_parameter_grid(vi=[0.005, 0.025], vd=[0.25, 0.5])
+        numpy.testing.assert_array_equal(parameter_sets['vd'], [0.25, 0.25, 0.5, 0.5])
+        numpy.testing.assert_array_equal(parameter_sets['vi'], [0.005, 0.025, 0.005, 0.025])
+
+        results = ode.sweep(parameter_sets, n_processes=1)
+        self.assertEqual(results.dtype.names, ('vd', 'vi', 'period', 'amplitude'))
+        self.assertEqual(results.shape, (4,))
+        numpy.testing.assert_array_equal(results['vi'], parameter_sets['vi'])
+        self.assertTrue(numpy.all(numpy.isnan(results['period'][[0, 2]])))
+        self.assertTrue(numpy.all(results['period'][[1, 3]] > 0))
+
+        parallel_results = ode.sweep(parameter_sets, block_size=2, n_processes=2)
+        numpy.testing.assert_allclose(parallel_results['period'], results['period'], rtol=1e-4)
+        numpy.testing.assert_allclose(parallel_results['amplitude'], results['amplitude'], rtol=1e-4)
+
+        # the stacked integration matches integrating each parameter set separately
+        time_hist = numpy.linspace(0., 300., 3001)
+        model = ode.GoldbeterModel(vi=0.025, vd=0.25)
+        conc_hist = scipy.integrate.odeint(model.d_conc_d_t, [0.01, 0.01, 0.01], time_hist, Dfun=model.jacobian)
+        period, amplitude = ode.extract_period_and_amplitude(time_hist[1000:], conc_hist[1000:, 0:1])
+        self.assertAlmostEqual(results['period'][1], period[0], delta=1e-2)
+        self.assertAlmostEqual(results['amplitude'][1], amplitude[0], delta=1e-4)
+
+    def test_codegen(self):
+        codegen = intro_to_wc_modeling.cell_modeling.simulation.codegen
+
+        class Model(object):
+            k_syn = 2.5
+            k_deg = 0.5
+            K_m = 0.25
+            x_0 = numpy.array([1., 2.])
+            stoichiometry = numpy.array([[1, -1, 0], [0, 2, -1]])
+
+            def fluxes(self, x):
+                saturation = x[0] / (self.K_m + x[0])
+                return numpy.array([self.k_syn, self.k_deg * saturation, self.k_deg * saturation * x[1]**2])
+
+            def dx_dt(self, x):
+                return self.stoichiometry.dot(self.fluxes(x))
+
+        model = Model()
+        cache_dir = tempfile.mkdtemp()
+        try:
+            compiled_model = codegen.compile_model(model, cache_dir=cache_dir)
+
+            # parameters are folded into literals and shared intermediate values are calculated once
+            self.assertIn('0.25', compiled_model.source)
+            self.assertNotIn('K_m', compiled_model.source)
+            self.assertEqual(compiled_model.source.count('x[0] / '), 1)
+            self.assertTrue(os.path.isfile(compiled_model.filename))
+            self.assertEqual(os.path.dirname(compiled_model.filename), cache_dir)
+
+            for x in [model.x_0, numpy.array([0.3, 4.])]:
+                numpy.testing.assert_allclose(compiled_model.fluxes(x), model.fluxes(x), rtol=1e-14)
+                numpy.testing.assert_allclose(compiled_model.dx_dt(x), model.dx_dt(x), rtol=1e-14)
+
+            # models are cached by the hash of their source
+            self.assertIs(codegen.compile_model(model, cache_dir=cache_dir), compiled_model)
+            model.k_deg = 0.6
+            self.assertNotEqual(codegen.compile_model(model, cache_dir=cache_dir).hash, compiled_model.hash)
+
+            if codegen.numba:
+                jit_model = codegen.compile_model(model, cache_dir=cache_dir, jit=True)
+                self.assertTrue(jit_model.jit)
+                numpy.testing.assert_allclose(jit_model.dx_dt(model.x_0), model.dx_dt(model.x_0), rtol=1e-14)
+
+            # without numba, the generated functions aren't compiled and run as pure Python
+            try:
+                with mock.patch.dict('sys.modules', {'numba': None}):
+                    importlib.reload(codegen)
+                self.assertIsNone(codegen.numba)
+                python_model = codegen.compile_model(model, cache_dir=cache_dir, jit=True)
+                self.assertFalse(python_model.jit)
+                numpy.testing.assert_allclose(python_model.dx_dt(model.x_0), model.dx_dt(model.x_0), rtol=1e-14)
+            finally:
+                importlib.reload(codegen)
+        finally:
+            shutil.rmtree(cache_dir)
+
+        # rate laws which branch on the concentrations can't be traced
+        model.fluxes = lambda x: numpy.array([x[0] if x[0] > 0 else 0., 0., 0.])
+        with self.assertRaisesRegex(TypeError, 'cannot be traced'):
+            codegen.generate_source(model)
+
     def test_stochastic_exercise(self):
         intro_to_wc_modeling.cell_modeling.simulation.stochastic.main()
 
+    def test_stochastic_simulate(self):
+        stochastic = intro_to_wc_modeling.cell_modeling.simulation.stochastic
+        numpy.random.seed(0)
+        time_hist, copy_number_hist = stochastic.simulate(
+            stochastic.reaction_stochiometries, stochastic.kinetic_laws, stochastic.init_copy_number,
+            200., 0.01)
+
+        numpy.testing.assert_array_equal(time_hist, numpy.linspace(0., 200., 20001))
+        self.assertFalse(numpy.any(numpy.isnan(copy_number_hist)))
+        self.assertEqual(copy_number_hist[0], stochastic.init_copy_number)
+        self.assertTrue(numpy.all(numpy.abs(numpy.diff(copy_number_hist)) <= 2))
+        self.assertAlmostEqual(numpy.mean(copy_number_hist[5000:]), stochastic.k_syn / stochastic.k_deg, delta=0.5)
+
+    def test_stochastic_ensemble(self):
+        stochastic = intro_to_wc_modeling.cell_modeling.simulation.stochastic
+        numpy.random.seed(0)
+        time_hist, copy_number_hist = stochastic.simulate_ensemble(
+            stochastic.reaction_stochiometries, stochastic.kinetic_laws, stochastic.init_copy_number,
+            25., 1., 2000)
+
+        numpy.testing.assert_array_equal(time_hist, numpy.linspace(0., 25., 26))
+        self.assertEqual(copy_number_hist.shape, (26, 2000))
+        self.assertFalse(numpy.any(numpy.isnan(copy_number_hist)))
+        numpy.testing.assert_array_equal(copy_number_hist[0, :], stochastic.init_copy_number)
+
+        # the copy number relaxes to a Poisson distribution with mean k_syn / k_deg
+        mean = stochastic.k_syn / stochastic.k_deg
+        self.assertAlmostEqual(numpy.mean(copy_number_hist[-1, :]), mean, delta=0.3)
+        self.assertAlmostEqual(numpy.var(copy_number_hist[-1, :]), mean, delta=0.6)
+
+    def test_stochastic_ensemble_statistics(self):
+        stochastic = intro_to_wc_modeling.cell_modeling.simulation.stochastic
+        numpy.random.seed(0)
+        _, copy_number_hist = stochastic.simulate_ensemble(
+            stochastic.reaction_stochiometries, stochastic.kinetic_laws, stochastic.init_copy_number,
+            25., 1., 500)
+
+        # stream trajectories one at a time and in batches into separate accumulators, and merge them
+        stats = stochastic.EnsembleStatistics(26)
+        stats.add(copy_number_hist[:, :200])
+        other_stats = stochastic.EnsembleStatistics(26)
+        for i_sim in range(200, 500):
+            other_stats.add(copy_number_hist[:, i_sim])
+        self.assertIs(stats.merge(other_stats), stats)
+        stats.merge(stochastic.EnsembleStatistics(26))
+
+        self.assertEqual(stats.n_simulations, 500)
+        numpy.testing.assert_allclose(stats.mean, numpy.mean(copy_number_hist, 1))
+        numpy.testing.assert_allclose(stats.std, numpy.std(copy_number_hist, 1))
+        for q in [0., 0.1, 0.5, 0.9, 1.]:
+            numpy.testing.assert_array_equal(stats.quantile(q),
+                                             numpy.quantile(copy_number_hist, q, axis=1, method='inverted_cdf'))
+
+        with self.assertRaisesRegex(ValueError, 'must have 26 time points'):
+            stats.add(numpy.zeros(10))
+        with self.assertRaisesRegex(ValueError, 'must be integers'):
+            stats.add(numpy.full(26, 0.5))
+        with self.assertRaisesRegex(ValueError, 'must have 26 time points'):
+            stats.merge(stochastic.EnsembleStatistics(10))
+
+        empty_stats = stochastic.EnsembleStatistics(26)
+        empty_stats.add(numpy.zeros((26, 0)))
+        with self.assertRaisesRegex(ValueError, 'At least one trajectory'):
+            empty_stats.mean
+        with self.assertRaisesRegex(ValueError, 'At least one trajectory'):
+            empty_stats.variance
+        with self.assertRaisesRegex(ValueError, 'At least one trajectory'):
+            empty_stats.std
+        with self.assertRaisesRegex(ValueError, 'At least one trajectory'):
+            empty_stats.quantile(0.5)
+
+    def test_stochastic_reaction_network(self):
+        stochastic = intro_to_wc_modeling.cell_modeling.simulation.stochastic
+
+        # A + B -> C, 2 A -> D, B -> 0 (custom propensity)
+        network = stochastic.ReactionNetwork(
+            [[-1, -2, 0], [-1, 0, -1], [1, 0, 0], [0, 1, 0]], [0.1, 0.3, 1.],
+            propensity_functions={2: lambda copy_numbers: 0.5 * copy_numbers[1]})
+        self.assertEqual(network.n_species, 4)
+        self.assertEqual(network.n_reactions, 3)
+        numpy.testing.assert_allclose(network.propensities([5, 3, 0, 0]), [1.5, 3., 1.5])
+        numpy.testing.assert_allclose(network.propensities(numpy.array([[5, 1], [3, 3], [0, 0], [0, 0]])),
+                                      [[1.5, 0.3], [3., 0.], [1.5, 1.5]])
+
+        with self.assertRaisesRegex(ValueError, 'one rate constant'):
+            stochastic.ReactionNetwork([[1, -1]], [1.])
+
+        # networks without reactions remain in their initial state
+        network = stochastic.ReactionNetwork(numpy.zeros((2, 0)), [])
+        self.assertEqual(network.n_reactions, 0)
+        self.assertEqual(network.propensities([3, 4]).shape, (0,))
+        for jit in [True, False]:
+            time_hist, copy_number_hist = stochastic.simulate_network(network, [3, 4], 10., 1., seed=0, jit=jit)
+            numpy.testing.assert_array_equal(copy_number_hist, numpy.tile([3., 4.], (11, 1)))
+
+        # the synthesis/degradation model relaxes to a Poisson distribution with mean k_syn / k_deg
+        network = stochastic.ReactionNetwork([stochastic.reaction_stochiometries],
+                                             [stochastic.k_syn, stochastic.k_deg])
+        numpy.random.seed(0)
+        time_hist, copy_number_hist = stochastic.simulate_network(network, [stochastic.init_copy_number], 1000., 1.)
+        numpy.testing.assert_array_equal(time_hist, numpy.linspace(0., 1000., 1001))
+        self.assertEqual(copy_number_hist.shape, (1001, 1))
+        self.assertFalse(numpy.any(numpy.isnan(copy_number_hist)))
+        mean = stochastic.k_syn / stochastic.k_deg
+        self.assertAlmostEqual(numpy.mean(copy_number_hist[100:, 0]), mean, delta=0.5)
+
+    def test_stochastic_jit_kernel(self):
+        stochastic = intro_to_wc_modeling.cell_modeling.simulation.stochastic
+
+        # mRNA synthesis and degradation, protein synthesis (catalyzed by mRNA) and degradation, and dimerization
+        network = stochastic.ReactionNetwork(
+            [[1, -1, 0, 0, 0], [0, 0, 1, -1, -2], [0, 0, 0, 0, 1]],
+            [5., 10., 20., 0.1, 0.01],
+            reactant_stoichiometries=[[0, 1, 1, 0, 0], [0, 0, 0, 1, 2], [0, 0, 0, 0, 0]])
+
+        # the compiled kernel, the kernel run as pure Python, and the vectorized Python loop predict the same trajectory
+        time_hist, jit_hist = stochastic.simulate_network(network, [1, 50, 0], 20., 0.1, seed=1)
+        _, python_hist = stochastic.simulate_network(network, [1, 50, 0], 20., 0.1, seed=1, jit=False)
+        kernel_hist = stochastic._simulate_mass_action(
+            network.stoichiometries, network.rate_constants, network._term_species, network._term_offsets,
+            numpy.array([1., 50., 0.]), 20., 0.1, time_hist.size, numpy.random.default_rng(1))
+        numpy.testing.assert_array_equal(jit_hist, python_hist)
+        numpy.testing.assert_array_equal(jit_hist, kernel_hist)
+        self.assertFalse(numpy.any(numpy.isnan(jit_hist)))
+        self.assertGreater(jit_hist[-1, 2], 0)
+
+        # the simulations are reproducible by seeding numpy.random
+        numpy.random.seed(0)
+        _, hist_1 = stochastic.simulate_network(network, [1, 50, 0], 20., 0.1)
+        numpy.random.seed(0)
+        _, hist_2 = stochastic.simulate_network(network, [1, 50, 0], 20., 0.1)
+        numpy.testing.assert_array_equal(hist_1, hist_2)
+
+        # without numba, the kernel runs as pure Python and predicts the same trajectory
+        try:
+            with mock.patch.dict('sys.modules', {'numba': None}):
+                importlib.reload(stochastic)
+            self.assertIsNone(stochastic.numba)
+            self.assertIs(stochastic.simulate_mass_action_kernel, stochastic._simulate_mass_action)
+            network = stochastic.ReactionNetwork(
+                network.stoichiometries, network.rate_constants, network.reactant_stoichiometries)
+            _, python_kernel_hist = stochastic.simulate_network(network, [1, 50, 0], 20., 0.1, seed=1)
+            numpy.testing.assert_array_equal(python_kernel_hist, jit_hist)
+        finally:
+            importlib.reload(stochastic)
+
     def test_dfba_exercise(self):
         intro_to_wc_modeling.cell_modeling.simulation.dfba.main()
 
@@ -44,6 +545,90 @@ class TestSimulationTutorial(unittest.TestCase):
         with self.assertRaisesRegex(Exception, 'below 0'):
             intro_to_wc_modeling.cell_modeling.simulation.dfba.main(init_concs=init_concs)
 
+    def test_dfba_simulation(self):
+        dfba = intro_to_wc_modeling.cell_modeling.simulation.dfba
+        sim = dfba.get_tutorial_simulation()
+        init_concs = {'glc_e': 200., 'aa_e': 120., 'biomass': 1.}
+
+        time_hist, conc_hist, flux_hist, growth_hist = sim.simulate(init_concs, 20, time_step=0.5)
+        numpy.testing.assert_array_almost_equal(time_hist, numpy.arange(0., 20.25, 0.5))
+        self.assertEqual(conc_hist.shape, (41, 3))
+        self.assertEqual(flux_hist.shape, (41, 7))
+        self.assertEqual(sim.n_solves, 41)
+        numpy.testing.assert_array_equal(conc_hist[0, :], [200., 120., 1.])
+
+        # the concentrations change by the uptake of nutrients and growth, and the growth rate is the objective
+        i_glc_tx = sim.variable_names.index('glc_tx')
+        i_aa_tx = sim.variable_names.index('aa_tx')
+        i_growth = sim.variable_names.index('growth')
+        numpy.testing.assert_array_almost_equal(numpy.diff(conc_hist[:, 0]), -0.5 * flux_hist[0:-1, i_glc_tx])
+        numpy.testing.assert_array_almost_equal(numpy.diff(conc_hist[:, 1]), -0.5 * flux_hist[0:-1, i_aa_tx])
+        numpy.testing.assert_array_almost_equal(numpy.diff(conc_hist[:, 2]), 0.5 * flux_hist[0:-1, i_growth])
+        numpy.testing.assert_array_almost_equal(growth_hist, flux_hist[:, i_growth])
+
+        # uptake is limited by the available nutrients
+        numpy.testing.assert_array_almost_equal(flux_hist[:, i_aa_tx], 1e-3 * conc_hist[:, 1] * conc_hist[:, 2])
+        self.assertTrue(numpy.all(flux_hist[:, i_glc_tx] <= 5e-3 * conc_hist[:, 0] * conc_hist[:, 2] * (1 + 1e-9)))
+
+        # the simulation can be restarted, and matches a single solution
+        growth, fluxes = sim.solve(conc_hist[10, :])
+        self.assertAlmostEqual(growth, growth_hist[10])
+        numpy.testing.assert_array_almost_equal(fluxes, flux_hist[10, :])
+        _, other_conc_hist, _, _ = sim.simulate(init_concs, 20, time_step=0.5)
+        numpy.testing.assert_array_equal(other_conc_hist, conc_hist)
+
+        with self.assertRaisesRegex(ValueError, 'below 0'):
+            sim.simulate({'glc_e': 200., 'aa_e': 120., 'biomass': 1e8}, 20)
+
+    def test_dfba_simulation_adaptive_and_direct(self):
+        dfba = intro_to_wc_modeling.cell_modeling.simulation.dfba
+        sim = dfba.get_tutorial_simulation()
+        init_concs = {'glc_e': 200., 'aa_e': 120., 'biomass': 1.}
+        time_hist, conc_hist, _, _ = sim.simulate(init_concs, 70, time_step=0.01)
+
+        # the adaptive time step limits the relative change of each concentration
+        sim.n_solves = 0
+        adaptive_time_hist, adaptive_conc_hist, adaptive_flux_hist, _ = sim.simulate_adaptive(
+            init_concs, 70, max_relative_change=0.05)
+        self.assertEqual(sim.n_solves, adaptive_time_hist.size)
+        self.assertEqual(adaptive_time_hist[-1], 70.)
+        time_steps = numpy.diff(adaptive_time_hist)
+        self.assertTrue(numpy.all(time_steps > 0) and numpy.all(time_steps <= 1.))
+        self.assertTrue(numpy.all(numpy.abs(numpy.diff(adaptive_conc_hist, axis=0))
+                                  <= 0.05 * adaptive_conc_hist[0:-1, :] + 1e-6))
+        numpy.testing.assert_array_almost_equal(
+            numpy.diff(adaptive_conc_hist[:, 2]),
+            time_steps * adaptive_flux_hist[0:-1, sim.variable_names.index('growth')])
+        for i_observable in range(3):
+            interpolated_conc_hist = numpy.interp(time_hist, adaptive_time_hist, adaptive_conc_hist[:, i_observable])
+            numpy.testing.assert_allclose(interpolated_conc_hist, conc_hist[:, i_observable], atol=5.)
+
+        # the direct approach is accurate with few solutions of the linear program
+        sim.n_solves = 0
+        direct_time_hist, direct_conc_hist, _, direct_growth_hist = sim.simulate_direct(init_concs, 70)
+        self.assertLess(sim.n_solves, 1000)
+        numpy.testing.assert_array_equal(direct_time_hist, numpy.arange(71.))
+        numpy.testing.assert_allclose(direct_conc_hist, conc_hist[::100, :], atol=0.5)
+
+        # the integration stops and restarts when a nutrient is depleted
+        direct_time_hist, direct_conc_hist, _, direct_growth_hist = sim.simulate_direct(init_concs, 70,
+                                                                                        depletion_conc=1e-2)
+        i_depletion = numpy.flatnonzero(direct_time_hist % 1)
+        self.assertEqual(i_depletion.size, 1)
+        self.assertGreater(direct_time_hist[i_depletion[0]], 60.)
+        self.assertTrue(numpy.all(direct_conc_hist[i_depletion[0]:, 0] == 0))
+        self.assertTrue(numpy.all(direct_growth_hist[i_depletion[0]:] == 0))
+
+        # unlike fixed time steps, both integrators keep the concentrations of quickly consumed nutrients positive
+        fast_init_concs = {'glc_e': 200., 'aa_e': 120., 'biomass': 1e8}
+        _, adaptive_conc_hist, _, _ = sim.simulate_adaptive(fast_init_concs, 20)
+        self.assertTrue(numpy.all(adaptive_conc_hist >= 0))
+        _, direct_conc_hist, _, _ = sim.simulate_direct(fast_init_concs, 20)
+        numpy.testing.assert_allclose(direct_conc_hist[-1, :], [0., 20., 1e8 + 100.], atol=1e-3)
+
+        with self.assertRaisesRegex(ValueError, 'minimum time step'):
+            sim.simulate_adaptive(fast_init_concs, 20, min_time_step=1e-3)
+
     def test_mrna_and_proteins_using_several_methods_deterministic_exercise(self):
         mrna_and_proteins_using_several_methods.deterministic_exercise()
 
@@ -53,6 +638,20 @@ class TestSimulationTutorial(unittest.TestCase):
     def test_mrna_and_proteins_using_several_methods_trajectory_exercise(self):
         mrna_and_proteins_using_several_methods.trajectory_exercise()
 
+    def test_ode_simulation_steady_state(self):
+        sim = mrna_and_proteins_using_several_methods.OdeSimulation()
+
+        # by default, the integration continues to the end time
+        t, m, n = sim.simulate()
+        self.assertNotEqual(n[-1], n[-2])
+
+        # optionally, the integration stops at steady state, which is reported for the remaining time points
+        ss_t, ss_m, ss_n = sim.simulate(steady_state_tol=1e-3)
+        numpy.testing.assert_array_equal(ss_t, t)
+        self.assertEqual(ss_n[-1], ss_n[-2])
+        numpy.testing.assert_allclose(ss_m, m, atol=1e-3)
+        numpy.testing.assert_allclose(ss_n, n, rtol=1e-3)
+
     def test_get_steady_state(self):
         sim = mrna_and_proteins_using_several_methods.OdeSimulation()
         self.assertEqual(sim.get_steady_stability(sim.jacobian(None)), 'stable sink')
@@ -128,6 +727,163 @@ class TestMultiAlgorithm(unittest.TestCase):
         with self.assertRaisesRegex(Exception, 'Invalid units'):
             analysis.get_scale('', 'c', 1., 1.)
 
+    def test_species_counts_change_log(self):
+        dense = numpy.zeros((3, 2, 5))
+        dense[:, :, 0] = [[1, 2], [3, 4], [5, 6]]
+        log = history.SpeciesCountsChangeLog(dense[:, :, 0], 5)
+        for iTime in range(1, 5):
+            dense[:, :, iTime] = dense[:, :, iTime - 1]
+            dense[iTime % 3, 0, iTime] += iTime
+            log.record(iTime, dense[:, :, iTime])
+
+        self.assertEqual(log.shape, dense.shape)
+        self.assertEqual(log.nChanges, 4)
+        numpy.testing.assert_array_equal(log.toArray(), dense)
+        numpy.testing.assert_array_equal(log[1, 0, :], dense[1, 0, :])
+        numpy.testing.assert_array_equal(log[2, 1, 1:3], dense[2, 1, 1:3])
+        numpy.testing.assert_array_equal(log[:, 0, -1], dense[:, 0, -1])
+        numpy.testing.assert_array_equal(log[[2, 0], 1, :], dense[[2, 0], 1, :])
+        numpy.testing.assert_array_equal(log[numpy.array([0, 1]), numpy.array([1, 0]), 3], dense[[0, 1], [1, 0], 3])
+        numpy.testing.assert_array_equal(log[0:2, 0, 1:], dense[0:2, 0, 1:])
+
+        log.recordChange(4, 2, 1, 10.)
+        dense[2, 1, 4] = 10.
+        numpy.testing.assert_array_equal(log[2, 1, :], dense[2, 1, :])
+        numpy.testing.assert_array_equal(log.toArray(), dense)
+
+    def test_memory_mapped_analysis(self):
+        mdl = model.Model(
+            compartments=[model.Compartment(id='c'), model.Compartment(id='e')],
+            species=[
+                model.Species(id='A', type='RNA'),
+                model.Species(id='B', type='Protein'),
+                model.Species(id='C', type='RNA'),
+                model.Species(id='D', type='Metabolite'),
+            ])
+        mdl.setComponentIndices()
+
+        counts = numpy.random.RandomState(0).randint(0, 100, size=(4, 2, 7)).astype(float)
+        volume = numpy.linspace(1., 2., 7)
+
+        dirname = tempfile.mkdtemp()
+        filename = os.path.join(dirname, 'speciesCounts.npy')
+        history.saveSpeciesCountsHistory(filename, counts)
+        saved_counts = history.openSpeciesCountsHistory(filename)
+        self.assertIsInstance(saved_counts, numpy.memmap)
+
+        totals = analysis.get_totals_by_type(mdl, saved_counts, ['RNA', 'Protein', 'Complex'], chunkSize=7)
+        numpy.testing.assert_array_equal(totals['RNA'], counts[0, 0, :] + counts[2, 0, :])
+        numpy.testing.assert_array_equal(totals['Protein'], counts[1, 0, :])
+        numpy.testing.assert_array_equal(totals['Complex'], numpy.zeros(7))
+
+        concs = analysis.get_concentrations(mdl, saved_counts, 'e', volume, volume, speciesIds=['D', 'A'],
+                                            units='molecules', chunkSize=1)
+        numpy.testing.assert_array_equal(concs, counts[[3, 0], 1, :])
+
+        concs = analysis.get_concentrations(mdl, saved_counts, 'c', volume, volume, units='uM')
+        numpy.testing.assert_allclose(concs, counts[:, 0, :] * analysis.get_scale('uM', 'c', volume, volume))
+
+        log = history.SpeciesCountsChangeLog(counts[:, :, 0], 7)
+        for iTime in range(1, 7):
+            log.record(iTime, counts[:, :, iTime])
+        history.saveSpeciesCountsHistory(filename, log)
+        numpy.testing.assert_array_equal(history.openSpeciesCountsHistory(filename), counts)
+
+        del saved_counts
+        shutil.rmtree(dirname)
+
+    def test_aggregate_by_group(self):
+        mdl = model.Model(
+            compartments=[model.Compartment(id='c')],
+            species=[model.Species(id=str(i), type=['RNA', 'Protein', 'Metabolite'][i % 3]) for i in range(10)])
+        mdl.setComponentIndices()
+        counts = numpy.random.RandomState(0).rand(10, 1, 9)
+
+        totals = analysis.aggregate_by_group(mdl, counts, key='type', chunkSize=25)
+        self.assertEqual(set(totals.keys()), set(['RNA', 'Protein', 'Metabolite']))
+        numpy.testing.assert_allclose(totals['RNA'], numpy.sum(counts[0::3, 0, :], axis=0))
+        numpy.testing.assert_allclose(totals['Protein'], numpy.sum(counts[1::3, 0, :], axis=0))
+        numpy.testing.assert_allclose(totals['Metabolite'], numpy.sum(counts[2::3, 0, :], axis=0))
+
+        group_index = analysis.get_group_index(mdl, key=lambda species: int(species.id) < 4)
+        totals = analysis.aggregate_by_group(mdl, counts, groupIndex=group_index)
+        numpy.testing.assert_allclose(totals[True], numpy.sum(counts[:4, 0, :], axis=0))
+        numpy.testing.assert_allclose(totals[False], numpy.sum(counts[4:, 0, :], axis=0))
+
+        # change logs are aggregated block by block, without reconstructing the entire history
+        log = history.SpeciesCountsChangeLog(counts[:, :, 0], 9)
+        for iTime in range(1, 9):
+            log.record(iTime, counts[:, :, iTime])
+        with mock.patch.object(history.SpeciesCountsChangeLog, 'toArray', side_effect=AssertionError):
+            log_totals = analysis.aggregate_by_group(mdl, log, key='type', chunkSize=25)
+        totals = analysis.aggregate_by_group(mdl, counts, key='type')
+        for type in ['RNA', 'Protein', 'Metabolite']:
+            numpy.testing.assert_allclose(log_totals[type], totals[type])
+
+    def test_plot_batch(self):
+        mdl = model.Model(
+            compartments=[model.Compartment(id='c'), model.Compartment(id='e')],
+            species=[model.Species(id='A'), model.Species(id='B')])
+        mdl.setComponentIndices()
+
+        time = numpy.linspace(0., 3600., 5)
+        volume = numpy.full(5, 1e-15)
+        counts = numpy.random.RandomState(0).rand(2, 2, 5)
+
+        dirname = tempfile.mkdtemp()
+        specs = [
+            {'yDatas': {'Volume': volume}, 'fileName': os.path.join(dirname, 'Volume.png')},
+            {'selectedSpeciesCompartments': ['A[c]', 'B[c]'], 'units': 'uM', 'fileName': os.path.join(dirname, 'AB.png')},
+            {'selectedSpeciesCompartments': ['A[c]'], 'units': 'uM', 'fileName': os.path.join(dirname, 'A.png')},
+        ]
+        for n_processes in [1, 2]:
+            analysis.plot_batch(mdl, specs, time=time, speciesCounts=counts, volume=volume, nProcesses=n_processes)
+            for spec in specs:
+                self.assertTrue(os.path.isfile(spec['fileName']))
+                os.remove(spec['fileName'])
+
+        shutil.rmtree(dirname)
+
+    def test_get_y_data_for_several_species(self):
+        mdl = model.Model(
+            compartments=[model.Compartment(id='c'), model.Compartment(id='e')],
+            species=[model.Species(id='A'), model.Species(id='B'), model.Species(id='C')])
+        mdl.setComponentIndices()
+        counts = numpy.random.RandomState(0).rand(3, 2, 4)
+        volume = numpy.full(4, 2.)
+        extracellular_volume = numpy.full(4, 4.)
+
+        species_ids, compartment_ids, y_data = analysis.get_y_data(mdl, counts, ['C[e]', 'A[c]', 'B[c]'])
+        self.assertEqual(species_ids, ['C', 'A', 'B'])
+        self.assertEqual(compartment_ids, ['e', 'c', 'c'])
+        numpy.testing.assert_array_equal(y_data, counts[[2, 0, 1], [1, 0, 0], :])
+
+        species_id, compartment_id, y_data = analysis.get_y_data(mdl, counts, 'B[e]')
+        self.assertEqual((species_id, compartment_id), ('B', 'e'))
+        numpy.testing.assert_array_equal(y_data, counts[1, 1, :])
+
+        # the series are read from change logs without reconstructing the entire history
+        log = history.SpeciesCountsChangeLog(counts[:, :, 0], 4)
+        for iTime in range(1, 4):
+            log.record(iTime, counts[:, :, iTime])
+        with mock.patch.object(history.SpeciesCountsChangeLog, 'toArray', side_effect=AssertionError):
+            _, _, y_data = analysis.get_y_data(mdl, log, 'B[e]')
+            numpy.testing.assert_array_equal(y_data, counts[1, 1, :])
+            _, _, y_data = analysis.get_y_data(mdl, log, ['C[e]', 'A[c]'])
+            numpy.testing.assert_array_equal(y_data, counts[[2, 0], [1, 0], :])
+
+        scale = analysis.get_scale('mM', compartment_ids, volume, extracellular_volume)
+        self.assertEqual(scale.shape, (3, 4))
+        numpy.testing.assert_allclose(scale[0, :], analysis.get_scale('mM', 'e', volume, extracellular_volume))
+        numpy.testing.assert_allclose(scale[1, :], analysis.get_scale('mM', 'c', volume, extracellular_volume))
+
+        scale = analysis.get_scale('molecules', compartment_ids, volume, extracellular_volume)
+        numpy.testing.assert_array_equal(scale, numpy.ones((3, 1)))
+
+        submdl = model.Submodel()
+        species_ids, compartment_ids, y_data = analysis.get_y_data(submdl, {'A[c]': counts[0, 0, :]}, ['A[c]'])
+        numpy.testing.assert_array_equal(y_data, counts[[0], 0, :])
+
     def test_containsCarbon(self):
         self.assertTrue(model.Species(empiricalFormula='C').containsCarbon())
         self.assertFalse(model.Species(empiricalFormula='H').containsCarbon())